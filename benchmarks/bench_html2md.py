@@ -0,0 +1,82 @@
+"""HTML → Markdown 基准：对比旧的正则剥标签与 HtmlToMarkdown 单遍转换。
+
+用法：python benchmarks/bench_html2md.py [--posts 40] [--sections 60] [--json 结果.json]
+语料用 bench_render 的随机长文经 MarkdownService 渲染得到；另加一段大量未闭合 <img> 的病态输入，
+旧正则在这类输入上会反复回溯。转换结果会再渲染一次，与原 HTML 比对可见文字与结构是否一致，
+有任何一篇不一致时列出文章编号并以非零状态退出。
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from studio import html2md, render
+from bench_render import make_post, timed
+
+def regex_clean(raw_html):
+    """改造前 clean_html 的实现，作为基线"""
+    c = re.sub(r'<img.*?src="(.*?)".*?/>', r'![](\1)', raw_html)
+    c = re.sub(r'</?(h\d|p|span|div|blockquote|ul|li|ol|pre|code|a).*?>', '', c)
+    return html2md.html_unescape(c).strip()
+
+_TAG = re.compile(r'<[^>]+>')
+_STRUCTURE = re.compile(r'<(h[1-6]|p|li|pre|blockquote|table|tr|td|th|a|img|strong|em|code)\b')
+
+def visible_text(html):
+    return ''.join(html2md.html_unescape(_TAG.sub('', html)).split())
+
+def structure(html):
+    return [t for t in _STRUCTURE.findall(html) if t != 'p'] # 紧凑/松散列表只影响 <p>，不算结构差异
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--posts', type=int, default=40)
+    ap.add_argument('--sections', type=int, default=60)
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--json', help='把结果保存为 JSON')
+    args = ap.parse_args()
+
+    rnd = random.Random(args.seed)
+    service = render.MarkdownService(cache_size=args.posts * 2)
+    corpus = service.render_many([make_post(rnd, i, args.sections, shared=50) for i in range(args.posts)])
+    pathological = '<p>' + '<img src="a.png" alt="x">' * 60 + '</p>' # 没有自闭合斜杠的图片：旧正则的回溯随数量急剧增长，100 张已需数秒
+    size_mb = sum(len(t.encode('utf-8')) for t in corpus) / 1024 / 1024
+    print(f"语料：{args.posts} 篇 HTML，共 {size_mb:.1f} MB")
+
+    rows = []
+    def record(name, seconds, count, note=''):
+        rows.append({'case': name, 'seconds': round(seconds, 4), 'mb_per_s': round(size_mb / seconds, 2) if count else None, 'note': note})
+        print(f"{name:<26}{seconds:>9.3f}s  {note}")
+
+    t, _ = timed(lambda: [regex_clean(x) for x in corpus])
+    record('正则剥标签（旧）', t, len(corpus), f"{size_mb / t:.1f} MB/s")
+    t, converted = timed(lambda: [html2md.html_to_markdown(x) for x in corpus])
+    record('HtmlToMarkdown', t, len(corpus), f"{size_mb / t:.1f} MB/s")
+
+    t, _ = timed(lambda: regex_clean(pathological))
+    record('病态输入 正则（旧）', t, 0, "60 张未闭合 <img>")
+    t, _ = timed(lambda: html2md.html_to_markdown(pathological))
+    record('病态输入 HtmlToMarkdown', t, 0, "60 张未闭合 <img>")
+
+    text_bad, struct_bad = [], []
+    for i, (html, md) in enumerate(zip(corpus, converted)):
+        again = service.render(md)
+        if visible_text(again) != visible_text(html): text_bad.append(i)
+        if structure(again) != structure(html): struct_bad.append(i)
+    text_ok, struct_ok = len(corpus) - len(text_bad), len(corpus) - len(struct_bad)
+    print(f"往返校验：文字一致 {text_ok}/{len(corpus)}，结构一致 {struct_ok}/{len(corpus)}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'posts': args.posts, 'size_mb': round(size_mb, 2), 'results': rows,
+                       'round_trip': {'text': text_ok, 'structure': struct_ok, 'total': len(corpus)}}, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.json}")
+    if text_bad or struct_bad:
+        sys.exit(f"往返校验失败：文字不一致 {text_bad}，结构不一致 {struct_bad}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""网络基准：在本地模拟 Typecho 服务端（mock_typecho.py）上测量远程文章列表、全站备份、单文件归档（含附件下载）、评论同步、媒体上传与批量发布。
+
+用法：python benchmarks/bench_network.py [--posts 10000] [--comments 20000] [--latency-ms 5] [--bandwidth-mbps 0]
+          [--only listing,backup] [--save] [--compare benchmarks/results/旧结果.json] [--tolerance 0.15]
+模拟服务端运行在单独的进程中，每个场景也在独立子进程中运行，峰值内存互不影响；RPC 延迟在客户端按调用计时，
+一次 system.multicall 计为一次调用。--save 把结果写入 benchmarks/results/，--compare 与旧结果逐场景对比，
+吞吐下降或 p95 延迟上升超过容差时以非零状态退出，可直接用于发版前检查。
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import xmlrpc.client
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+SCENARIOS = ['listing', 'backup', 'archive', 'comments', 'media', 'publish'] # 批量发布会新增文章，放在最后
+USER = PASSWORD = 'bench'
+
+class CallTimer:
+    """替换 Transport.request 与流式上传，逐次记录 (方法名, 耗时)；只在基准子进程中安装"""
+    METHOD_RE = re.compile(rb'<methodName>([^<]+)</methodName>')
+
+    def __init__(self):
+        self.samples, self.failures, self.lock = [], 0, threading.Lock()
+
+    def _record(self, method, start, ok):
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.samples.append((method, elapsed))
+            self.failures += not ok
+
+    def install(self):
+        from studio import media, rpc
+        timer, request, upload = self, rpc._KeepAliveMixin.request, media.StreamingMediaUpload.run
+        def timed_request(self, host, handler, request_body, verbose=False):
+            m = timer.METHOD_RE.search(request_body[:512])
+            start, ok = time.perf_counter(), False
+            try:
+                result = request(self, host, handler, request_body, verbose); ok = True
+                return result
+            finally: timer._record(m.group(1).decode() if m else '?', start, ok)
+        def timed_upload(self, progress=None):
+            start, ok = time.perf_counter(), False
+            try:
+                result = upload(self, progress); ok = True
+                return result
+            finally: timer._record('metaWeblog.newMediaObject', start, ok)
+        rpc._KeepAliveMixin.request, media.StreamingMediaUpload.run = timed_request, timed_upload
+
+    def summary(self):
+        by_method = {}
+        for method, t in self.samples: by_method.setdefault(method, []).append(t)
+        return {'calls': len(self.samples), 'failures': self.failures, **percentiles([t for _, t in self.samples]),
+                'methods': {m: {'calls': len(ts), **percentiles(ts)} for m, ts in sorted(by_method.items())}}
+
+def percentiles(values):
+    """返回毫秒为单位的 p50/p95/p99/max；样本为空时全部为 None"""
+    if not values: return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None}
+    values = sorted(values)
+    pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+    return {'p50_ms': pick(0.5), 'p95_ms': pick(0.95), 'p99_ms': pick(0.99), 'max_ms': round(values[-1] * 1000, 2)}
+
+def peak_rss_mb():
+    """当前进程的峰值常驻内存；Windows 上没有 resource 模块，返回 None"""
+    try: import resource
+    except ImportError: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1) # macOS 单位为字节，Linux 为 KB
+
+# --- 场景：准备数据后返回一个无参函数，调用它只执行被计时的部分，返回 (条目数, 附加信息) ---
+def setup_listing(studio, args, work):
+    from studio.rpc import iter_post_summaries
+    return lambda: (sum(1 for _ in iter_post_summaries(studio.client(), studio.user, studio.pwd)), {})
+
+def setup_backup(studio, args, work):
+    def run():
+        r = studio.backup_engine(workers=args.workers, incremental=False).run()
+        return r['saved'], {'failed': len(r['failed'])}
+    return run
+
+def setup_archive(studio, args, work):
+    def run():
+        r = studio.archive_backup(workers=args.workers, incremental=False).run()
+        return r['saved'] + r['media'], {'failed': len(r['failed']) + len(r['media_failed']), 'media': r['media'],
+                                         'archive_mb': round(os.path.getsize(r['path']) / 1024 / 1024, 2)}
+    return run
+
+def setup_comments(studio, args, work):
+    def run():
+        fetched, _ = studio.sync_comments(full=True)
+        return fetched, {}
+    return run
+
+def setup_media(studio, args, work):
+    folder = os.path.join(work, 'media')
+    os.makedirs(folder)
+    paths = []
+    for i in range(args.media_files):
+        paths.append(os.path.join(folder, f"bench-{i}.jpg"))
+        with open(paths[-1], 'wb') as f: f.write(os.urandom(args.media_kb * 1024)) # 随机内容，不会被哈希去重
+    def run():
+        r = studio.upload_queue(paths, concurrency=args.workers).run()
+        return r['uploaded'], {'failed': r['error']}
+    return run
+
+def setup_publish(studio, args, work):
+    folder = os.path.join(work, 'publish')
+    os.makedirs(folder)
+    rnd = random.Random(args.seed)
+    for i in range(args.publish_posts):
+        body = '\n\n'.join(f"## 小节 {s}\n\n" + ' '.join(rnd.choices(['性能', '缓存', '**并发**', '`代码`', '[链接](https://example.com)'], k=60))
+                           + f"\n\n```python\nprint({i}, {s})\n```" for s in range(max(1, int(args.body_kb))))
+        with open(os.path.join(folder, f"bench-{i:05d}.md"), 'w', encoding='utf-8') as f:
+            f.write(f"---\ntitle: 发布基准 {i}\ntags: [基准]\ncategories: [技术]\n---\n\n{body}\n")
+    def run():
+        r = studio.bulk_publisher(folder, workers=args.workers, rate=1e9).run() # 不限速，测的是管线本身
+        return r['published'] + r['updated'], {'failed': len(r['failed'])}
+    return run
+
+SETUP = {'listing': setup_listing, 'backup': setup_backup, 'archive': setup_archive, 'comments': setup_comments, 'media': setup_media, 'publish': setup_publish}
+
+def run_scenario(args):
+    """子进程入口：运行一个场景，把结果以 JSON 输出到标准输出的最后一行"""
+    from studio.core import Studio
+    work = tempfile.mkdtemp(prefix='typecho_bench_')
+    try:
+        studio = Studio(work)
+        studio.connect(args.url, USER, PASSWORD)
+        task = SETUP[args.scenario](studio, args, work)
+        control = xmlrpc.client.ServerProxy(studio.endpoint) # 标准 Transport，不计入客户端计时
+        control.bench.reset()
+        timer = CallTimer()
+        timer.install()
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        items, extra = task()
+        seconds = time.perf_counter() - start
+        server = control.bench.stats()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    result = {'items': items, 'seconds': round(seconds, 3), 'throughput': round(items / seconds, 1), **extra,
+              'latency': timer.summary(), 'requests': server['requests'], 'server_calls': server['calls'],
+              'bytes_up': server['bytes_in'], 'bytes_down': server['bytes_out'],
+              'mb_per_s': round((server['bytes_in'] + server['bytes_out']) / 1024 / 1024 / seconds, 2),
+              'rss_start_mb': rss_before, 'peak_rss_mb': peak_rss_mb()}
+    print(json.dumps(result, ensure_ascii=False))
+
+def start_mock(args):
+    cmd = [sys.executable, os.path.join(ROOT, 'benchmarks', 'mock_typecho.py'), '--posts', str(args.posts), '--comments', str(args.comments),
+           '--body-kb', str(args.body_kb), '--latency-ms', str(args.latency_ms), '--bandwidth-mbps', str(args.bandwidth_mbps), '--seed', str(args.seed),
+           '--images', str(args.images)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    url = proc.stdout.readline().strip()
+    if not url.startswith('http'):
+        proc.kill(); sys.exit("模拟服务端启动失败")
+    return proc, url
+
+def child_args(args, name, url):
+    cmd = [sys.executable, os.path.abspath(__file__), '--scenario', name, '--url', url]
+    for key in ('workers', 'body_kb', 'media_files', 'media_kb', 'publish_posts', 'seed'):
+        cmd += [f"--{key.replace('_', '-')}", str(getattr(args, key))]
+    return cmd
+
+def git_revision():
+    try: return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError): return None
+
+def fmt(value, spec):
+    return '—' if value is None else format(value, spec)
+
+def print_row(name, r):
+    lat = r['latency']
+    print(f"{name:<10}{r['items']:>8}{r['seconds']:>9.2f}s{r['throughput']:>10.1f}/s{lat['calls']:>8}"
+          f"{fmt(lat['p50_ms'], '>9.1f')}{fmt(lat['p95_ms'], '>9.1f')}{fmt(lat['p99_ms'], '>9.1f')}"
+          f"{fmt(r['peak_rss_mb'], '>10.1f')}{(r['bytes_up'] + r['bytes_down']) / 1024 / 1024:>10.1f}")
+
+def compare(baseline, current, tolerance):
+    """逐场景对比吞吐与 p95 延迟，返回出现回退的场景列表"""
+    if baseline.get('params') != current['params']: print("注意：基线的数据集或网络参数与本次不同，对比仅供参考")
+    regressions = []
+    print(f"\n与基线 {baseline.get('created')}（{baseline.get('git') or '未知版本'}）对比：")
+    for name, new in current['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if not old: continue
+        ratio = new['throughput'] / old['throughput'] if old['throughput'] else 1.0
+        p95_old, p95_new = old['latency']['p95_ms'], new['latency']['p95_ms']
+        p95_ratio = p95_new / p95_old if p95_old and p95_new else 1.0
+        # p95 只比较相对变化且差值超过 1ms 的情况，避免亚毫秒级的抖动被当成回退
+        slow = ratio < 1 - tolerance or (p95_ratio > 1 + tolerance and p95_new - p95_old > 1)
+        if slow: regressions.append(name)
+        print(f"  {name:<10}吞吐 {ratio - 1:+7.1%}  p95 {p95_ratio - 1:+7.1%}  {'回退' if slow else '正常'}")
+    return regressions
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--posts', type=int, default=10000)
+    ap.add_argument('--comments', type=int, default=20000)
+    ap.add_argument('--body-kb', type=float, default=4, help="每篇正文大约的 KB 数")
+    ap.add_argument('--latency-ms', type=float, default=5, help="模拟服务端每个请求附加的延迟")
+    ap.add_argument('--bandwidth-mbps', type=float, default=0, help="模拟服务端每条连接的带宽，0 表示不限")
+    ap.add_argument('--workers', type=int, default=4, help="备份、上传与发布的并发数")
+    ap.add_argument('--publish-posts', type=int, default=300)
+    ap.add_argument('--media-files', type=int, default=40)
+    ap.add_argument('--media-kb', type=int, default=256)
+    ap.add_argument('--images', type=int, default=200, help="正文引用的不同图片数（每 4 篇一张，归档场景下载）")
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--only', help="只运行指定场景，逗号分隔：" + ','.join(SCENARIOS))
+    ap.add_argument('--save', action='store_true', help="把结果保存到 benchmarks/results/")
+    ap.add_argument('--json', help="把结果保存为指定的 JSON 文件")
+    ap.add_argument('--compare', help="与之前保存的结果对比")
+    ap.add_argument('--tolerance', type=float, default=0.15, help="允许的相对回退幅度")
+    ap.add_argument('--scenario', help=argparse.SUPPRESS) # 子进程内部使用
+    ap.add_argument('--url', help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.scenario: return run_scenario(args)
+
+    names = [n.strip() for n in args.only.split(',')] if args.only else SCENARIOS
+    unknown = set(names) - set(SCENARIOS)
+    if unknown: sys.exit(f"未知场景：{', '.join(sorted(unknown))}")
+    names = [n for n in SCENARIOS if n in names]
+    params = {k: getattr(args, k) for k in ('posts', 'comments', 'body_kb', 'latency_ms', 'bandwidth_mbps', 'workers',
+                                            'publish_posts', 'media_files', 'media_kb', 'images', 'seed')}
+    current = {'created': datetime.now().isoformat(timespec='seconds'), 'git': git_revision(), 'python': platform.python_version(),
+               'platform': platform.platform(), 'params': params, 'scenarios': {}}
+    print(f"数据集：{args.posts} 篇文章，{args.comments} 条评论，正文约 {args.body_kb:g} KB；延迟 {args.latency_ms:g} ms，"
+          f"带宽 {'不限' if not args.bandwidth_mbps else f'{args.bandwidth_mbps:g} Mbps'}，并发 {args.workers}")
+    proc, url = start_mock(args)
+    try:
+        print(f"{'场景':<8}{'条目':>6}{'耗时':>9}{'吞吐':>10}{'调用':>6}{'p50ms':>9}{'p95ms':>9}{'p99ms':>9}{'峰值MB':>8}{'流量MB':>8}")
+        for name in names:
+            out = subprocess.run(child_args(args, name, url), stdout=subprocess.PIPE, text=True)
+            if out.returncode != 0: sys.exit(f"场景 {name} 运行失败（退出码 {out.returncode}）")
+            current['scenarios'][name] = json.loads(out.stdout.strip().splitlines()[-1])
+            print_row(name, current['scenarios'][name])
+    finally:
+        proc.terminate(); proc.wait()
+
+    targets = [args.json] if args.json else []
+    if args.save: targets.append(os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d_%H%M%S}_{current['git'] or 'local'}.json"))
+    for path in targets:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f: json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存：{path}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f: baseline = json.load(f)
+        regressions = compare(baseline, current, args.tolerance)
+        if regressions: sys.exit(f"性能回退：{', '.join(regressions)}")
+
+if __name__ == '__main__':
+    main()
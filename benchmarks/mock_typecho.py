@@ -0,0 +1,248 @@
+"""本地模拟 Typecho XMLRPC 服务端，供网络相关的基准测试使用（基于标准库 SimpleXMLRPCServer）。
+
+实现工作室用到的 metaWeblog.*、wp.getPosts、wp.getComments / editComment / deleteComment、
+newMediaObject 与 system.multicall；数据集按随机种子确定性生成，正文在读取时才生成，一万篇文章也几乎不占内存。
+指定 --images N 时每 4 篇文章引用 N 张图片中的一张，图片由 GET /usr/uploads/... 提供，供归档备份下载附件。
+每个请求按「固定延迟 + 请求与响应字节数 / 带宽」休眠后再返回，用来模拟真实网络。
+
+单独运行：python benchmarks/mock_typecho.py [--posts 10000] [--comments 20000] [--images 200] [--latency-ms 20] [--bandwidth-mbps 50]
+启动后第一行输出服务器地址，可直接作为工作室的服务器地址（账号密码默认为 bench / bench）。
+"""
+import argparse
+import random
+import re
+import threading
+import time
+import xmlrpc.client
+from datetime import datetime, timedelta
+from socketserver import ThreadingMixIn
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+
+WORDS = ("性能 缓存 并发 连接 渲染 备份 同步 评论 图片 压缩 索引 队列 线程 进程 延迟 吞吐 "
+         "Typecho XMLRPC Markdown Python SQLite HTTP gzip multicall").split()
+CATEGORIES = ['默认', '技术', '随笔', '读书', '摄影']
+COMMENT_STATUS = [('approve', 0.8), ('hold', 0.15), ('spam', 0.05)]
+EPOCH = datetime(2020, 1, 1)
+_IMAGE = re.compile(r'^/usr/uploads/2020/01/(\d+)\.png$')
+
+class _Handler(SimpleXMLRPCRequestHandler):
+    rpc_paths = ('/action/xmlrpc',)
+    protocol_version = 'HTTP/1.1' # 与真实服务器一样支持长连接
+    def log_message(self, *args): pass
+
+    def do_GET(self):
+        data = self.server.mock.asset(self.path.split('?')[0])
+        self.server.mock.throttle(0, len(data or b''))
+        if data is None: self.send_error(404); return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png' if self.path.endswith('.png') else 'application/octet-stream')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class _Server(ThreadingMixIn, SimpleXMLRPCServer):
+    daemon_threads = True
+    request_queue_size = 128
+    mock = None
+
+    def _marshaled_dispatch(self, data, dispatch_method=None, path=None):
+        response = super()._marshaled_dispatch(data, dispatch_method, path)
+        self.mock.throttle(len(data), len(response)) # 按未压缩的字节数计算传输时间
+        return response
+
+class MockTypecho:
+    """模拟服务端的数据与方法实现；start() 在后台线程中启动 HTTP 服务并返回服务器地址"""
+    def __init__(self, posts=10000, comments=20000, body_kb=4, latency_ms=0, bandwidth_mbps=0, seed=1, user='bench', password='bench',
+                 images=0, image_kb=32):
+        self.body_kb, self.seed, self.user, self.password = body_kb, seed, user, password
+        self.images, self.image_kb = images, image_kb
+        self.latency, self.bandwidth = latency_ms / 1000, bandwidth_mbps * 1e6 / 8 # 带宽换算为字节/秒，0 表示不限
+        self.lock = threading.Lock()
+        self.generated = posts
+        self.post_ids = list(range(1, posts + 1)) # 升序，分页时从末尾（最新）往前取
+        self.edited = {} # 文章 ID -> 新建或修改过的文章；其余文章按 ID 现场生成
+        rnd = random.Random(seed)
+        self.comments = {}
+        for cid in range(1, comments + 1):
+            pid = rnd.randint(1, max(1, posts))
+            status = rnd.choices([s for s, _ in COMMENT_STATUS], [w for _, w in COMMENT_STATUS])[0]
+            self.comments[cid] = {'comment_id': str(cid), 'post_id': str(pid), 'post_title': f"基准文章 {pid}",
+                                  'author': f"读者{rnd.randrange(500)}", 'content': f"第 {cid} 条评论：" + ' '.join(rnd.choices(WORDS, k=12)),
+                                  'status': status, 'date_created_gmt': xmlrpc.client.DateTime(EPOCH + timedelta(minutes=cid))}
+        self.comment_ids = sorted(self.comments) # 升序，分页时从末尾（最新）往前取
+        self.media = {} # 文件名 -> 字节数
+        self.uploads = {} # 上传后的地址路径 -> 内容，GET 时返回
+        self.reset()
+        self.server, self.url = None, ''
+
+    # --- 统计与限速 ---
+    def reset(self):
+        with self.lock: self.counters = {'requests': 0, 'bytes_in': 0, 'bytes_out': 0, 'calls': {}}
+        return True
+
+    def stats(self):
+        with self.lock: return dict(self.counters, calls=dict(self.counters['calls']))
+
+    def throttle(self, bytes_in, bytes_out):
+        with self.lock:
+            self.counters['requests'] += 1
+            self.counters['bytes_in'] += bytes_in; self.counters['bytes_out'] += bytes_out
+        delay = self.latency + ((bytes_in + bytes_out) / self.bandwidth if self.bandwidth else 0)
+        if delay: time.sleep(delay)
+
+    # --- 数据 ---
+    def _modified(self, pid): return xmlrpc.client.DateTime(EPOCH + timedelta(hours=pid))
+
+    def post(self, pid):
+        if pid in self.edited: return self.edited[pid]
+        if not 1 <= pid <= self.generated: return None
+        rnd = random.Random(self.seed * 1000003 + pid)
+        paras, size = [], 0
+        while size < self.body_kb * 1024:
+            para = f"<p>{' '.join(rnd.choices(WORDS, k=40))}，<strong>{rnd.choice(WORDS)}</strong>。</p>"
+            if rnd.random() < 0.2: para = f"<pre><code class=\"language-python\">for i in range({rnd.randrange(100)}):\n    print(i)</code></pre>"
+            paras.append(para); size += len(para.encode())
+        if self.images and pid % 4 == 0: # 多篇文章共用同一张图片，归档时按内容去重
+            paras.insert(1, f"<p><img src=\"{self.url}/usr/uploads/2020/01/{pid // 4 % self.images}.png\" alt=\"插图 {pid}\"></p>")
+        return {'postid': str(pid), 'title': f"基准文章 {pid}", 'description': f"<h2>第 {pid} 篇</h2>" + ''.join(paras),
+                'categories': [CATEGORIES[pid % len(CATEGORIES)]], 'mt_keywords': f"标签{pid % 50},基准",
+                'post_status': 'publish', 'dateCreated': self._modified(pid), 'dateModified': self._modified(pid)}
+
+    def _get_post(self, pid):
+        post = self.post(int(pid))
+        if post is None: raise xmlrpc.client.Fault(404, "文章不存在")
+        return post
+
+    def _summary(self, pid):
+        post = self.edited.get(pid)
+        title = post['title'] if post else f"基准文章 {pid}"
+        return {'post_id': str(pid), 'post_title': title, 'post_status': post['post_status'] if post else 'publish',
+                'post_modified_gmt': post['dateModified'] if post else self._modified(pid),
+                'terms_names': {'category': post['categories'] if post else [CATEGORIES[pid % len(CATEGORIES)]]}}
+
+    def _save(self, pid, data, base=None):
+        now = xmlrpc.client.DateTime(datetime.now())
+        post = dict(base or {}, **data, postid=str(pid), dateModified=now)
+        post.setdefault('dateCreated', now)
+        post.setdefault('categories', []); post.setdefault('mt_keywords', ''); post.setdefault('post_status', 'publish')
+        self.edited[pid] = post
+
+    # --- XMLRPC 方法 ---
+    def get_post(self, pid, user, pwd): return self._get_post(pid)
+
+    def get_recent_posts(self, blog_id, user, pwd, number):
+        with self.lock: ids = self.post_ids[-int(number):][::-1] if number else []
+        return [self._get_post(pid) for pid in ids]
+
+    def get_posts(self, blog_id, user, pwd, query=None):
+        query = query or {}
+        offset, number = int(query.get('offset', 0)), int(query.get('number', 10))
+        with self.lock:
+            end = max(0, len(self.post_ids) - offset)
+            ids = self.post_ids[max(0, end - number):end][::-1]
+            return [self._summary(pid) for pid in ids]
+
+    def new_post(self, blog_id, user, pwd, data, publish=True):
+        with self.lock:
+            pid = (self.post_ids[-1] if self.post_ids else 0) + 1
+            self.post_ids.append(pid)
+            self._save(pid, data)
+        return str(pid)
+
+    def edit_post(self, pid, user, pwd, data, publish=True):
+        with self.lock:
+            base = self._get_post(pid)
+            self._save(int(pid), data, base)
+        return True
+
+    def get_categories(self, blog_id, user, pwd):
+        return [{'categoryId': str(i), 'categoryName': c, 'description': c} for i, c in enumerate(CATEGORIES, 1)]
+
+    def new_media_object(self, blog_id, user, pwd, data):
+        name = data['name']
+        with self.lock:
+            self.media[name] = len(data['bits'].data)
+            self.uploads[f"/usr/uploads/bench/{name}"] = data['bits'].data
+        return {'file': name, 'url': f"{self.url}/usr/uploads/bench/{name}", 'type': data.get('type', '')}
+
+    def asset(self, path):
+        """GET 请求的内容：生成的图片按编号确定性生成，上传过的文件原样返回；不存在时返回 None"""
+        m = _IMAGE.match(path)
+        if m and int(m.group(1)) < self.images:
+            return random.Random(self.seed * 7919 + int(m.group(1))).randbytes(self.image_kb * 1024)
+        with self.lock: return self.uploads.get(path)
+
+    def get_comments(self, blog_id, user, pwd, query=None):
+        query = query or {}
+        offset, number = int(query.get('offset', 0)), int(query.get('number', 10))
+        status, post_id = query.get('status'), str(query.get('post_id') or '')
+        with self.lock:
+            if not status and not post_id: # 最常见的情况直接切片，避免每页都遍历全部评论
+                end = max(0, len(self.comment_ids) - offset)
+                return [self.comments[cid] for cid in self.comment_ids[max(0, end - number):end][::-1]]
+            match = [c for c in map(self.comments.get, reversed(self.comment_ids))
+                     if (not status or c['status'] == status) and (not post_id or c['post_id'] == post_id)]
+            return match[offset:offset + number]
+
+    def edit_comment(self, blog_id, user, pwd, comment_id, data):
+        with self.lock:
+            comment = self.comments.get(int(comment_id))
+            if comment is None: raise xmlrpc.client.Fault(404, "评论不存在")
+            comment['status'] = data.get('status', comment['status'])
+        return True
+
+    def delete_comment(self, blog_id, user, pwd, comment_id):
+        with self.lock:
+            if self.comments.pop(int(comment_id), None) is None: raise xmlrpc.client.Fault(404, "评论不存在")
+            self.comment_ids.remove(int(comment_id))
+        return True
+
+    def _method(self, name, func):
+        def call(*args):
+            if len(args) < 3 or args[1] != self.user or args[2] != self.password: raise xmlrpc.client.Fault(403, "用户名或密码错误")
+            with self.lock: self.counters['calls'][name] = self.counters['calls'].get(name, 0) + 1
+            return func(*args)
+        return call
+
+    def start(self, host='127.0.0.1', port=0):
+        self.server = _Server((host, port), _Handler, allow_none=True, logRequests=False)
+        self.server.mock = self
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        for name, func in [('metaWeblog.getPost', self.get_post), ('metaWeblog.getRecentPosts', self.get_recent_posts),
+                           ('metaWeblog.newPost', self.new_post), ('metaWeblog.editPost', self.edit_post),
+                           ('metaWeblog.getCategories', self.get_categories), ('metaWeblog.newMediaObject', self.new_media_object),
+                           ('wp.getPosts', self.get_posts), ('wp.getComments', self.get_comments),
+                           ('wp.editComment', self.edit_comment), ('wp.deleteComment', self.delete_comment)]:
+            self.server.register_function(self._method(name, func), name)
+        self.server.register_function(self.stats, 'bench.stats') # 基准脚本读取服务端计数用，不计入统计
+        self.server.register_function(self.reset, 'bench.reset')
+        self.server.register_multicall_functions()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self.server: self.server.shutdown(); self.server.server_close()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=0)
+    ap.add_argument('--posts', type=int, default=10000)
+    ap.add_argument('--comments', type=int, default=20000)
+    ap.add_argument('--body-kb', type=float, default=4, help="每篇正文大约的 KB 数")
+    ap.add_argument('--latency-ms', type=float, default=0, help="每个请求附加的固定延迟")
+    ap.add_argument('--bandwidth-mbps', type=float, default=0, help="每条连接的带宽，0 表示不限")
+    ap.add_argument('--images', type=int, default=0, help="文章引用的不同图片数，0 表示正文不含图片")
+    ap.add_argument('--image-kb', type=int, default=32)
+    ap.add_argument('--seed', type=int, default=1)
+    args = ap.parse_args()
+    mock = MockTypecho(args.posts, args.comments, args.body_kb, args.latency_ms, args.bandwidth_mbps, args.seed,
+                       images=args.images, image_kb=args.image_kb)
+    print(mock.start(args.host, args.port), flush=True)
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+
+if __name__ == '__main__':
+    main()
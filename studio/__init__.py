@@ -0,0 +1,4 @@
+"""Typecho Studio 的核心功能包（不依赖 Qt）。
+
+子模块按需导入，不在这里预先加载：命令行只为本次操作付出导入开销，GUI 见 typecho.py。
+"""
@@ -0,0 +1,170 @@
+"""DeepSeek / OpenAI 兼容接口的对话调用与长文分段润色"""
+import hashlib
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .metrics import METRICS
+from .text import _FENCE, markdown_chunk_spans, split_markdown_blocks
+
+# --- DeepSeek AI ---
+DEEPSEEK_API_URL = "https://api.deepseek.com/chat/completions"
+AI_PROMPTS = {
+    "润色": "请作为资深博客编辑，对以下内容进行润色，优化表达并保持Markdown格式：",
+    "续写": "请为我续写并完善以下文章内容：",
+}
+
+class AICancelled(Exception): pass
+
+def ai_messages(prompt_type, content):
+    prompt = AI_PROMPTS.get(prompt_type, AI_PROMPTS["续写"])
+    return [
+        {"role": "system", "content": "你是一个专业的博文写作专家。"},
+        {"role": "user", "content": f"{prompt}\n\n{content}"}
+    ]
+
+def iter_sse_events(lines):
+    """解析 server-sent events 行流，逐个产出事件的 data 字段，收到 [DONE] 即结束"""
+    buf = []
+    for raw in lines:
+        line = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+        if line.startswith(':'): continue # 注释行，通常是服务端的保活心跳
+        if line.startswith('data:'):
+            buf.append(line[5:][1:] if line[5:].startswith(' ') else line[5:]); continue
+        if not line and buf: # 空行表示一个事件结束
+            data, buf = '\n'.join(buf), []
+            if data == '[DONE]': return
+            yield data
+    if buf and '\n'.join(buf) != '[DONE]': yield '\n'.join(buf)
+
+def _counted(lines, span):
+    for line in lines:
+        span.bytes_in += len(line) + 1 # iter_lines 去掉了换行符
+        yield line
+
+def abort_response(response):
+    """从其他线程中断正在阻塞读取的流式响应。只调用 close() 不会唤醒读线程里的 recv（要等到读超时），
+    先 shutdown 底层套接字，读线程立即收到连接断开"""
+    raw = getattr(response, 'raw', None)
+    sock = getattr(getattr(raw, 'connection', None), 'sock', None)
+    if sock is None: # 连接已交还连接池时退回 http.client 的套接字文件
+        fp = getattr(getattr(raw, '_fp', None), 'fp', None)
+        sock = getattr(getattr(fp, 'raw', None), '_sock', None)
+    if sock is not None:
+        try: sock.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+    response.close()
+
+def chat_completion(api_key, model, messages, api_url=DEEPSEEK_API_URL, on_delta=None, cancel_event=None,
+                    on_response=None, timeout=(10, 120)):
+    """调用 OpenAI 兼容的 chat/completions 接口并返回完整回复（不依赖 Qt）。
+    传入 on_delta(类型, 文本) 时以 SSE 流式请求，类型为 reasoning（思考过程）或 content（正文）；
+    timeout 的第二项是两次数据之间的最长等待，而不是整个回复的总时长"""
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    import requests # 只有用到 AI 时才加载
+    stream = on_delta is not None
+    body = json.dumps({"model": model, "messages": messages, "stream": stream}).encode('utf-8')
+    with METRICS.track('ai', model, bytes_out=len(body)) as span: # 流式回复的耗时算到最后一个分段收完为止
+        response = requests.post(api_url, headers=headers, data=body, timeout=timeout, stream=stream)
+        if on_response: on_response(response)
+        with response:
+            if not stream or not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+                span.bytes_in = len(response.content)
+                res_json = response.json()
+                if "choices" not in res_json:
+                    raise RuntimeError(f"API 错误: {res_json.get('error', {}).get('message', '未知错误')}")
+                result = res_json['choices'][0]['message']['content']
+                if stream: on_delta("content", result)
+                return result
+            parts = []
+            for data in iter_sse_events(_counted(response.iter_lines(chunk_size=None), span)): # 收到一段就处理一段，不等缓冲区填满
+                if cancel_event and cancel_event.is_set(): raise AICancelled("已取消")
+                chunk = json.loads(data)
+                if "error" in chunk: raise RuntimeError(f"API 错误: {chunk['error'].get('message', '未知错误')}")
+                delta = (chunk.get('choices') or [{}])[0].get('delta') or {}
+                if delta.get('reasoning_content'): on_delta("reasoning", delta['reasoning_content'])
+                if delta.get('content'):
+                    parts.append(delta['content']); on_delta("content", delta['content'])
+            if cancel_event and cancel_event.is_set(): raise AICancelled("已取消")
+            return ''.join(parts)
+
+class RateLimiter:
+    """简单的请求间隔限速器，线程安全：保证相邻两次请求的发起时间至少相隔 1/rate 秒"""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0
+        self.lock, self.next_at = threading.Lock(), 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            at = max(now, self.next_at)
+            self.next_at = at + self.interval
+        if at > now: time.sleep(at - now)
+
+class ChunkedPolisher:
+    """长文分段并行润色（不依赖 Qt）：按标题/段落切分、限速并发请求、按原顺序和原有的段间空白拼接；
+    结果以 (模型, 提示词, 分段哈希) 为键缓存在本地，小改动后重跑只会重新发送变化的分段"""
+    segment_note = "（以下内容是长文中的一个片段，只输出处理后的该片段本身，不要添加任何说明）"
+
+    def __init__(self, api_key, model, prompt_type="润色", api_url=DEEPSEEK_API_URL, store=None,
+                 concurrency=4, rate=2.0, max_chars=3000, retries=2):
+        self.api_key, self.model, self.prompt_type, self.api_url = api_key, model, prompt_type, api_url
+        self.store, self.concurrency, self.max_chars, self.retries = store, max(1, concurrency), max_chars, retries
+        self.limiter = RateLimiter(rate)
+        self.cancel_event = threading.Event()
+
+    def cancel(self): self.cancel_event.set()
+
+    def cache_key(self, chunk):
+        prompt = AI_PROMPTS.get(self.prompt_type, AI_PROMPTS["续写"]) + self.segment_note
+        return hashlib.sha256(f"{self.model}\0{prompt}\0{hashlib.sha256(chunk.encode('utf-8')).hexdigest()}".encode()).hexdigest()
+
+    def _polish(self, chunk):
+        messages = ai_messages(self.prompt_type, chunk)
+        messages[1]["content"] = messages[1]["content"].replace("\n\n", self.segment_note + "\n\n", 1)
+        for attempt in range(self.retries + 1):
+            if self.cancel_event.is_set(): raise AICancelled("已取消")
+            self.limiter.wait()
+            try:
+                return chat_completion(self.api_key, self.model, messages, self.api_url).strip()
+            except Exception:
+                if attempt == self.retries: raise
+                time.sleep(2 ** attempt)
+
+    def run(self, text, progress=None):
+        """progress(已完成, 总段数, 缓存命中数)；返回 (拼接后的全文, 统计字典)。
+        某一段最终失败时保留原文，不影响其他段落"""
+        spans = markdown_chunk_spans(text, self.max_chars)
+        chunks = [text[a:b] for a, b in spans]
+        results, stats = [None] * len(chunks), {'total': len(chunks), 'cached': 0, 'sent': 0, 'skipped': 0, 'failed': 0}
+        todo = []
+        for i, chunk in enumerate(chunks):
+            if all(_FENCE.match(b) for b in split_markdown_blocks(chunk)): # 纯代码块无需润色
+                results[i] = chunk; stats['skipped'] += 1; continue
+            cached = self.store.ai_cached(self.cache_key(chunk)) if self.store else None
+            if cached is not None: results[i] = cached; stats['cached'] += 1
+            else: todo.append(i)
+        done = len(chunks) - len(todo)
+        if progress: progress(done, len(chunks), stats['cached'])
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            futures = {pool.submit(self._polish, chunks[i]): i for i in todo}
+            for fut in as_completed(futures):
+                i = futures[fut]
+                try:
+                    results[i] = fut.result(); stats['sent'] += 1
+                    if self.store: self.store.remember_ai(self.cache_key(chunks[i]), results[i])
+                except Exception:
+                    results[i] = chunks[i]; stats['failed'] += 1
+                done += 1
+                if progress: progress(done, len(chunks), stats['cached'])
+        if self.cancel_event.is_set(): raise AICancelled("已取消")
+        out, pos = [], 0
+        for (a, b), result in zip(spans, results): # 段与段之间沿用原文的空白，没有改动的行保持原样
+            out += [text[pos:a], result]; pos = b
+        out.append(text[pos:])
+        return ''.join(out), stats
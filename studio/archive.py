@@ -0,0 +1,354 @@
+"""单文件备份归档：ZIP 容器加 index.json 索引，附件按内容哈希去重；可随机读取任意一篇，并并行恢复到博客"""
+import hashlib
+import http.client
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import urllib.parse
+import xmlrpc.client
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from .backup import BackupEngine
+from .drafts import atomic_write
+from .media import MIME_MAP
+from .metrics import METRICS
+from .publisher import BulkPublisher
+from .rpc import iter_post_summaries
+from .text import parse_front_matter
+
+ARCHIVE_FORMAT = 1
+INDEX_NAME = 'index.json'
+# 本身已压缩的格式原样存储，省掉无效的 deflate
+STORED_EXTS = {'jpg', 'jpeg', 'png', 'gif', 'webp', 'ico', 'mp4', 'webm', 'mov', 'mp3', 'ogg', 'm4a', 'zip', 'rar', '7z', 'gz', 'pdf'}
+_URL = re.compile(r'''https?://[^\s"'<>()\[\]]+''')
+
+def media_urls(text, site_host):
+    """正文中引用的附件：本站地址或 Typecho 上传目录下、扩展名为已知媒体类型的链接，按出现顺序去重"""
+    found = {}
+    for url in _URL.findall(text or ''):
+        u = urllib.parse.urlsplit(url)
+        ext = os.path.splitext(u.path)[1].lower().lstrip('.')
+        if ext in MIME_MAP and (u.netloc == site_host or '/usr/uploads/' in u.path): found.setdefault(url)
+    return list(found)
+
+def post_document(post, pid, convert):
+    """归档中每篇文章的形式：带 id/date 的 front matter 加 Markdown 正文，恢复时直接交给批量发布"""
+    import yaml
+    meta = {'title': post.get('title') or '', 'id': str(pid)}
+    created = str(post.get('dateCreated') or '')
+    if created:
+        try: meta['date'] = datetime.strptime(created[:17], '%Y%m%dT%H:%M:%S') # xmlrpc.client.DateTime 的字符串形式
+        except ValueError: pass
+    if post.get('mt_keywords'): meta['tags'] = post['mt_keywords']
+    if post.get('categories'): meta['categories'] = list(post['categories'])
+    if post.get('post_status'): meta['status'] = post['post_status']
+    return f"---\n{yaml.safe_dump(meta, allow_unicode=True, sort_keys=False)}---\n\n{convert(post.get('description', ''))}\n"
+
+class BackupArchive:
+    """只读打开归档。ZIP 的中央目录就是随机访问索引：index.json 一次读入，单篇文章或附件按需解压"""
+    def __init__(self, path):
+        self.path, self.zf = path, zipfile.ZipFile(path)
+        try: self.index = json.loads(self.zf.read(INDEX_NAME))
+        except KeyError:
+            self.zf.close(); raise ValueError(f"不是备份归档（缺少 {INDEX_NAME}）: {path}")
+        self.posts, self.media = self.index['posts'], self.index['media'] # 文章 ID -> 条目；附件原地址 -> 条目
+
+    def close(self): self.zf.close()
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+    def read_post(self, pid): return self.zf.read(self.posts[str(pid)]['path']).decode('utf-8')
+    def open_media(self, url): return self.zf.open(self.media[url]['path'])
+
+class _Downloader:
+    """附件下载：每个线程按主机复用长连接，跟随最多 3 次重定向；内容边下载边计算哈希，大文件落到临时文件"""
+    def __init__(self, timeout=30):
+        self.timeout, self._local = timeout, threading.local()
+
+    def _conn(self, scheme, netloc):
+        conns = self._local.__dict__.setdefault('conns', {})
+        if (scheme, netloc) not in conns:
+            cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            conns[(scheme, netloc)] = cls(netloc, timeout=self.timeout)
+        return conns[(scheme, netloc)]
+
+    def _drop(self, scheme, netloc):
+        conn = self._local.__dict__.get('conns', {}).pop((scheme, netloc), None)
+        if conn: conn.close()
+
+    def _get(self, url):
+        u = urllib.parse.urlsplit(url)
+        path = urllib.parse.quote(u.path or '/', safe="/%:@!$&'()*+,;=") + (f"?{u.query}" if u.query else '')
+        for attempt in (0, 1): # 复用的长连接可能已被服务端关闭，重连一次
+            conn = self._conn(u.scheme, u.netloc)
+            try:
+                conn.request('GET', path, headers={'User-Agent': xmlrpc.client.Transport.user_agent})
+                return conn.getresponse()
+            except (http.client.HTTPException, OSError):
+                self._drop(u.scheme, u.netloc)
+                if attempt: raise
+
+    def fetch(self, url):
+        """返回 (临时文件, sha256, 字节数, Content-Type)"""
+        with METRICS.track('http', 'media_download') as span:
+            for _ in range(4):
+                u = urllib.parse.urlsplit(url)
+                try:
+                    resp = self._get(url)
+                    if resp.status in (301, 302, 303, 307, 308) and resp.getheader('Location'):
+                        resp.read(); url = urllib.parse.urljoin(url, resp.getheader('Location')); continue
+                    if resp.status != 200:
+                        resp.read(); raise OSError(f"HTTP {resp.status} {resp.reason}")
+                    tmp, h, size = tempfile.SpooledTemporaryFile(max_size=8 << 20), hashlib.sha256(), 0
+                    while True:
+                        block = resp.read(1 << 16)
+                        if not block: break
+                        tmp.write(block); h.update(block); size += len(block)
+                except (http.client.HTTPException, OSError):
+                    self._drop(u.scheme, u.netloc); raise # 读到一半出错的连接不能再复用
+                span.bytes_in = size
+                tmp.seek(0)
+                return tmp, h.hexdigest(), size, resp.getheader('Content-Type') or ''
+            raise OSError("重定向次数过多")
+
+class ArchiveBackup(BackupEngine):
+    """全站备份为单个 archive_<时间>.zip：posts/<文章 ID>.md 按 ID 命名（标题重名不会互相覆盖），
+    正文引用的附件并发下载，按内容哈希只存一份到 media/；index.json 记录文章元数据与附件地址 -> 哈希的映射。
+
+    增量模式以最新的旧归档为基础：修改时间未变的文章与已下载过的附件直接从旧归档复制，不再请求服务器。
+    归档先写入 .part 文件，完整写好后才改名，中途出错不会留下损坏的归档。
+    """
+    def __init__(self, endpoint, user, pwd, save_root, convert, workers=4, media=True, media_workers=4, **kwargs):
+        super().__init__(endpoint, user, pwd, save_root, convert, workers=workers, **kwargs)
+        self.media, self.media_workers = media, max(1, media_workers)
+        self.site_host = urllib.parse.urlsplit(endpoint).netloc
+        self.downloader = _Downloader(self.timeout)
+
+    def latest_archive(self):
+        names = sorted(n for n in os.listdir(self.save_root) if n.startswith('archive_') and n.endswith('.zip'))
+        return os.path.join(self.save_root, names[-1]) if names else None
+
+    def _open_previous(self):
+        path = self.incremental and self.latest_archive()
+        if not path: return None
+        try: return BackupArchive(path)
+        except (ValueError, zipfile.BadZipFile, OSError): return None # 旧归档损坏时当作完整备份
+
+    def run(self, progress=None):
+        """progress(已完成, 总数, 每秒项数)，文章与附件合并计数；返回与 BackupEngine.run() 相同的字段，另含附件统计"""
+        start = time.monotonic()
+        os.makedirs(self.save_root, exist_ok=True)
+        target = os.path.join(self.save_root, f"archive_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip")
+        summaries = list(iter_post_summaries(self._client(), self.user, self.pwd, cancel_event=self.cancel_event))
+        result = {'path': target, 'total': len(summaries), 'saved': 0, 'fetched': 0, 'reused': 0, 'failed': [], 'cancelled': False,
+                  'media': 0, 'media_downloaded': 0, 'media_reused': 0, 'media_failed': []}
+        index = {'format': ARCHIVE_FORMAT, 'created': datetime.now().isoformat(timespec='seconds'), 'site': self.endpoint,
+                 'posts': {}, 'media': {}, 'media_failed': {}}
+        prev = self._open_previous()
+        cached = self.store.remote_ids_with_body() if self.store else set()
+        stored = {} # 附件哈希 -> 归档内路径
+        scheduled, futures, rows = set(), {}, []
+        done, total = 0, len(summaries)
+        zf = zipfile.ZipFile(target + '.part', 'w', zipfile.ZIP_DEFLATED, compresslevel=6)
+        posts_pool = ThreadPoolExecutor(max_workers=self.workers)
+        media_pool = ThreadPoolExecutor(max_workers=self.media_workers, thread_name_prefix='media')
+
+        def tick():
+            if progress: progress(done, total, done / max(time.monotonic() - start, 1e-6))
+
+        def write_media(url, src, digest, size, ctype):
+            if digest not in stored:
+                ext = os.path.splitext(urllib.parse.urlsplit(url).path)[1].lower()
+                info = zipfile.ZipInfo(f"media/{digest[:2]}/{digest}{ext}", datetime.now().timetuple()[:6])
+                info.compress_type, info.file_size = zipfile.ZIP_STORED if ext.lstrip('.') in STORED_EXTS else zipfile.ZIP_DEFLATED, size
+                with zf.open(info, 'w') as dst: shutil.copyfileobj(src, dst, 1 << 20)
+                stored[digest] = info.filename
+            index['media'][url] = {'hash': digest, 'path': stored[digest], 'size': size, 'type': ctype}
+
+        def want_media(urls):
+            nonlocal done, total
+            for url in urls:
+                if url in scheduled: continue
+                scheduled.add(url); total += 1
+                old = prev and prev.media.get(url)
+                if old:
+                    try:
+                        if old['hash'] in stored: write_media(url, None, old['hash'], old['size'], old.get('type', ''))
+                        else:
+                            with prev.open_media(url) as src: write_media(url, src, old['hash'], old['size'], old.get('type', ''))
+                        result['media_reused'] += 1; done += 1; continue # 旧归档里已有，不再下载
+                    except KeyError: pass
+                futures[media_pool.submit(self.downloader.fetch, url)] = ('media', url)
+
+        def flush_rows():
+            if rows and self.store: self.store.upsert_remote(rows)
+            rows.clear()
+
+        def write_post(s, text, fresh, stale=False):
+            pid = s['postid']
+            urls = media_urls(text, self.site_host) if self.media else []
+            zf.writestr(f"posts/{pid}.md", text)
+            index['posts'][pid] = {'title': s['title'], 'modified': s['modified'], 'path': f"posts/{pid}.md",
+                                   'hash': hashlib.sha256(text.encode('utf-8')).hexdigest(), 'media': urls}
+            if stale: index['posts'][pid]['stale'] = True # 本次拉取失败，保留的是旧归档中的版本
+            if fresh or pid not in cached: # 本地索引按 200 篇一批写入
+                meta, body = parse_front_matter(text)
+                rows.append(dict(s, title=meta.get('title') or s['title'], tags=meta.get('tags', ''), body=body.strip(),
+                                 categories=meta.get('categories') or s['categories']))
+                if len(rows) >= 200: flush_rows()
+            want_media(urls)
+
+        try:
+            pending = []
+            for s in summaries:
+                old = prev and prev.posts.get(s['postid'])
+                if old and s['modified'] and old['modified'] == s['modified']:
+                    write_post(s, prev.read_post(s['postid']), False, old.get('stale', False))
+                    result['reused'] += 1; result['saved'] += 1; done += 1
+                else: pending.append(s)
+            tick()
+            size = self.batcher.batch_size
+            for i in range(0, len(pending), size):
+                futures[posts_pool.submit(self._fetch, pending[i:i + size])] = ('posts', pending[i:i + size])
+            while futures and not self.cancel_event.is_set():
+                finished, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    kind, item = futures.pop(fut)
+                    if kind == 'media':
+                        try:
+                            tmp, digest, size, ctype = fut.result()
+                            with tmp: write_media(item, tmp, digest, size, ctype)
+                            result['media_downloaded'] += 1
+                        except Exception as e:
+                            index['media_failed'][item] = str(e); result['media_failed'].append((item, str(e)))
+                        done += 1; continue
+                    try: posts = fut.result()
+                    except Exception as e: posts = [e] * len(item) # 整批网络失败，逐篇记为失败
+                    for s, post in zip(item, posts or []):
+                        try:
+                            if isinstance(post, Exception): raise post
+                            write_post(s, post_document(post, s['postid'], self.convert), True)
+                            result['fetched'] += 1; result['saved'] += 1
+                        except Exception as e:
+                            result['failed'].append((s['postid'], s['title'], str(e)))
+                            if prev and s['postid'] in prev.posts: write_post(s, prev.read_post(s['postid']), False, True)
+                        done += 1
+                tick()
+            flush_rows()
+            result['cancelled'] = self.cancel_event.is_set()
+            if result['cancelled']: # 不完整的归档不保留，否则下次增量会把缺失的文章与附件当作已删除
+                zf.close(); os.remove(target + '.part')
+                result['path'] = self.save_root
+            else:
+                zf.writestr(INDEX_NAME, json.dumps(index, ensure_ascii=False))
+                zf.close()
+                os.replace(target + '.part', target)
+        except BaseException:
+            self.cancel(); zf.close()
+            try: os.remove(target + '.part')
+            except OSError: pass
+            raise
+        finally:
+            posts_pool.shutdown(wait=True, cancel_futures=True); media_pool.shutdown(wait=True, cancel_futures=True)
+            if prev: prev.close()
+        result['media'] = len(index['media'])
+        if self.store and not result['cancelled']: self.store.prune_remote(s['postid'] for s in summaries)
+        result['elapsed'] = time.monotonic() - start
+        return result
+
+class ArchiveRestore:
+    """从归档恢复：附件解压后经 MediaUploadQueue 并行上传（按内容哈希去重，已上传过的直接复用地址），
+    正文中的旧附件地址替换为新地址后写入恢复目录，再交给 BulkPublisher 并发发布。
+    发布日志按恢复目录中的文件记录，中断后重新运行只会继续未完成的部分。
+
+    keep_ids=False（默认）时全部新建文章，用于迁移到新博客；True 时按原文章 ID 更新，用于同一博客回滚。
+    """
+    def __init__(self, studio, archive_path, out_dir, post_ids=None, keep_ids=False, workers=3, rate=2.0,
+                 media_workers=3, retries=4):
+        self.studio, self.archive_path, self.out_dir = studio, archive_path, out_dir
+        self.post_ids = [str(p) for p in post_ids] if post_ids else None
+        self.keep_ids, self.workers, self.rate, self.media_workers, self.retries = keep_ids, workers, rate, media_workers, retries
+        self.cancel_event = threading.Event()
+        self.uploader = self.publisher = None
+
+    def cancel(self):
+        self.cancel_event.set()
+        for task in (self.uploader, self.publisher):
+            if task: task.cancel()
+
+    def _extract_media(self, archive, urls):
+        """同一内容只解压一次；返回 (文件路径列表, 每个文件对应的原地址列表)"""
+        by_hash = {}
+        for url in urls: by_hash.setdefault(archive.media[url]['hash'], []).append(url)
+        paths, groups = [], []
+        for digest, group in by_hash.items():
+            name = os.path.basename(urllib.parse.unquote(urllib.parse.urlsplit(group[0]).path)) or digest
+            name = "".join(c for c in name if c.isalnum() or c in ' ._-') or digest
+            path = os.path.join(self.out_dir, 'media', digest[:16], name)
+            if not (os.path.exists(path) and os.path.getsize(path) == archive.media[group[0]]['size']):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with archive.open_media(group[0]) as src, open(path + '.tmp', 'wb') as dst: shutil.copyfileobj(src, dst, 1 << 20)
+                os.replace(path + '.tmp', path)
+            paths.append(path); groups.append(group)
+        return paths, groups
+
+    def _document(self, text, url_map):
+        for old in sorted((u for u in url_map if u in text), key=len, reverse=True): # 先替换长地址，避免前缀相同的地址互相干扰
+            text = text.replace(old, url_map[old])
+        if self.keep_ids: return text
+        import yaml
+        meta, body = parse_front_matter(text)
+        meta.pop('id', None) # 没有 id 的文件由批量发布新建文章
+        return f"---\n{yaml.safe_dump(meta, allow_unicode=True, sort_keys=False)}---\n{body}"
+
+    def run(self, progress=None, on_item=None):
+        """progress(阶段, 已完成, 总数)，阶段为 media / posts；on_item 同 BulkPublisher.run()。返回统计结果字典"""
+        start = time.monotonic()
+        result = {'dir': self.out_dir, 'posts': 0, 'media': 0, 'media_uploaded': 0, 'media_cached': 0, 'media_failed': [],
+                  'missing': [], 'id_map': {}, 'publish': None, 'cancelled': False, 'elapsed': 0.0}
+        with BackupArchive(self.archive_path) as archive:
+            ids = self.post_ids or sorted(archive.posts, key=lambda p: int(p) if p.isdigit() else 0)
+            result['missing'] = [p for p in ids if p not in archive.posts]
+            ids = [p for p in ids if p in archive.posts]
+            urls = list(dict.fromkeys(u for p in ids for u in archive.posts[p]['media'] if u in archive.media))
+            paths, groups = self._extract_media(archive, urls)
+            result['posts'], result['media'] = len(ids), len(paths)
+            url_map = {}
+            if paths and not self.cancel_event.is_set():
+                if progress: progress('media', 0, len(paths))
+                finished = [0]
+                def on_done(i, status, payload):
+                    finished[0] += 1
+                    if status in ('uploaded', 'cached'):
+                        for url in groups[i]: url_map[url] = payload['url']
+                    elif status == 'error': result['media_failed'].append((groups[i][0], payload))
+                    if progress: progress('media', finished[0], len(paths))
+                self.uploader = self.studio.upload_queue(paths, concurrency=self.media_workers)
+                stats = self.uploader.run(on_done=on_done)
+                result['media_uploaded'], result['media_cached'] = stats['uploaded'], stats['cached']
+            if self.cancel_event.is_set():
+                result['cancelled'] = True; return result
+            os.makedirs(os.path.join(self.out_dir, 'posts'), exist_ok=True)
+            files = {}
+            for pid in ids:
+                path = os.path.join(self.out_dir, 'posts', f"{pid}.md")
+                text = self._document(archive.read_post(pid), url_map)
+                try:
+                    with open(path, 'r', encoding='utf-8') as f: same = f.read() == text
+                except OSError: same = False
+                if not same: atomic_write(path, text) # 内容不变时不改写，发布日志据此跳过已恢复的文章
+                files[os.path.abspath(path)] = pid
+        self.publisher = BulkPublisher(self.studio, list(files), workers=self.workers, rate=self.rate, retries=self.retries)
+        if self.cancel_event.is_set(): self.publisher.cancel() # 在创建发布器之前就点了取消
+        def item(path, status, detail):
+            if status in ('published', 'updated', 'skipped') and detail: result['id_map'][files[path]] = str(detail)
+            if on_item: on_item(path, status, detail)
+        publish = self.publisher.run(lambda d, t, r: progress and progress('posts', d, t), item)
+        result.update(publish=publish, cancelled=publish['cancelled'], elapsed=time.monotonic() - start)
+        return result
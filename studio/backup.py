@@ -0,0 +1,157 @@
+"""全站备份：分页列举、批量拉取正文、内容寻址存储与增量清单"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from .drafts import atomic_write
+from .metrics import METRICS
+from .rpc import RpcBatcher, iter_post_summaries, make_rpc_proxy
+
+# --- 全站备份 ---
+class BackupEngine:
+    """全站备份引擎（不依赖 Qt）：分页列举文章，线程池并发拉取正文，单篇失败只记录不中断。
+
+    增量模式下依据 manifest.json 中记录的修改时间跳过未变化的文章；正文按内容哈希存入
+    objects/ 目录，每个快照目录只是指向对象的硬链接，重复内容只占一份磁盘空间。
+    """
+    def __init__(self, endpoint, user, pwd, save_root, convert, workers=4, retries=2, timeout=30, incremental=True, store=None,
+                 batch_size=20, gzip_requests=False):
+        self.endpoint, self.user, self.pwd = endpoint, user, pwd
+        self.save_root, self.convert = save_root, convert
+        self.workers, self.retries, self.timeout = max(1, workers), retries, timeout
+        self.incremental, self.store = incremental, store
+        self.batcher, self.gzip_requests = RpcBatcher(batch_size), gzip_requests
+        self.manifest_path = os.path.join(save_root, 'manifest.json')
+        self.objects_dir = os.path.join(save_root, 'objects')
+        self.cancel_event = threading.Event()
+        self._local = threading.local()
+
+    def cancel(self): self.cancel_event.set()
+
+    def _client(self):
+        if getattr(self._local, 'client', None) is None:
+            self._local.client = make_rpc_proxy(self.endpoint, self.timeout, self.gzip_requests)
+        return self._local.client
+
+    def _fetch(self, summaries):
+        """一次 system.multicall 拉取一批文章；返回与 summaries 对应的文章字典或 Fault，取消时返回 None"""
+        calls = [('metaWeblog.getPost', (s['postid'], self.user, self.pwd)) for s in summaries]
+        for attempt in range(self.retries + 1):
+            if self.cancel_event.is_set(): return None
+            try:
+                return self.batcher.run(self._client(), calls)
+            except Exception:
+                self._local.client = None # 连接可能已损坏，下次重建
+                if attempt == self.retries: raise
+                time.sleep(0.5 * 2 ** attempt)
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f: return json.load(f).get('posts', {})
+        except (OSError, ValueError): return {}
+
+    def _save_manifest(self, posts):
+        atomic_write(self.manifest_path, json.dumps({'updated': datetime.now().isoformat(timespec='seconds'), 'posts': posts}, ensure_ascii=False))
+
+    def object_path(self, digest): return os.path.join(self.objects_dir, digest[:2], f"{digest}.md")
+
+    def _store(self, summary, post):
+        """渲染并写入内容寻址存储，返回哈希；相同内容只写一次"""
+        pid, title = summary['postid'], post.get('title') or summary['title']
+        content = self.convert(post.get('description', ''))
+        meta = f"---\ntitle: {title}\nid: {pid}\ncategories: {post.get('categories', [])}\ntags: {post.get('mt_keywords', '')}\n---\n\n"
+        data = (meta + content).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            with METRICS.track('disk', 'backup_object', bytes_out=len(data)):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path + '.tmp', 'wb') as f: f.write(data)
+                os.replace(path + '.tmp', path)
+        if self.store:
+            self.store.upsert_remote([dict(summary, title=title, tags=post.get('mt_keywords', ''),
+                                           categories=post.get('categories') or summary['categories'], body=content)])
+        return digest, title
+
+    def _fill_store(self, summaries, manifest):
+        """未变化的文章不会重新拉取，若本地索引中还没有正文则从对象存储补齐"""
+        cached = self.store.remote_ids_with_body()
+        missing = []
+        for s in summaries:
+            entry = manifest.get(s['postid'])
+            if not entry or s['postid'] in cached: continue
+            try:
+                with open(self.object_path(entry['hash']), 'r', encoding='utf-8') as f: text = f.read()
+            except OSError: continue
+            missing.append(dict(s, body=text.split('\n---\n\n', 1)[-1]))
+        if missing: self.store.upsert_remote(missing)
+
+    def _link(self, save_path, pid, title, digest):
+        safe_title = "".join([i for i in title if i.isalnum() or i in (' ', '_')]).rstrip()
+        if not safe_title: safe_title = f"post_{pid}"
+        target = os.path.join(save_path, f"{safe_title}.md")
+        if os.path.exists(target): target = os.path.join(save_path, f"{safe_title}_{pid}.md") # 标题重名时追加 ID
+        try: os.link(self.object_path(digest), target)
+        except OSError: shutil.copyfile(self.object_path(digest), target) # 文件系统不支持硬链接时退回复制
+
+    def run(self, progress=None):
+        """progress(已完成, 总数, 每秒篇数)；返回统计结果字典"""
+        start = time.monotonic()
+        save_path = os.path.join(self.save_root, f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        os.makedirs(save_path, exist_ok=True)
+        old = self.load_manifest() if self.incremental else {}
+        summaries = list(iter_post_summaries(self._client(), self.user, self.pwd, cancel_event=self.cancel_event))
+        result = {'path': save_path, 'total': len(summaries), 'saved': 0, 'fetched': 0, 'reused': 0, 'failed': [], 'cancelled': False}
+        manifest, pending = {}, []
+        for s in summaries:
+            entry = old.get(s['postid'])
+            # 只有服务端给出修改时间且与清单一致、对象仍在时才跳过拉取
+            if entry and s['modified'] and entry.get('modified') == s['modified'] and os.path.exists(self.object_path(entry['hash'])):
+                manifest[s['postid']] = entry
+                self._link(save_path, s['postid'], entry.get('title', s['title']), entry['hash'])
+                result['reused'] += 1; result['saved'] += 1
+            else:
+                pending.append(s)
+        done = result['reused']
+        if progress and done: progress(done, len(summaries), done / max(time.monotonic() - start, 1e-6))
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            size = self.batcher.batch_size
+            batches = [pending[i:i + size] for i in range(0, len(pending), size)]
+            futures = {pool.submit(self._fetch, batch): batch for batch in batches}
+            for fut in as_completed(futures):
+                batch = futures[fut]
+                try: posts = fut.result()
+                except Exception as e: posts = [e] * len(batch) # 整批网络失败，逐篇记为失败
+                for s, post in zip(batch, posts or []):
+                    try:
+                        if isinstance(post, Exception): raise post
+                        digest, title = self._store(s, post)
+                        manifest[s['postid']] = {'modified': s['modified'], 'hash': digest, 'title': title}
+                        self._link(save_path, s['postid'], title, digest)
+                        result['fetched'] += 1; result['saved'] += 1
+                    except Exception as e:
+                        result['failed'].append((s['postid'], s['title'], str(e)))
+                        if s['postid'] in old: manifest[s['postid']] = old[s['postid']] # 保留旧记录，下次重试
+                    done += 1
+                if progress: progress(done, len(summaries), done / max(time.monotonic() - start, 1e-6))
+                if self.cancel_event.is_set(): break
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        result['cancelled'] = self.cancel_event.is_set()
+        if self.store and not result['cancelled']:
+            self._fill_store(summaries, manifest)
+            self.store.prune_remote(s['postid'] for s in summaries)
+        if result['cancelled']:
+            # 取消时未处理的文章（包括列表没拉完、根本没列出来的）沿用旧记录，避免被误判为已删除
+            for pid, entry in old.items(): manifest.setdefault(pid, entry)
+        with open(os.path.join(save_path, 'snapshot.json'), 'w', encoding='utf-8') as f:
+            json.dump({pid: e['hash'] for pid, e in manifest.items()}, f)
+        self._save_manifest(manifest)
+        result['elapsed'] = time.monotonic() - start
+        return result
@@ -0,0 +1,220 @@
+"""命令行入口：无需显示器即可备份、批量发布、同步与审核评论，适合放进 cron / 计划任务。
+
+用法：python -m studio [--base-dir 目录] [--host 地址 --user 账号 --password 密码] <命令> ...
+  backup [--full] [--workers N] [--archive [--no-media]]  全站备份（默认增量）；--archive 写成含附件的单个 zip 归档
+  restore <归档> [--list | --show ID] [--post ID...]      从归档恢复到博客（附件重新上传），可断点续传
+  publish <目录> [--workers N] [--rate R]                 发布目录中带 front matter 的 Markdown 文件，可断点续传
+  sync [--two-way [--pull-new] [--dry-run]]              刷新索引；--two-way 与草稿目录双向同步（先重放离线队列）
+  resolve <文件> --keep local|remote                       解决双向同步的冲突
+  comments [--status S] [--post ID] [--full]             同步评论；加 --approve/--spam/--delete ID... 批量审核
+加 --metrics 文件 时在命令结束后导出各 XMLRPC 调用、渲染与写盘的耗时统计（.json 或 Prometheus 文本）。
+密码也可以通过环境变量 TYPECHO_PASSWORD 提供。
+"""
+import argparse
+import os
+import sys
+import time
+
+from .core import Studio, StudioError
+from .logs import FileLogger
+from .metrics import METRICS
+
+class _Console:
+    """命令行的日志：写入 studio_log.txt，同时把 INFO 及以上打印到终端（错误打印到 stderr）"""
+    def __init__(self, path, quiet=False):
+        self.quiet = quiet
+        self.logger = FileLogger(path, on_record=self._print)
+
+    def _print(self, rec):
+        _, level, text, _ = rec
+        if level == 'ERROR': print(text, file=sys.stderr)
+        elif not self.quiet and level != 'DEBUG': print(text)
+
+    def __call__(self, level, text): self.logger.log(level, text)
+
+    def close(self): self.logger.close()
+
+def cmd_backup(studio, args, log):
+    archive = args.archive or studio.config['backup_archive']
+    if archive: engine = studio.archive_backup(workers=args.workers, incremental=not args.full, media=not args.no_media)
+    else: engine = studio.backup_engine(workers=args.workers, incremental=not args.full)
+    log('INFO', f"开始全站{'完整' if args.full else '增量'}{'归档' if archive else ''}备份 (并发 {engine.workers}) -> {studio.dir_backups}")
+    last = [0.0]
+    def progress(done, total, rate):
+        if time.monotonic() - last[0] >= 2 or done == total: # 每两秒报告一次进度
+            last[0] = time.monotonic(); log('DEBUG' if args.quiet else 'INFO', f"备份中 {done}/{total} ({rate:.1f} 项/秒)")
+    result = engine.run(progress)
+    for pid, title, err in result['failed']: log('WARNING', f"文章 {pid}《{title}》备份失败: {err}")
+    for url, err in result.get('media_failed', []): log('WARNING', f"附件下载失败 {url}: {err}")
+    log('SUCCESS', f"备份完成：已导出 {result['saved']}/{result['total']} 篇 (新拉取 {result['fetched']}，未变化 {result['reused']})，"
+                   f"失败 {len(result['failed'])} 篇，耗时 {result['elapsed']:.1f} 秒 -> {result['path']}")
+    if archive: log('INFO', f"附件 {result['media']} 个 (新下载 {result['media_downloaded']}，沿用旧归档 {result['media_reused']}，"
+                            f"失败 {len(result['media_failed'])})")
+    return 1 if result['failed'] else 0
+
+def cmd_restore(studio, args, log):
+    if not os.path.isfile(args.archive): raise StudioError(f"文件不存在: {args.archive}")
+    if args.list or args.show:
+        try: archive = studio.open_archive(args.archive)
+        except Exception as e: raise StudioError(f"无法读取归档: {e}")
+        with archive:
+            if args.show:
+                if args.show not in archive.posts: raise StudioError(f"归档中没有文章 {args.show}")
+                print(archive.read_post(args.show)); return 0
+            for pid, p in sorted(archive.posts.items(), key=lambda x: int(x[0]) if x[0].isdigit() else 0):
+                print(f"{pid:>8}  {p['modified'][:17]:<17}  附件 {len(p['media']):<3} {p['title']}{'  (旧版本)' if p.get('stale') else ''}")
+            log('INFO', f"归档创建于 {archive.index['created']}：文章 {len(archive.posts)} 篇，附件 {len(archive.media)} 个")
+        return 0
+    restore = studio.archive_restore(args.archive, args.post, args.keep_ids, args.workers, args.rate)
+    log('INFO', f"开始从 {os.path.basename(args.archive)} 恢复{'（按原文章 ID 更新）' if args.keep_ids else ''} -> {studio.endpoint}")
+    names = {'published': '已发布为', 'updated': '已更新', 'skipped': '已恢复过，跳过'}
+    last = [0.0]
+    def progress(stage, done, total):
+        if stage == 'media' and (time.monotonic() - last[0] >= 2 or done == total):
+            last[0] = time.monotonic(); log('DEBUG' if args.quiet else 'INFO', f"上传附件 {done}/{total}")
+    def on_item(path, status, detail):
+        if status == 'failed': log('ERROR', f"{os.path.basename(path)} 恢复失败: {detail}")
+        else: log('DEBUG' if status == 'skipped' else 'SUCCESS', f"{os.path.basename(path)} {names[status]} 文章 {detail}")
+    result = restore.run(progress, on_item)
+    for pid in result['missing']: log('WARNING', f"归档中没有文章 {pid}")
+    for path, err in result['media_failed']: log('ERROR', f"附件上传失败 {path}: {err}")
+    if result['cancelled'] and not result['publish']:
+        log('WARNING', "已取消"); return 1
+    pub = result['publish']
+    log('INFO', f"恢复结束：文章 {result['posts']} 篇 (新发布 {pub['published']}，更新 {pub['updated']}，跳过 {pub['skipped']}，"
+                f"失败 {len(pub['failed'])})，附件 {result['media']} 个 (上传 {result['media_uploaded']}，复用 {result['media_cached']}，"
+                f"失败 {len(result['media_failed'])})，耗时 {result['elapsed']:.1f} 秒")
+    return 1 if pub['failed'] or result['media_failed'] or result['missing'] else 0
+
+def cmd_publish(studio, args, log):
+    if not os.path.isdir(args.dir): raise StudioError(f"目录不存在: {args.dir}")
+    publisher = studio.bulk_publisher(args.dir, args.workers, args.rate, args.retries)
+    log('INFO', f"开始批量发布 {len(publisher.paths)} 个文件 (并发 {publisher.workers}) -> {studio.endpoint}")
+    names = {'published': '已发布为', 'updated': '已更新', 'skipped': '未变化，跳过'}
+    def on_item(path, status, detail):
+        if status == 'failed': log('ERROR', f"{os.path.basename(path)} 发布失败: {detail}")
+        else: log('DEBUG' if status == 'skipped' else 'SUCCESS', f"{os.path.basename(path)} {names[status]} 文章 {detail}")
+    result = publisher.run(on_item=on_item)
+    log('INFO', f"批量发布结束：新发布 {result['published']}，更新 {result['updated']}，跳过 {result['skipped']}，"
+                f"失败 {len(result['failed'])}，耗时 {result['elapsed']:.1f} 秒")
+    return 1 if result['failed'] else 0
+
+SYNC_ACTIONS = {'push': '推送', 'push_new': '新建', 'pull': '拉取', 'pull_new': '拉取新文章', 'conflict': '冲突',
+                'local_deleted': '本地已删除', 'remote_deleted': '远程已删除', 'error': '失败'}
+
+def cmd_sync(studio, args, log):
+    if args.two_way: return cmd_two_way(studio, args, log)
+    result = studio.sync(lambda n: log('DEBUG', f"已同步 {n} 篇文章摘要"))
+    log('SUCCESS', f"同步完成：远程文章 {result['remote']} 篇，本地文件变化 {result['local_changed']} 个、删除 {result['local_removed']} 个")
+    return 0
+
+def cmd_two_way(studio, args, log):
+    engine = studio.sync_engine(args.dir, args.pull_new)
+    def on_item(kind, target, note):
+        level = 'ERROR' if kind == 'error' else 'WARNING' if kind in ('conflict', 'remote_deleted') else 'INFO'
+        log(level, f"[{SYNC_ACTIONS[kind]}] {os.path.basename(target)} {note}".rstrip())
+    result = engine.run(dry_run=args.dry_run, on_item=on_item)
+    if result['offline']:
+        log('WARNING', "无法连接服务器：本地修改已由哈希记录，下次同步时自动推送"); return 1
+    for kind, err in result['replay_failed']: log('ERROR', f"离线队列中的操作 {kind} 被服务端拒绝: {err}")
+    p = result['plan']
+    if args.dry_run:
+        log('INFO', f"预览：推送 {p['push']}，新建 {p['push_new']}，拉取 {p['pull']}，拉取新文章 {p['pull_new']}，冲突 {p['conflict']}，"
+                    f"未变化 {p['unchanged']}（未做任何修改）")
+    else:
+        log('SUCCESS', f"双向同步完成：推送 {result['push']}，新建 {result['push_new']}，拉取 {result['pull']}，拉取新文章 {result['pull_new']}，"
+                       f"冲突 {len(result['conflicts'])}，未变化 {p['unchanged']}，离线队列重放 {result['replayed']}")
+    if result['conflicts']: log('WARNING', "冲突文件请用 resolve <文件> --keep local|remote 选择保留哪一边")
+    return 1 if result['conflicts'] or result['errors'] or result['replay_failed'] else 0
+
+def cmd_resolve(studio, args, log):
+    if not os.path.isfile(args.file): raise StudioError(f"文件不存在: {args.file}")
+    try: studio.sync_engine(os.path.dirname(os.path.abspath(args.file))).resolve(args.file, args.keep)
+    except ValueError as e: raise StudioError(str(e))
+    log('SUCCESS', f"已解决冲突：{os.path.basename(args.file)} 以{'本地文件' if args.keep == 'local' else '远程文章'}为准")
+    return 0
+
+def cmd_comments(studio, args, log):
+    action = next(((a, ids) for a, ids in (('approve', args.approve), ('spam', args.spam), ('delete', args.delete)) if ids), None)
+    if action:
+        done, failed = studio.moderate_comments(action[1], action[0])
+        for cid, err in failed: log('ERROR', f"评论 {cid} 操作失败: {err}")
+        log('SUCCESS', f"已{ACTION_NAMES[action[0]]} {len(done)} 条评论")
+        if action[0] == 'delete': studio.store.delete_comments(done)
+        else: studio.store.set_comment_status(done, action[0])
+        return 1 if failed else 0
+    fetched, fresh = studio.sync_comments(args.status, args.post, args.full)
+    log('SUCCESS', f"评论同步完成：拉取 {fetched} 条，其中新评论 {fresh} 条")
+    for c in studio.store.list_comments(args.status, args.post)[:args.list]:
+        print(f"{c['comment_id']:>8}  {c['status']:<8} {c['author'][:12]:<12} {c['post_title'][:20]:<20} {c['content'][:60]!r}")
+    return 0
+
+ACTION_NAMES = {'approve': '通过', 'spam': '标为垃圾', 'delete': '删除'}
+COMMANDS = {'backup': cmd_backup, 'restore': cmd_restore, 'publish': cmd_publish, 'sync': cmd_sync, 'resolve': cmd_resolve, 'comments': cmd_comments}
+
+def build_parser():
+    ap = argparse.ArgumentParser(prog='typecho-studio', description='Typecho Studio 命令行（不依赖图形界面）')
+    ap.add_argument('--base-dir', help='程序目录（config.yaml、studio.db、content/ 所在位置），默认为程序所在目录')
+    ap.add_argument('--host', help='博客地址，默认取 config.yaml')
+    ap.add_argument('--user', help='账号，默认取 config.yaml')
+    ap.add_argument('--password', help='密码，默认取环境变量 TYPECHO_PASSWORD 或 config.yaml')
+    ap.add_argument('-q', '--quiet', action='store_true', help='只输出错误')
+    ap.add_argument('--metrics', metavar='FILE', help='命令结束后导出耗时统计，.json 为 JSON，其他扩展名为 Prometheus 文本')
+    sub = ap.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('backup', help='全站备份')
+    p.add_argument('--full', action='store_true', help='完整备份，不跳过未变化的文章')
+    p.add_argument('--workers', type=int, help='并发数，默认取 config.yaml 的 backup_workers')
+    p.add_argument('--archive', action='store_true', help='写成单个 zip 归档并下载正文引用的附件（config.yaml 的 backup_archive 为 true 时默认如此）')
+    p.add_argument('--no-media', action='store_true', help='归档时不下载附件')
+    p = sub.add_parser('restore', help='从 backup --archive 生成的归档恢复到博客')
+    p.add_argument('archive', help='archive_*.zip 文件')
+    group = p.add_mutually_exclusive_group()
+    group.add_argument('--list', action='store_true', help='只列出归档中的文章，不连接服务器')
+    group.add_argument('--show', metavar='ID', help='输出归档中某篇文章的 Markdown，不连接服务器')
+    p.add_argument('--post', nargs='+', metavar='ID', help='只恢复这些文章 ID，默认全部')
+    p.add_argument('--keep-ids', action='store_true', help='按原文章 ID 更新（回滚同一博客）；默认全部新建（迁移到新博客）')
+    p.add_argument('--workers', type=int, help='发布并发数，默认取 config.yaml 的 publish_workers')
+    p.add_argument('--rate', type=float, help='每秒最多发出的请求数，默认取 config.yaml 的 publish_rate')
+    p = sub.add_parser('publish', help='批量发布目录中的 Markdown 文件')
+    p.add_argument('dir', help='Markdown 文件所在目录，如 content/drafts')
+    p.add_argument('--workers', type=int, help='并发数，默认取 config.yaml 的 publish_workers')
+    p.add_argument('--rate', type=float, help='每秒最多发出的请求数，默认取 config.yaml 的 publish_rate')
+    p.add_argument('--retries', type=int, default=4, help='网络错误时的最大重试次数，间隔按指数增长 (默认 4)')
+    p = sub.add_parser('sync', help='刷新远程文章列表与本地文件索引；--two-way 时与草稿目录双向同步')
+    p.add_argument('--two-way', action='store_true', help='双向同步：推送本地修改、拉取远程修改，冲突只标记不覆盖')
+    p.add_argument('--dir', help='双向同步的目录，默认 content/drafts')
+    p.add_argument('--pull-new', action='store_true', help='同时把目录中还没有的远程文章拉取为新文件')
+    p.add_argument('--dry-run', action='store_true', help='只列出将要进行的操作')
+    p = sub.add_parser('resolve', help='解决双向同步的冲突')
+    p.add_argument('file', help='冲突的文件')
+    p.add_argument('--keep', choices=['local', 'remote'], required=True, help='保留本地文件还是远程文章')
+    p = sub.add_parser('comments', help='同步或批量审核评论')
+    p.add_argument('--status', choices=['hold', 'approve', 'spam'], help='只处理该状态的评论')
+    p.add_argument('--post', help='只处理该文章 ID 下的评论')
+    p.add_argument('--full', action='store_true', help='全量重新同步当前筛选范围')
+    p.add_argument('--list', type=int, default=20, metavar='N', help='同步后列出最新的 N 条 (默认 20)')
+    group = p.add_mutually_exclusive_group()
+    for name in ('approve', 'spam', 'delete'):
+        group.add_argument(f'--{name}', type=int, nargs='+', metavar='ID')
+    return ap
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    studio = Studio(args.base_dir and os.path.abspath(args.base_dir))
+    c = studio.config
+    studio.connect(args.host or c['host'], args.user or c['user'], args.password or os.environ.get('TYPECHO_PASSWORD') or c['pass'], c['rpc_gzip'])
+    log = _Console(studio.log_file_path, args.quiet)
+    log('DEBUG', f"命令行：{args.command}") # 不记录完整参数，避免密码写进日志
+    try:
+        return COMMANDS[args.command](studio, args, log)
+    except StudioError as e:
+        log('ERROR', str(e)); return 2
+    except KeyboardInterrupt:
+        log('WARNING', "已中断"); return 130
+    except Exception as e:
+        log('ERROR', f"{args.command} 失败: {e}"); return 1
+    finally:
+        if args.metrics:
+            try: METRICS.dump(args.metrics)
+            except OSError as e: log('ERROR', f"导出性能统计失败: {e}")
+        log.close()
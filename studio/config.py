@@ -0,0 +1,35 @@
+"""程序目录与 config.yaml 配置的读写"""
+import os
+import sys
+
+from .ai import DEEPSEEK_API_URL
+from .drafts import atomic_write
+
+CONFIG_DEFAULTS = {
+    'host': '', 'user': '', 'pass': '', 'ai_key': '',
+    'backup_workers': 4, 'backup_incremental': True, 'backup_archive': False, 'upload_workers': 3,
+    'image_optimize': False, 'image_max_width': 1600, 'image_quality': 82, 'image_webp': False, 'image_srcset': False,
+    'ai_api_url': DEEPSEEK_API_URL, 'ai_chunked': True, 'ai_chunk_chars': 3000,
+    'rpc_batch_size': 20, 'rpc_gzip': False,
+    'publish_workers': 3, 'publish_rate': 2.0,
+    'metrics_enabled': True,
+}
+
+def default_base_dir():
+    """打包为 EXE 时是 EXE 所在的真实目录，源码运行时是 typecho.py 所在目录"""
+    if getattr(sys, 'frozen', False): return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_config(path):
+    """读取 config.yaml 并补齐默认值；文件不存在或为空时返回默认配置"""
+    config = dict(CONFIG_DEFAULTS)
+    if os.path.exists(path):
+        import yaml # 只在读写配置时加载
+        with open(path, 'r', encoding='utf-8') as f: data = yaml.safe_load(f)
+        if data: config.update({k: v for k, v in data.items() if v is not None})
+    config['ai_api_url'] = config['ai_api_url'] or DEEPSEEK_API_URL # 可指向其他 OpenAI 兼容接口
+    return config
+
+def save_config(path, config):
+    import yaml
+    atomic_write(path, yaml.dump(dict(config)))
@@ -0,0 +1,217 @@
+"""应用核心（不依赖 Qt）：目录、配置、本地缓存与发布/备份/同步/上传/评论操作，GUI 与命令行都只是它的前端"""
+import os
+import time
+from datetime import datetime
+
+from .config import default_base_dir, load_config, save_config
+from .drafts import atomic_write, draft_filename
+from .metrics import METRICS
+from .rpc import rpc_endpoint, make_rpc_proxy, RpcBatcher, iter_post_summaries, sync_comments, moderate_comments
+from .text import parse_front_matter
+
+class StudioError(Exception):
+    """配置缺失等无法继续执行的错误，消息可直接展示给用户"""
+
+STATUS_MAP = {"公开": "publish", "待审核": "pending", "私密": "private", "隐藏": "hidden", "密码保护": "password"} # 界面文字 -> post_status
+
+class Studio:
+    """一个程序目录对应一个实例；连接信息默认取自 config.yaml，可用 connect() 覆盖"""
+    def __init__(self, base_dir=None):
+        self.base_dir = base_dir or default_base_dir()
+        self.config_path = os.path.join(self.base_dir, 'config.yaml')
+        self.log_file_path = os.path.join(self.base_dir, 'studio_log.txt')
+        self.dir_drafts = os.path.join(self.base_dir, 'content', 'drafts')
+        self.dir_sent = os.path.join(self.base_dir, 'content', 'sent')
+        self.dir_backups = os.path.join(self.base_dir, 'backups')
+        self.db_path = os.path.join(self.base_dir, 'studio.db')
+        self.dir_optimized = os.path.join(self.base_dir, 'cache', 'optimized')
+        for d in [self.dir_drafts, self.dir_sent, self.dir_backups]:
+            os.makedirs(d, exist_ok=True)
+        self.config = load_config(self.config_path)
+        METRICS.enabled = bool(self.config['metrics_enabled']) # 计时开销很小，默认开启
+        self.connect(self.config['host'], self.config['user'], self.config['pass'], self.config['rpc_gzip'])
+        self._store = self._drafts = self._markdown = None
+
+    # 本地缓存与渲染服务在第一次用到时才创建，命令行只加载本次操作需要的模块
+    @property
+    def store(self):
+        if self._store is None:
+            from .store import StudioStore
+            self._store = StudioStore(self.db_path)
+        return self._store
+
+    @property
+    def drafts(self):
+        if self._drafts is None:
+            from .drafts import DraftManager
+            self._drafts = DraftManager(self.store, self.dir_drafts)
+        return self._drafts
+
+    @property
+    def markdown_service(self):
+        if self._markdown is None:
+            from .render import MarkdownService
+            self._markdown = MarkdownService() # 发布与预览共用，扩展只加载一次
+        return self._markdown
+
+    def save_config(self, changes):
+        self.config.update(changes)
+        save_config(self.config_path, self.config)
+
+    def local_folders(self): return [(self.dir_drafts, "草稿"), (self.dir_sent, "发布")]
+
+    # --- 连接 ---
+    def connect(self, host, user, pwd, gzip_requests=False):
+        self.host, self.user, self.pwd, self.gzip_requests = host, user, pwd, gzip_requests
+        self.endpoint = rpc_endpoint(host) if host else None
+
+    def client(self, timeout=30):
+        """新建一个 ServerProxy；ServerProxy 不是线程安全的，每个线程各建一个"""
+        if not self.endpoint: raise StudioError("未配置服务器地址：请先在 GUI 中同步一次，或用 --host/--user/--password 指定")
+        return make_rpc_proxy(self.endpoint, timeout, self.gzip_requests)
+
+    # --- 发布 ---
+    def post_payload(self, title, content, categories=(), tags='', status='publish', date=None):
+        """把 Markdown 渲染为发布用的 metaWeblog 结构；date 为 datetime 时作为文章发布时间"""
+        payload = {'title': title, 'description': self.markdown_service.render(content), 'categories': list(categories),
+                   'mt_keywords': tags, 'post_status': status}
+        if date: payload['dateCreated'] = date
+        return payload
+
+    def publish(self, title, content, categories=(), tags='', status='publish', post_id=None, date=None, client=None):
+        """同步发布或更新一篇文章，返回文章 ID"""
+        payload = self.post_payload(title, content, categories, tags, status, date)
+        client = client or self.client(60)
+        if post_id: client.metaWeblog.editPost(post_id, self.user, self.pwd, payload, True)
+        else: post_id = client.metaWeblog.newPost(1, self.user, self.pwd, payload, True)
+        self.record_published(post_id, title, content, payload)
+        return str(post_id)
+
+    def record_published(self, post_id, title, content, payload):
+        """发布成功后更新本地索引，并把正文存入 sent 目录"""
+        self.store.upsert_remote([{'postid': str(post_id), 'title': title, 'tags': payload['mt_keywords'],
+                                   'categories': payload['categories'], 'author': self.user, 'body': content,
+                                   'modified': datetime.now().strftime('%Y%m%dT%H:%M:%S')}])
+        return self.save_sent(title, content)
+
+    def save_sent(self, title, content):
+        path = os.path.join(self.dir_sent, draft_filename(title))
+        atomic_write(path, content)
+        return path
+
+    def read_post_file(self, path):
+        """读取带 front matter 的 Markdown 文件，返回 publish() 的关键字参数"""
+        with open(path, 'r', encoding='utf-8') as f: return self.post_fields(f.read(), path)
+
+    @staticmethod
+    def post_fields(text, path):
+        """front matter 中的 title/tags/categories/status/date 转为 publish() 的参数；没有标题时用文件名，
+        带 id（全站备份导出的文件）时更新原文章"""
+        meta, body = parse_front_matter(text)
+        tags = meta.get('tags') or ''
+        cats = meta.get('categories') or meta.get('category') or []
+        status = str(meta.get('status') or 'publish')
+        date = meta.get('date')
+        if date and not isinstance(date, datetime):
+            date = datetime.fromisoformat(str(date)) if not hasattr(date, 'year') else datetime(date.year, date.month, date.day)
+        return {'title': str(meta.get('title') or os.path.splitext(os.path.basename(path))[0]), 'content': body.strip(),
+                'categories': [cats] if isinstance(cats, str) else list(cats),
+                'tags': tags if isinstance(tags, str) else ','.join(map(str, tags)),
+                'status': STATUS_MAP.get(status, status), 'date': date, 'post_id': str(meta['id']) if meta.get('id') else None}
+
+    def bulk_publisher(self, folder, workers=None, rate=None, retries=4):
+        """目录中的 Markdown 文件按文件名排序交给 BulkPublisher；同一目录重复运行只会发布新增或修改过的文件"""
+        from .publisher import BulkPublisher
+        self.client()
+        paths = sorted(os.path.join(folder, n) for n in os.listdir(folder) if n.endswith('.md'))
+        return BulkPublisher(self, paths, workers=workers or self.config['publish_workers'],
+                             rate=rate or self.config['publish_rate'], retries=retries)
+
+    # --- 备份 ---
+    def backup_engine(self, workers=None, incremental=None, batch_size=None):
+        from .backup import BackupEngine
+        from .html2md import clean_html
+        self.client() # 未配置服务器时尽早报错
+        return BackupEngine(self.endpoint, self.user, self.pwd, self.dir_backups, clean_html,
+                            workers=workers or self.config['backup_workers'],
+                            incremental=self.config['backup_incremental'] if incremental is None else incremental,
+                            store=self.store, batch_size=batch_size or self.config['rpc_batch_size'], gzip_requests=self.gzip_requests)
+
+    def archive_backup(self, workers=None, incremental=None, batch_size=None, media=True):
+        """单文件归档备份（含正文引用的附件），参数同 backup_engine()；附件下载并发数沿用上传并发设置"""
+        from .archive import ArchiveBackup
+        from .html2md import clean_html
+        self.client()
+        return ArchiveBackup(self.endpoint, self.user, self.pwd, self.dir_backups, clean_html,
+                             workers=workers or self.config['backup_workers'], media=media, media_workers=self.config['upload_workers'],
+                             incremental=self.config['backup_incremental'] if incremental is None else incremental,
+                             store=self.store, batch_size=batch_size or self.config['rpc_batch_size'], gzip_requests=self.gzip_requests)
+
+    @staticmethod
+    def open_archive(path):
+        from .archive import BackupArchive
+        return BackupArchive(path)
+
+    def archive_restore(self, path, post_ids=None, keep_ids=False, workers=None, rate=None):
+        """恢复目录固定为 content/restore/<归档名>，同一归档重复恢复时沿用发布日志，只补发未完成的文章"""
+        from .archive import ArchiveRestore
+        self.client()
+        out_dir = os.path.join(self.base_dir, 'content', 'restore', os.path.splitext(os.path.basename(path))[0])
+        return ArchiveRestore(self, path, out_dir, post_ids=post_ids, keep_ids=keep_ids,
+                              workers=workers or self.config['publish_workers'], rate=rate or self.config['publish_rate'],
+                              media_workers=self.config['upload_workers'])
+
+    # --- 同步 ---
+    def sync(self, progress=None):
+        """刷新本地缓存：远程文章列表全量分页写入索引并清理已删除的文章，本地目录增量重建索引。
+        返回 {'remote': 文章数, 'local_changed': 变化文件数, 'local_removed': 删除文件数}"""
+        client, page, count, alive = self.client(), [], 0, []
+        for s in iter_post_summaries(client, self.user, self.pwd):
+            page.append(s); alive.append(s['postid'])
+            if len(page) >= 200:
+                self.store.upsert_remote(page); count += len(page); page = []
+                if progress: progress(count)
+        if page: self.store.upsert_remote(page); count += len(page)
+        self.store.prune_remote(alive)
+        changed, removed = self.store.sync_local(self.local_folders())
+        return {'remote': count, 'local_changed': len(changed), 'local_removed': len(removed)}
+
+    def sync_engine(self, folder=None, pull_new=False):
+        """草稿目录（默认 content/drafts）与博客的双向同步"""
+        from .sync import SyncEngine
+        self.client()
+        return SyncEngine(self, folder or self.dir_drafts, pull_new, self.config['rpc_batch_size'])
+
+    # --- 离线队列 ---
+    def queue_op(self, kind, **args):
+        """网络不可用时把写操作排进离线队列，连接恢复后由 replay_queue() 按顺序重放"""
+        return self.store.queue_op(self.endpoint, kind, dict(args, queued=time.time())) # 重放时找回文章的时间下限
+
+    def pending_ops(self): return self.store.pending_ops(self.endpoint) if self.endpoint else []
+
+    def replay_queue(self):
+        """返回 (成功数, 失败列表, 剩余数)"""
+        from .sync import replay_queue
+        return replay_queue(self, self.client())
+
+    # --- 评论 ---
+    def sync_comments(self, status=None, post_id=None, full=False, on_page=None, cancel_event=None):
+        return sync_comments(self.client(), self.user, self.pwd, self.store, status, post_id, full, on_page=on_page, cancel_event=cancel_event)
+
+    def moderate_comments(self, ids, action, batch_size=None):
+        return moderate_comments(self.client(), self.user, self.pwd, list(ids), action, RpcBatcher(batch_size or self.config['rpc_batch_size']))
+
+    # --- 上传 ---
+    def image_options(self):
+        """按配置返回 optimize_image 的参数；未启用或未安装 Pillow 时返回 None"""
+        from .media import pillow_available
+        if not self.config['image_optimize'] or not pillow_available(): return None
+        width = int(self.config['image_max_width'])
+        return {'max_width': width, 'quality': int(self.config['image_quality']), 'to_webp': bool(self.config['image_webp']),
+                'srcset_widths': [w for w in (480, 960) if w < width] if self.config['image_srcset'] else []}
+
+    def upload_queue(self, paths, concurrency=None, optimize=None):
+        from .media import MediaUploadQueue
+        self.client()
+        return MediaUploadQueue(self.endpoint, self.user, self.pwd, paths, store=self.store,
+                                concurrency=concurrency or self.config['upload_workers'], optimize=optimize, optimize_dir=self.dir_optimized)
@@ -0,0 +1,80 @@
+"""草稿自动保存：原子写入与按差异压缩存储的历史版本"""
+import difflib
+import json
+import os
+import zlib
+
+from .metrics import METRICS
+
+# --- 草稿自动保存与历史版本 ---
+def atomic_write(path, text):
+    """先写临时文件再原子替换，中途崩溃不会留下半个文件"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    data = text.encode('utf-8')
+    with METRICS.track('disk', 'atomic_write', bytes_out=len(data)): # 含 fsync，磁盘慢时最先体现在这里
+        with open(tmp, 'wb') as f:
+            f.write(data); f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+def draft_filename(title):
+    filename = f"{title or '未命名'}.md"
+    return "".join([i for i in filename if i.isalnum() or i in (' ', '.', '_', '-')]).strip() # 过滤文件名非法字符
+
+def text_delta(old, new):
+    """按行计算 new 相对 old 的差异：['=', 起, 止] 引用旧文本的行，['+', [行...]] 为新写入的行"""
+    a, b = old.splitlines(keepends=True), new.splitlines(keepends=True)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b).get_opcodes():
+        if tag == 'equal': ops.append(['=', i1, i2])
+        elif j2 > j1: ops.append(['+', b[j1:j2]])
+    return ops
+
+def apply_delta(old, ops):
+    a = old.splitlines(keepends=True)
+    return ''.join(''.join(a[op[1]:op[2]]) if op[0] == '=' else ''.join(op[1]) for op in ops)
+
+class DraftManager:
+    """草稿以稳定的 draft_id 标识，改标题时文件随之改名；每次保存在 studio.db 中追加一个历史版本：
+    每 snapshot_every 版存一次压缩的全文，其余只存相对上一版的压缩差异，占用随改动量而非版本数增长"""
+    def __init__(self, store, drafts_dir, snapshot_every=20):
+        self.store, self.drafts_dir, self.snapshot_every = store, drafts_dir, snapshot_every
+        self.last = {} # draft_id -> (序号, 全文)，避免每次保存都回放差异链
+
+    def save(self, draft_id, title, content):
+        """返回 (文件路径, 新版本序号)；内容与上一版相同时序号为 None"""
+        path = os.path.join(self.drafts_dir, draft_filename(title))
+        owner = self.store.draft_for_path(path)
+        if owner and owner != draft_id and os.path.exists(path): # 与其他草稿重名时加后缀，而不是覆盖
+            path = os.path.join(self.drafts_dir, draft_filename(f"{title}_{draft_id[:6]}"))
+        old = self.store.draft_path(draft_id)
+        if old and old != path and os.path.exists(old): os.replace(old, path) # 改标题后沿用原文件，不留下孤儿草稿
+        atomic_write(path, content)
+        self.store.remember_draft(draft_id, path, title)
+        return path, self.record(draft_id, content)
+
+    def record(self, draft_id, text):
+        chain = None if draft_id in self.last else self.store.draft_chain(draft_id)
+        if chain: self.last[draft_id] = (chain[-1][0], self._replay(chain))
+        seq, prev = self.last.get(draft_id, (None, None))
+        if prev == text: return None
+        full = zlib.compress(text.encode('utf-8'))
+        kind, data = 'full', full
+        if prev is not None and (seq - 1) % self.snapshot_every != self.snapshot_every - 1:
+            delta = zlib.compress(json.dumps(text_delta(prev, text), ensure_ascii=False).encode('utf-8'))
+            if len(delta) < len(full): kind, data = 'delta', delta # 大段重写时差异不比全文小，直接存全文
+        seq = self.store.add_draft_version(draft_id, kind, data, len(text))
+        self.last[draft_id] = (seq, text)
+        return seq
+
+    def versions(self, draft_id): return self.store.draft_versions(draft_id)
+
+    def restore(self, draft_id, seq=None):
+        return self._replay(self.store.draft_chain(draft_id, seq))
+
+    @staticmethod
+    def _replay(chain):
+        text = ''
+        for _, kind, data in chain:
+            raw = zlib.decompress(data).decode('utf-8')
+            text = raw if kind == 'full' else apply_delta(text, json.loads(raw))
+        return text
@@ -0,0 +1,267 @@
+"""HTML 转 Markdown：把远程文章或旧草稿中的 HTML 还原为可编辑的 Markdown"""
+import re
+from html.parser import HTMLParser
+
+from .metrics import METRICS
+
+# --- HTML 转 Markdown ---
+_WS = re.compile(r'[ \t\r\n\f]+')
+_MD_SPECIAL = re.compile(r'[\\`*\[\]]|(?<![^\W_])_|_(?![^\W_])|<(?=[A-Za-z/!?])|&(?=#?\w+;)')
+_MD_LINE_START = re.compile(r'^([#>]|[-+](?=\s|$)|\d+(?=[.)](?:\s|$)))', re.M)
+_HTML_BLOCK_END = re.compile(r'</(?:p|div|h[1-6]|li|pre|blockquote|table)\s*>', re.I)
+_LEAF_TAGS = {'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'dt', 'th', 'td'}
+_CONTAINER_TAGS = {'blockquote', 'li', 'dd'}
+_STRUCTURE_TAGS = {'ul', 'ol', 'dl', 'table', 'tr', 'footnote'} # 只含子块、不直接含文字
+_INLINE_MARKS = {'strong': '**', 'b': '**', 'em': '*', 'i': '*', 'del': '~~', 's': '~~', 'a': None, 'code': None, 'abbr': None}
+_TRANSPARENT_BLOCKS = {'div', 'section', 'article', 'header', 'footer', 'figure', 'figcaption', 'aside', 'nav', 'main', 'center'}
+_HEADINGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+# 省略结束标签（HTML 规范允许，手写或旧编辑器的文章常见）：这些块开始时隐式结束未闭合的 <p>
+_P_CLOSERS = _TRANSPARENT_BLOCKS | _HEADINGS | {'p', 'ul', 'ol', 'dl', 'li', 'dt', 'dd', 'pre', 'blockquote', 'table', 'hr'}
+# 开始标签 -> (隐式结束的同级元素, 向上查找到这些元素为止)
+_IMPLIED_END = {'li': ({'li', 'fn'}, {'ul', 'ol', 'footnote'}), 'dt': ({'dt', 'dd'}, {'dl'}), 'dd': ({'dt', 'dd'}, {'dl'}),
+                'td': ({'td', 'th'}, {'tr', 'table'}), 'th': ({'td', 'th'}, {'tr', 'table'}), 'tr': ({'tr'}, {'table'})}
+
+def _escape_md(text):
+    return _MD_SPECIAL.sub(lambda m: {'<': '&lt;', '&': '&amp;'}.get(m.group(), '\\' + m.group()), text)
+
+def _md_title(title):
+    return ' "%s"' % title.replace('"', '\\"') if title else ''
+
+def _indent_rest(text, prefix='    '):
+    """首行不动，其余非空行加缩进（列表项、脚注、定义列表的续行）"""
+    first, _, rest = text.partition('\n')
+    return first + ''.join('\n' + (prefix + line if line else line) for line in rest.split('\n')) if rest else first
+
+class _Frame:
+    __slots__ = ('tag', 'attrs', 'blocks', 'inline', 'loose', 'items')
+    def __init__(self, tag, attrs=None):
+        self.tag, self.attrs, self.blocks, self.inline, self.loose, self.items = tag, attrs or {}, [], [], False, 0
+
+class HtmlToMarkdown(HTMLParser):
+    """单遍流式 HTML → Markdown 转换器：基于标准库的 HTML 分词器，只维护一个元素栈，耗时与输入长度成线性。
+    覆盖 extra/codehilite/toc 渲染的输出（标题、强调、链接、图片、列表、引用、表格、围栏代码、脚注、缩写、定义列表、目录），
+    可多次 feed()，close() 返回 Markdown 文本"""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = [_Frame('root')]
+        self.marks = [] # 未闭合的行内元素：(标签, 起始位置, 属性, 所在帧)
+        self.skip_tag, self.skip_depth = None, 0 # 整体跳过的子树（目录、脚本、脚注回链）
+        self.pre, self.pre_lang = None, '' # 代码块原文
+        self.footnotes, self.abbrs = [], {}
+
+    @property
+    def top(self): return self.stack[-1]
+
+    def _skip(self, tag): self.skip_tag, self.skip_depth = tag, 1
+
+    def _flush_inline(self, frame):
+        text = ''.join(frame.inline).strip(); frame.inline = []
+        return text
+
+    def _open_block(self):
+        """块级元素开始前，把容器中游离的行内文字收成一个段落"""
+        frame = self.top
+        if (frame.tag not in _LEAF_TAGS or frame.tag in ('th', 'td')) and frame.inline:
+            text = self._flush_inline(frame)
+            if text: frame.blocks.append(_MD_LINE_START.sub(_escape_line_start, text))
+
+    def handle_starttag(self, tag, attrs):
+        if self.skip_tag:
+            if tag == self.skip_tag: self.skip_depth += 1
+            return
+        attrs = dict(attrs); cls = (attrs.get('class') or '').split()
+        if self.pre is not None:
+            if tag == 'code': self.pre_lang = self.pre_lang or next((c[9:] for c in cls if c.startswith('language-')), '')
+            return
+        self._implied_end(tag)
+        top = self.top
+        if tag in ('script', 'style'): self._skip(tag)
+        elif tag == 'div' and 'toc' in cls:
+            self._open_block(); top.blocks.append('[TOC]'); self._skip('div')
+        elif tag == 'div' and 'footnote' in cls:
+            self._open_block(); self.stack.append(_Frame('footnote'))
+        elif top.tag == 'footnote' and tag in ('hr', 'ol'): pass
+        elif top.tag == 'footnote' and tag == 'li':
+            self.stack.append(_Frame('fn', {'id': (attrs.get('id') or '').split(':', 1)[-1]}))
+        elif tag == 'a' and 'footnote-backref' in cls: self._skip('a')
+        elif tag == 'a' and 'footnote-ref' in cls:
+            top.inline.append(f"[^{(attrs.get('href') or '').split(':', 1)[-1]}]"); self._skip('a')
+        elif tag == 'pre':
+            self._open_block(); self.pre, self.pre_lang = [], next((c[9:] for c in cls if c.startswith('language-')), '')
+        elif tag in _LEAF_TAGS or tag in _CONTAINER_TAGS or tag in _STRUCTURE_TAGS:
+            if tag not in ('th', 'td'): self._open_block()
+            if tag == 'li' and top.tag in ('ul', 'ol'): top.items += 1
+            self.stack.append(_Frame(tag, attrs))
+        elif tag == 'hr':
+            self._open_block(); top.blocks.append('* * *')
+        elif tag == 'br': top.inline.append('<br>' if top.tag in ('th', 'td') else '  \n')
+        elif tag == 'img':
+            title = attrs.get('title')
+            top.inline.append(f"![{_escape_md(attrs.get('alt') or '')}]({attrs.get('src') or ''}{_md_title(title)})")
+        elif tag in _INLINE_MARKS: self.marks.append((tag, len(top.inline), attrs, top))
+        elif tag in _TRANSPARENT_BLOCKS: self._open_block()
+
+    def _implied_end(self, tag):
+        if (tag in _P_CLOSERS and self.top.tag == 'p') or (tag in _HEADINGS and self.top.tag in _HEADINGS):
+            self._close_frames(self.top.tag)
+        rule = _IMPLIED_END.get(tag)
+        if not rule: return
+        for frame in reversed(self.stack[1:]):
+            if frame.tag in rule[1]: return
+            if frame.tag in rule[0]: self._close_frames(frame.tag); return
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in ('br', 'img', 'hr'): self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self.skip_tag:
+            if tag == self.skip_tag:
+                self.skip_depth -= 1
+                if not self.skip_depth: self.skip_tag = None
+            return
+        if self.pre is not None:
+            if tag == 'pre': self._close_pre()
+            return
+        if tag in _INLINE_MARKS: self._close_mark(tag)
+        elif tag == 'div' and self.top.tag == 'footnote': self._close_frames('footnote')
+        elif tag == 'li' and self.top.tag == 'fn': self._close_frames('fn')
+        elif tag in _LEAF_TAGS or tag in _CONTAINER_TAGS or tag in _STRUCTURE_TAGS: self._close_frames(tag)
+        elif tag in _TRANSPARENT_BLOCKS: self._open_block()
+
+    def handle_data(self, data):
+        if self.skip_tag: return
+        if self.pre is not None:
+            self.pre.append(data); return
+        top = self.top
+        if top.tag in _STRUCTURE_TAGS: return # 列表、表格结构之间的空白
+        text = _WS.sub(' ', data.replace('\xa0', ' '))
+        if not top.inline and not text.strip() and top.tag not in _LEAF_TAGS: return
+        in_code = any(m[0] == 'code' for m in self.marks)
+        top.inline.append(text if in_code else _escape_md(text))
+
+    def handle_comment(self, data):
+        if self.skip_tag or self.pre is not None: return
+        if self.top.inline: self.top.inline.append(f'<!--{data}-->')
+        else: self.top.blocks.append(f'<!--{data}-->') # 如 Typecho 的 <!--more--> 摘要分隔
+
+    def _close_mark(self, tag):
+        for i in range(len(self.marks) - 1, -1, -1):
+            if self.marks[i][0] == tag: break
+        else: return
+        _, start, attrs, frame = self.marks[i]; del self.marks[i:]
+        if frame is not self.top: return
+        content = ''.join(frame.inline[start:]); del frame.inline[start:]
+        frame.inline.append(self._wrap(tag, content, attrs))
+
+    def _wrap(self, tag, content, attrs):
+        if tag == 'code':
+            ticks = max((len(r) for r in re.findall('`+', content)), default=0) + 1
+            pad = ' ' if content.startswith('`') or content.endswith('`') else ''
+            return f"{'`' * ticks}{pad}{content}{pad}{'`' * ticks}"
+        if tag == 'a':
+            href, title = (attrs.get('href') or '').replace(' ', '%20'), attrs.get('title')
+            if not href: return content
+            if content == _escape_md(href) and not title and re.match(r'(https?|ftp)://|mailto:', href): return f'<{href}>'
+            return f"[{content}]({href}{_md_title(title)})"
+        if tag == 'abbr':
+            if attrs.get('title'): self.abbrs[content] = attrs['title']
+            return content
+        mark = _INLINE_MARKS[tag]
+        stripped = content.strip()
+        if not stripped: return content
+        lead, trail = content[:len(content) - len(content.lstrip())], content[len(content.rstrip()):]
+        return f"{lead}{mark}{stripped}{mark}{trail}" # 标记紧贴文字，空白移到外侧
+
+    def _close_pre(self):
+        code = ''.join(self.pre); self.pre = None
+        if code.endswith('\n'): code = code[:-1]
+        fence = '`' * max(3, max((len(r) for r in re.findall('`{3,}', code)), default=0) + 1)
+        self._open_block(); self.top.blocks.append(f"{fence}{self.pre_lang}\n{code}\n{fence}")
+
+    def _close_frames(self, tag):
+        if not any(f.tag == tag for f in self.stack[1:]): return # 没有对应的开始标签
+        while True:
+            while self.marks and self.marks[-1][3] is self.top: self._close_mark(self.marks[-1][0]) # 块结束时收起未闭合的行内元素
+            frame = self.stack.pop()
+            self._finish(frame)
+            if frame.tag == tag: return
+
+    def _finish(self, frame):
+        parent, tag = self.top, frame.tag
+        if tag in _LEAF_TAGS:
+            text = self._flush_inline(frame)
+            if frame.blocks: # 单元格等叶子块里嵌套的段落，合并为一行，不丢内容
+                text = ('<br>' if tag in ('th', 'td') else ' ').join(frame.blocks + ([text] if text else []))
+            if tag == 'p':
+                if text: parent.blocks.append(_MD_LINE_START.sub(_escape_line_start, text))
+                if parent.tag in ('li', 'fn', 'dd'): parent.loose = True
+            elif tag[0] == 'h': parent.blocks.append(f"{'#' * int(tag[1])} {text}")
+            elif tag == 'dt': parent.blocks.append(text)
+            else: parent.blocks.append((text.replace('|', '\\|'), tag == 'th', frame.attrs.get('style') or ''))
+            return
+        self._open_block_of(frame)
+        if tag in ('li', 'fn', 'dd', 'blockquote'):
+            body = ('\n\n' if frame.loose or tag != 'li' else '\n').join(frame.blocks)
+            if tag == 'blockquote':
+                parent.blocks.append('\n'.join(f'> {line}' if line else '>' for line in body.split('\n')))
+            elif tag == 'li':
+                start = int(parent.attrs.get('start') or 1) if parent.tag == 'ol' else 0
+                marker = f'{start + parent.items - 1}. ' if parent.tag == 'ol' else '- '
+                parent.blocks.append(marker + _indent_rest(body)); parent.loose = parent.loose or frame.loose
+            elif tag == 'dd': parent.blocks.append(':   ' + _indent_rest(body))
+            else: self.footnotes.append(f"[^{frame.attrs['id']}]: " + _indent_rest(body))
+        elif tag in ('ul', 'ol'): parent.blocks.append(('\n\n' if frame.loose else '\n').join(frame.blocks))
+        elif tag == 'dl':
+            out = []
+            for block in frame.blocks:
+                if out and not block.startswith(':   '): out.append('') # 新词条前空一行
+                out.append(block)
+            parent.blocks.append('\n'.join(out))
+        elif tag == 'tr': parent.blocks.append(frame.blocks)
+        elif tag == 'table' and frame.blocks: parent.blocks.append(self._table(frame.blocks))
+
+    def _open_block_of(self, frame):
+        if frame.inline:
+            text = self._flush_inline(frame)
+            if text: frame.blocks.append(_MD_LINE_START.sub(_escape_line_start, text))
+
+    @staticmethod
+    def _table(rows):
+        width = max(len(r) for r in rows)
+        def line(cells): return '| ' + ' | '.join(c[0] for c in cells) + ' |'
+        def align(style):
+            if 'center' in style: return ':---:'
+            if 'right' in style: return '---:'
+            return ':---' if 'left' in style else '---'
+        rows = [r + [('', False, '')] * (width - len(r)) for r in rows]
+        head, body = (rows[0], rows[1:]) if any(c[1] for c in rows[0]) else ([('', True, c[2]) for c in rows[0]], rows)
+        return '\n'.join([line(head), '| ' + ' | '.join(align(c[2]) for c in head) + ' |'] + [line(r) for r in body])
+
+    def close(self):
+        super().close()
+        if self.pre is not None: self._close_pre()
+        while len(self.stack) > 1: self._finish(self.stack.pop())
+        self._open_block()
+        parts = self.stack[0].blocks + self.footnotes + [f'*[{k}]: {v}' for k, v in self.abbrs.items()]
+        return '\n\n'.join(parts).strip() + '\n' if parts else ''
+
+def _escape_line_start(m):
+    s = m.group(1)
+    return s + '\\' if s[0].isdigit() else '\\' + s
+
+def html_to_markdown(html):
+    parser = HtmlToMarkdown(); parser.feed(html)
+    return parser.close()
+
+def clean_html(raw):
+    """把远程文章正文或旧草稿转为可编辑的 Markdown：Typecho 的 Markdown 文章原样保留，HTML 才做转换"""
+    raw = raw or ''
+    if raw.startswith('<!--markdown-->'): return raw[len('<!--markdown-->'):].strip()
+    if _HTML_BLOCK_END.search(raw):
+        with METRICS.track('render', 'html2md', bytes_out=len(raw)) as span:
+            md = html_to_markdown(raw).strip(); span.bytes_in = len(md)
+        return md
+    return html_unescape(raw).strip()
+
+def html_unescape(s): return s.replace("&quot;", '"').replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">").replace("&nbsp;", " ")
@@ -0,0 +1,72 @@
+"""日志：级别定义与后台线程批量写入的轮转日志文件"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+LOG_LEVELS = {'DEBUG': 10, 'INFO': 20, 'SUCCESS': 25, 'WARNING': 30, 'ERROR': 40}
+LOG_COLORS = {'DEBUG': 'gray', 'INFO': 'black', 'SUCCESS': 'green', 'WARNING': 'orange', 'ERROR': 'red'}
+COLOR_LEVELS = {'gray': 'DEBUG', 'green': 'SUCCESS', 'orange': 'WARNING', 'red': 'ERROR'} # 兼容按颜色记日志的旧调用
+
+class RotatingLogWriter:
+    """后台线程批量写日志文件：调用方只入队，不在热路径上打开文件；超过 max_bytes 时轮转为 .1 ~ .N"""
+    def __init__(self, path, max_bytes=1024 * 1024, backups=3, flush_interval=1.0):
+        self.path, self.max_bytes, self.backups, self.flush_interval = path, max_bytes, backups, flush_interval
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._loop, name='log-writer', daemon=True)
+        self.thread.start()
+
+    def write(self, line):
+        self.queue.put(line)
+
+    def close(self):
+        self.queue.put(None); self.thread.join(timeout=5)
+
+    def _rotate(self, f):
+        f.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"): os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0: os.replace(self.path, f"{self.path}.1")
+        else: os.remove(self.path)
+        return open(self.path, 'a', encoding='utf-8')
+
+    def _loop(self):
+        f, closing = None, False
+        while not closing:
+            lines = []
+            try: lines.append(self.queue.get(timeout=self.flush_interval))
+            except queue.Empty: continue
+            time.sleep(0.05) # 稍等片刻，把同一波日志攒成一次写入
+            while True:
+                try: lines.append(self.queue.get_nowait())
+                except queue.Empty: break
+            if None in lines:
+                closing = True; lines = [l for l in lines if l is not None]
+            if not lines: continue
+            try:
+                if f is None: f = open(self.path, 'a', encoding='utf-8')
+                for i in range(0, len(lines), 256): # 分片写入，单个文件不会因一大波日志远超上限
+                    f.write(''.join(lines[i:i + 256])); f.flush()
+                    if self.max_bytes and f.tell() >= self.max_bytes: f = self._rotate(f)
+            except OSError: # 磁盘满或文件被占用时丢弃本批，关闭句柄，下次重新打开
+                if f:
+                    try: f.close()
+                    except OSError: pass
+                f = None
+        if f: f.close()
+
+class FileLogger:
+    """不依赖 Qt 的日志入口：按级别写入轮转日志文件，并把每条记录交给 on_record（GUI 转发到日志面板，命令行打印到终端）"""
+    def __init__(self, path, file_level='DEBUG', on_record=None, **writer_opts):
+        self.writer = RotatingLogWriter(path, **writer_opts)
+        self.file_level, self.on_record = LOG_LEVELS[file_level], on_record
+
+    def log(self, level, text, color=None):
+        now = datetime.now()
+        if LOG_LEVELS[level] >= self.file_level:
+            self.writer.write(f"[{now:%Y-%m-%d %H:%M:%S}] [{level}] {text}\n")
+        if self.on_record: self.on_record((now, level, text, color or LOG_COLORS[level]))
+
+    def close(self):
+        self.writer.close()
@@ -0,0 +1,267 @@
+"""多媒体上传：流式 newMediaObject、图片优化与按内容哈希去重的上传队列"""
+import base64
+import hashlib
+import http.client
+import importlib.util
+import json
+import os
+import shutil
+import threading
+import urllib.parse
+import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+from .metrics import METRICS
+
+# --- 多媒体上传 ---
+MIME_MAP = {
+    # 图片
+    'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'svg': 'image/svg+xml', 'ico': 'image/x-icon',
+    'png': 'image/png', 'gif': 'image/gif', 'webp': 'image/webp', 'bmp': 'image/bmp',
+    # 视频
+    'mp4': 'video/mp4', 'mov': 'video/quicktime', 'flv': 'video/x-flv', 'avi': 'video/x-msvideo',
+    'wmv': 'video/x-ms-wmv', 'rmvb': 'application/vnd.rn-realmedia-vbr', 'ogv': 'video/ogg',
+    # 音频
+    'mp3': 'audio/mpeg', 'wma': 'audio/x-ms-wma', 'ogg': 'audio/ogg', 'oga': 'audio/ogg',
+    # 档案
+    'pdf': 'application/pdf', 'zip': 'application/zip', 'rar': 'application/x-rar-compressed',
+    'doc': 'application/msword', 'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'xls': 'application/vnd.ms-excel', 'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'ppt': 'application/vnd.ms-powerpoint', 'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+}
+
+def media_snippet(ext, url, file_name, srcset=None):
+    """根据文件类型生成插入正文的 Markdown/HTML 代码；srcset 为 [(宽度, url)] 的响应式图片列表"""
+    # 图片类
+    if ext in ['jpg', 'jpeg', 'png', 'gif', 'webp', 'svg', 'bmp']:
+        if srcset:
+            widths = ", ".join(f"{u} {w}w" for w, u in srcset)
+            largest = max(w for w, _ in srcset)
+            return (f"\n<p align=\"center\">\n  <img src=\"{url}\" srcset=\"{widths}\" sizes=\"(max-width: {largest}px) 100vw, {largest}px\" "
+                    f"alt=\"{file_name}\" style=\"max-width:100%;\">\n</p>\n")
+        return f"\n<p align=\"center\">\n  <img src=\"{url}\" alt=\"{file_name}\" style=\"max-width:100%;\">\n</p>\n"
+    # 视频类
+    if ext in ['mp4', 'mov', 'avi', 'wmv', 'flv', 'rmvb', 'ogv']:
+        return f"\n<div align=\"center\">\n  <video src=\"{url}\" controls style=\"max-width:100%;\">您的浏览器不支持播放该视频</video>\n</div>\n"
+    # 音频类
+    if ext in ['mp3', 'wma', 'ogg', 'oga']:
+        return f"\n<div align=\"center\">\n  <audio src=\"{url}\" controls>您的浏览器不支持音频播放</audio>\n</div>\n"
+    # 档案类：普通下载链接
+    return f"\n> 📁 [下载附件：{file_name}]({url})\n"
+
+class UploadCancelled(Exception): pass
+
+class StreamingMediaUpload:
+    """流式 metaWeblog.newMediaObject（不依赖 Qt）。
+
+    xmlrpc.client.Binary 需要把整个文件、它的 base64 副本和完整请求体同时放进内存；
+    这里按 3 字节整数倍分块读取文件，逐块 base64 编码后直接写入 HTTP 连接，内存占用与文件大小无关。
+    """
+    chunk_size = 3 * 256 * 1024 # 必须是 3 的倍数，各块的 base64 才能直接拼接
+
+    def __init__(self, endpoint, user, pwd, path, name=None, mime_type=None, timeout=60):
+        self.endpoint, self.user, self.pwd, self.path = endpoint, user, pwd, path
+        self.name = name or os.path.basename(path)
+        ext = os.path.splitext(self.name)[1].lower().replace('.', '')
+        self.mime_type = mime_type or MIME_MAP.get(ext, 'application/octet-stream')
+        self.timeout = timeout
+        self.cancel_event = threading.Event()
+
+    def cancel(self): self.cancel_event.set()
+
+    def _envelope(self):
+        esc = xmlrpc.client.escape
+        head = ("<?xml version='1.0'?>\n<methodCall>\n<methodName>metaWeblog.newMediaObject</methodName>\n<params>\n"
+                "<param><value><int>1</int></value></param>\n"
+                f"<param><value><string>{esc(self.user)}</string></value></param>\n"
+                f"<param><value><string>{esc(self.pwd)}</string></value></param>\n"
+                "<param><value><struct>\n"
+                f"<member><name>name</name><value><string>{esc(self.name)}</string></value></member>\n"
+                f"<member><name>type</name><value><string>{esc(self.mime_type)}</string></value></member>\n"
+                "<member><name>bits</name><value><base64>")
+        tail = "</base64></value></member>\n</struct></value></param>\n</params>\n</methodCall>\n"
+        return head.encode('utf-8'), tail.encode('utf-8')
+
+    def run(self, progress=None):
+        """progress(已发送字节, 文件总字节)；返回服务端结果字典（含 url）"""
+        total = os.path.getsize(self.path)
+        head, tail = self._envelope()
+        length = len(head) + 4 * ((total + 2) // 3) + len(tail)
+        u = urllib.parse.urlsplit(self.endpoint)
+        conn_cls = http.client.HTTPSConnection if u.scheme == 'https' else http.client.HTTPConnection
+        conn = conn_cls(u.netloc, timeout=self.timeout)
+        with METRICS.track('rpc', 'metaWeblog.newMediaObject', bytes_out=length) as span:
+            try:
+                conn.putrequest('POST', (u.path or '/') + (f"?{u.query}" if u.query else ''))
+                conn.putheader('Content-Type', 'text/xml')
+                conn.putheader('Content-Length', str(length))
+                conn.putheader('User-Agent', xmlrpc.client.Transport.user_agent)
+                conn.endheaders()
+                conn.send(head)
+                sent = 0
+                with open(self.path, 'rb') as f:
+                    while True:
+                        if self.cancel_event.is_set(): raise UploadCancelled("上传已取消")
+                        block = f.read(self.chunk_size)
+                        if not block: break
+                        conn.send(base64.b64encode(block))
+                        sent += len(block)
+                        if progress: progress(sent, total)
+                conn.send(tail)
+                resp = conn.getresponse()
+                if resp.status != 200:
+                    raise xmlrpc.client.ProtocolError(self.endpoint, resp.status, resp.reason, dict(resp.getheaders()))
+                parser, unmarshaller = xmlrpc.client.getparser()
+                while True:
+                    data = resp.read(65536)
+                    if not data: break
+                    span.bytes_in += len(data)
+                    parser.feed(data)
+                parser.close()
+                return unmarshaller.close()[0] # 服务端返回 Fault 时这里会抛出 xmlrpc.client.Fault
+            finally:
+                conn.close()
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''): h.update(block)
+    return h.hexdigest()
+
+# 可以安全重编码的位图格式；GIF 可能是动图，SVG/ICO 不适合重采样，均原样上传
+OPTIMIZABLE_EXTS = ('jpg', 'jpeg', 'png', 'webp', 'bmp', 'tiff')
+
+def pillow_available(): return importlib.util.find_spec('PIL') is not None
+
+def optimize_image(path, out_root, max_width=1600, quality=82, to_webp=False, srcset_widths=()):
+    """上传前压缩图片（在进程池中执行，须为模块级函数）：按最大宽度缩放、去除 EXIF 等元数据、
+    重新压缩或转为 WebP，并按需生成 srcset 小尺寸版本。
+    返回 {'path': 主图路径, 'variants': [(宽度, 路径)], 'width': 主图宽度}；结果按原图哈希和参数缓存"""
+    from PIL import Image, ImageOps # Pillow 为可选依赖，只在启用图片优化时才导入
+    key = hashlib.sha256(f"{file_sha256(path)}|{max_width}|{quality}|{to_webp}|{sorted(srcset_widths)}".encode()).hexdigest()[:16]
+    out_dir = os.path.join(out_root, key)
+    meta_path = os.path.join(out_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f: return json.load(f)
+    stem, ext = os.path.splitext(os.path.basename(path))
+    ext = ext.lower().lstrip('.')
+    with Image.open(path) as im:
+        im = ImageOps.exif_transpose(im) # 先按 EXIF 方向摆正，随后丢弃全部元数据
+        src_fmt = {'jpg': 'JPEG', 'jpeg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP'}.get(ext)
+        fmt = 'WEBP' if to_webp else src_fmt or 'PNG'
+        out_ext = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}[fmt]
+        if fmt == 'JPEG' and im.mode not in ('RGB', 'L'): im = im.convert('RGB')
+        elif im.mode not in ('RGB', 'RGBA', 'L', 'LA', 'P'): im = im.convert('RGBA')
+        os.makedirs(out_dir, exist_ok=True)
+
+        def save(width, name):
+            img = im if width >= im.width else im.resize((width, round(im.height * width / im.width)), Image.Resampling.LANCZOS)
+            target = os.path.join(out_dir, name)
+            opts = {'quality': quality, 'optimize': True} if fmt == 'JPEG' else ({'quality': quality, 'method': 6} if fmt == 'WEBP' else {'optimize': True})
+            img.save(target, fmt, **opts) # 不传 exif/icc_profile，元数据随之剥离
+            return img.width, target
+
+        width, main = save(min(max_width, im.width), f"{stem}.{out_ext}")
+        # 只是重新压缩且结果比原图还大时，直接用原图
+        if width == im.width and fmt == src_fmt and os.path.getsize(main) >= os.path.getsize(path):
+            shutil.copyfile(path, main)
+        variants = [save(w, f"{stem}-{w}w.{out_ext}") for w in sorted(set(srcset_widths)) if w < width]
+    result = {'path': main, 'variants': variants, 'width': width}
+    with open(meta_path, 'w', encoding='utf-8') as f: json.dump(result, f)
+    return result
+
+class MediaUploadQueue:
+    """批量上传队列（不依赖 Qt）：可选地先在进程池中压缩图片，再算内容哈希查本地 哈希→URL 缓存，
+    命中则直接复用；同一批次内相同内容只上传一次，其余文件以有限并发流式上传"""
+    def __init__(self, endpoint, user, pwd, paths, store=None, concurrency=3, timeout=60, optimize=None, optimize_dir=None):
+        self.endpoint, self.user, self.pwd = endpoint, user, pwd
+        self.paths, self.store = list(paths), store
+        self.concurrency, self.timeout = max(1, concurrency), timeout
+        self.optimize, self.optimize_dir = optimize, optimize_dir # optimize: optimize_image 的参数字典，None 表示不优化
+        self.cancel_event = threading.Event()
+        self._active, self._lock = set(), threading.Lock()
+
+    def cancel(self):
+        self.cancel_event.set()
+        with self._lock:
+            for up in self._active: up.cancel()
+
+    def _upload(self, path, digest, on_progress):
+        up = StreamingMediaUpload(self.endpoint, self.user, self.pwd, path, timeout=self.timeout)
+        with self._lock:
+            if self.cancel_event.is_set(): raise UploadCancelled("上传已取消")
+            self._active.add(up)
+        try:
+            result = up.run(on_progress)
+        finally:
+            with self._lock: self._active.discard(up)
+        if self.store: self.store.remember_media(self.endpoint, digest, result['url'], up.name, os.path.getsize(path))
+        return result
+
+    def _prepare(self):
+        """返回 {序号: {'path': 主文件, 'variants': [(宽度, 路径)]}}；图片压缩是 CPU 密集型任务，放进进程池"""
+        prepared = {i: {'path': p, 'variants': []} for i, p in enumerate(self.paths)}
+        todo = [i for i, p in enumerate(self.paths)
+                if self.optimize and os.path.splitext(p)[1].lower().lstrip('.') in OPTIMIZABLE_EXTS]
+        if not todo: return prepared
+        with ProcessPoolExecutor(max_workers=min(len(todo), os.cpu_count() or 1)) as pool:
+            futures = {pool.submit(optimize_image, self.paths[i], self.optimize_dir, **self.optimize): i for i in todo}
+            for fut in as_completed(futures):
+                i = futures[fut]
+                try: prepared[i] = fut.result()
+                except Exception: pass # 压缩失败（如格式损坏）时退回上传原图
+        return prepared
+
+    def run(self, on_progress=None, on_done=None):
+        """on_progress(序号, 已发送字节, 总字节)；on_done(序号, 状态, 结果字典/错误信息)，
+        状态为 uploaded / cached / cancelled / error，结果字典含 url、srcset、name、size；
+        某个文件的全部版本一有结果就回调，不等其他文件。两个回调都在调用 run() 的线程中执行。返回各状态的计数"""
+        stats = {'uploaded': 0, 'cached': 0, 'cancelled': 0, 'error': 0}
+        prepared = self._prepare()
+        # 每个序号对应主文件 + 若干 srcset 版本，统一拆成 (序号, 宽度, 路径) 逐个去重上传
+        parts = [(i, None, item['path']) for i, item in prepared.items()]
+        parts += [(i, w, path) for i, item in prepared.items() for w, path in item['variants']]
+        urls, fresh, failed = {}, set(), {}
+        pending = dict.fromkeys(prepared, 0) # 序号 -> 尚未上传完的版本数
+
+        def finish(i):
+            item = prepared[i]
+            if i in failed: status, payload = failed[i]
+            else:
+                srcset = sorted((w, urls[(i, w, path)]) for w, path in item['variants'])
+                if srcset: srcset.append((item['width'], urls[(i, None, item['path'])]))
+                status = 'uploaded' if i in fresh else 'cached'
+                payload = {'url': urls[(i, None, item['path'])], 'srcset': srcset,
+                           'name': os.path.basename(item['path']), 'size': os.path.getsize(item['path'])}
+            stats[status] += 1
+            if on_done: on_done(i, status, payload)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            digests = {}
+            for part, fut in [(part, pool.submit(file_sha256, part[2])) for part in parts]:
+                try: digests[part] = fut.result()
+                except OSError as e: failed.setdefault(part[0], ('error', str(e)))
+            groups = {} # 哈希 -> 同内容的 part 列表
+            for part, digest in digests.items():
+                url = self.store.media_url(self.endpoint, digest) if self.store else None
+                if url: urls[part] = url
+                else: groups.setdefault(digest, []).append(part); pending[part[0]] += 1
+            for i in sorted(prepared): # 全部命中缓存（或哈希失败）的文件不必等待上传
+                if not pending[i]: finish(i)
+            futures = {pool.submit(self._upload, group[0][2], digest,
+                                   lambda sent, total, i=group[0][0]: on_progress and on_progress(i, sent, total)): group
+                       for digest, group in groups.items()}
+            for fut in as_completed(futures):
+                group = futures[fut]
+                try:
+                    url = fut.result()['url']
+                    for part in group: urls[part] = url
+                    fresh.add(group[0][0])
+                except UploadCancelled as e:
+                    for part in group: failed.setdefault(part[0], ('cancelled', str(e)))
+                except Exception as e:
+                    for part in group: failed.setdefault(part[0], ('error', str(e)))
+                for part in group: pending[part[0]] -= 1
+                for i in sorted({part[0] for part in group}):
+                    if not pending[i]: finish(i)
+        return stats
@@ -0,0 +1,120 @@
+"""热点路径计时：XMLRPC 调用、附件下载、AI 请求、Markdown 渲染与磁盘写入按 (类别, 名称) 汇总为耗时直方图与字节计数。
+
+每次记录只是一次加锁的桶计数，开销在微秒级，默认常开；GUI 的「性能统计」页与命令行 --metrics 从 METRICS 读取，
+可导出为 JSON 或 Prometheus 文本格式。字节数：网络调用为请求体与响应体的大小，渲染与写盘为文本的字符数。
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# 直方图桶上限（秒），与 Prometheus 客户端的默认桶相近，补充了慢速网络与 AI 长回复需要的区间
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+KIND_NAMES = {'rpc': 'XMLRPC', 'ai': 'AI', 'render': '渲染', 'disk': '写盘', 'http': 'HTTP'}
+
+class Series:
+    """一个 (类别, 名称) 的累计值：次数、失败数、总耗时、最大耗时、收发字节与各桶计数（最后一个桶为 +Inf）"""
+    __slots__ = ('count', 'errors', 'total', 'max', 'bytes_in', 'bytes_out', 'buckets')
+
+    def __init__(self):
+        self.count = self.errors = self.bytes_in = self.bytes_out = 0
+        self.total = self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def quantile(self, q):
+        """按桶内线性插值估算分位数（与 Prometheus 的 histogram_quantile 相同），落在 +Inf 桶时返回最大值"""
+        if not self.count: return None
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.buckets):
+            if n and seen + n >= rank:
+                if i == len(BUCKETS): return self.max
+                lower = BUCKETS[i - 1] if i else 0.0
+                return min(self.max, lower + (BUCKETS[i] - lower) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+    def as_dict(self):
+        return {'count': self.count, 'errors': self.errors, 'sum': round(self.total, 6), 'max': round(self.max, 6),
+                'avg': round(self.total / self.count, 6) if self.count else None,
+                'p50': self.quantile(0.5), 'p95': self.quantile(0.95), 'p99': self.quantile(0.99),
+                'bytes_in': self.bytes_in, 'bytes_out': self.bytes_out,
+                'buckets': dict(zip([*map(str, BUCKETS), '+Inf'], self.buckets))}
+
+class _Span:
+    """track() 返回的计时上下文：退出时记录耗时，有异常则记为失败；字节数可在块内补填"""
+    __slots__ = ('metrics', 'kind', 'name', 'bytes_in', 'bytes_out', 'start')
+
+    def __init__(self, metrics, kind, name, bytes_in, bytes_out):
+        self.metrics, self.kind, self.name, self.bytes_in, self.bytes_out = metrics, kind, name, bytes_in, bytes_out
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.kind, self.name, time.perf_counter() - self.start, exc_type is None, self.bytes_in, self.bytes_out)
+
+class Metrics:
+    """线程安全的指标注册表；enabled 为 False 时 observe() 直接返回"""
+    def __init__(self):
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.series, self.started = {}, datetime.now()
+
+    def observe(self, kind, name, seconds, ok=True, bytes_in=0, bytes_out=0):
+        if not self.enabled: return
+        i = bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            s = self.series.get((kind, name))
+            if s is None: s = self.series[(kind, name)] = Series()
+            s.count += 1; s.total += seconds; s.buckets[i] += 1
+            if seconds > s.max: s.max = seconds
+            if not ok: s.errors += 1
+            s.bytes_in += bytes_in; s.bytes_out += bytes_out
+
+    def track(self, kind, name, bytes_in=0, bytes_out=0):
+        """with METRICS.track('disk', 'atomic_write', bytes_out=n): ...；块内抛出异常时记为失败，异常照常抛出"""
+        return _Span(self, kind, name, bytes_in, bytes_out)
+
+    def snapshot(self):
+        """[(类别, 名称, 统计字典)]，按类别、名称排序"""
+        with self.lock: items = [(k, n, s.as_dict()) for (k, n), s in self.series.items()]
+        return sorted(items, key=lambda x: (x[0], x[1]))
+
+    def to_json(self):
+        return json.dumps({'started': self.started.isoformat(timespec='seconds'), 'exported': datetime.now().isoformat(timespec='seconds'),
+                           'buckets': list(BUCKETS), 'series': [dict(kind=k, name=n, **d) for k, n, d in self.snapshot()]},
+                          ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix='typecho_studio'):
+        """Prometheus 文本格式（0.0.4），可交给 node_exporter 的 textfile 收集器或 Pushgateway"""
+        esc = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        snap = self.snapshot()
+        lines = [f"# HELP {prefix}_duration_seconds 调用耗时", f"# TYPE {prefix}_duration_seconds histogram"]
+        for kind, name, d in snap:
+            labels = f'kind="{esc(kind)}",name="{esc(name)}"'
+            cumulative = 0
+            for le, n in d['buckets'].items():
+                cumulative += n
+                lines.append(f'{prefix}_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{prefix}_duration_seconds_sum{{{labels}}} {d['sum']}")
+            lines.append(f"{prefix}_duration_seconds_count{{{labels}}} {d['count']}")
+        for metric, key, help_text in (('errors_total', 'errors', '失败次数'), ('received_bytes_total', 'bytes_in', '接收或产出的字节数'),
+                                       ('sent_bytes_total', 'bytes_out', '发送或写入的字节数')):
+            lines += [f"# HELP {prefix}_{metric} {help_text}", f"# TYPE {prefix}_{metric} counter"]
+            lines += [f'{prefix}_{metric}{{kind="{esc(k)}",name="{esc(n)}"}} {d[key]}' for k, n, d in snap]
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        """按扩展名导出：.json 为 JSON，其余为 Prometheus 文本；先写临时文件再替换，收集器不会读到半个文件"""
+        text = self.to_json() if path.lower().endswith('.json') else self.to_prometheus()
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f: f.write(text)
+        os.replace(f"{path}.tmp", path)
+
+METRICS = Metrics() # 进程内共用一个注册表
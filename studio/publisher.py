@@ -0,0 +1,136 @@
+"""批量发布：读取目录中带 front matter 的 Markdown，并行渲染，限速并发发布，失败指数退避，发布日志支持断点续传"""
+import hashlib
+import http.client
+import os
+import random
+import threading
+import time
+import xmlrpc.client
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .ai import RateLimiter
+from .rpc import find_recent_post, make_rpc_proxy
+
+def is_transient(exc):
+    """网络错误、超时、408/429 与 5xx 值得重试；Fault（权限、参数错误等）重试也不会成功"""
+    if isinstance(exc, xmlrpc.client.ProtocolError): return exc.errcode in (408, 429) or exc.errcode >= 500
+    return isinstance(exc, (OSError, http.client.HTTPException))
+
+class BulkPublisher:
+    """批量发布引擎（不依赖 Qt）。每个文件的状态写入 studio.db 的 publish_jobs 表（按服务器区分）：
+
+    - done：已发布且内容哈希未变的文件直接跳过；内容改过的用 editPost 更新原文章，不会新建；
+    - sending：newPost 已发出但没有收到结果（中途退出或超时），下次先在最近的文章中查找标题与正文都一致的，
+      找到就改为 editPost，避免重复发文；
+    - failed：服务端明确拒绝或重试耗尽，下次运行会重新尝试。
+    """
+    def __init__(self, studio, paths, workers=3, rate=2.0, retries=4, backoff=1.0, max_delay=30.0, timeout=60, lookup_window=50):
+        self.studio, self.paths = studio, [os.path.abspath(p) for p in paths]
+        self.workers, self.retries, self.backoff, self.max_delay = max(1, workers), retries, backoff, max_delay
+        self.timeout, self.lookup_window = timeout, lookup_window
+        self.endpoint, self.store = studio.endpoint, studio.store
+        self.limiter = RateLimiter(rate) # 所有线程共用，限制的是整体请求频率
+        self.cancel_event = threading.Event()
+        self._local = threading.local()
+
+    def cancel(self): self.cancel_event.set()
+
+    def _client(self):
+        if getattr(self._local, 'client', None) is None:
+            self._local.client = make_rpc_proxy(self.endpoint, self.timeout, self.studio.gzip_requests, resend_on_disconnect=False)
+        return self._local.client
+
+    def plan(self):
+        """对照发布日志，返回 (待发布任务列表, 可跳过的 [(路径, 文章 ID)])"""
+        journal = self.store.publish_jobs(self.endpoint)
+        published = {e['hash']: e['post_id'] for e in journal.values() if e['state'] == 'done'}
+        jobs, skipped = [], []
+        for path in self.paths:
+            with open(path, 'rb') as f: raw = f.read()
+            digest = hashlib.sha256(raw).hexdigest()
+            entry = journal.get(path) or {}
+            if entry.get('state') == 'done' and entry['hash'] == digest:
+                skipped.append((path, entry['post_id'])); continue
+            if digest in published and not entry: # 已发布过的文件被改名或复制，同一内容不再发一遍
+                self.store.record_publish_job(self.endpoint, path, digest, published[digest], 'done')
+                skipped.append((path, published[digest])); continue
+            fields = self.studio.post_fields(raw.decode('utf-8'), path)
+            jobs.append({'path': path, 'hash': digest, 'fields': fields, 'state': entry.get('state'),
+                         'post_id': fields.pop('post_id', None) or entry.get('post_id'), 'attempts': entry.get('attempts') or 0,
+                         'sent_at': entry.get('updated')})
+        return jobs, skipped
+
+    def _publish(self, job):
+        """在线程池中发布一篇；返回 (文章 ID, 'published' / 'updated')，取消时返回 None"""
+        user, pwd, payload = self.studio.user, self.studio.pwd, job['payload']
+        attempt = 0
+        while True:
+            if self.cancel_event.is_set(): return None
+            client = self._client()
+            try:
+                if not job['post_id'] and job['state'] == 'sending':
+                    self.limiter.wait()
+                    job['post_id'] = find_recent_post(client, user, pwd, payload, job['sent_at'], self.lookup_window)
+                    job['state'] = None
+                self.limiter.wait()
+                if job['post_id']:
+                    client.metaWeblog.editPost(job['post_id'], user, pwd, payload, True)
+                    return str(job['post_id']), 'updated'
+                # 先落盘再发送：即使进程在请求途中退出，下次也知道这篇可能已经发出
+                job['state'], job['sent_at'] = 'sending', time.time()
+                self.store.record_publish_job(self.endpoint, job['path'], job['hash'], None, 'sending', attempts=job['attempts'])
+                return str(client.metaWeblog.newPost(1, user, pwd, payload, True)), 'published'
+            except Exception as e:
+                self._local.client = None # 连接可能已损坏，下次重建
+                job['attempts'] += 1; attempt += 1
+                if not is_transient(e):
+                    if job['state'] == 'sending': job['state'] = None # 服务端明确拒绝，文章没有创建
+                    raise
+                if attempt > self.retries: raise
+                # 指数退避并加入随机抖动，避免所有线程同时重试
+                if self.cancel_event.wait(min(self.max_delay, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)): return None
+
+    def run(self, progress=None, on_item=None):
+        """progress(已完成, 总数, 每秒篇数)；on_item(路径, 'published'/'updated'/'skipped'/'failed', 文章 ID 或错误信息)
+        两个回调都在调用 run() 的线程中执行。返回统计结果字典"""
+        start = time.monotonic()
+        jobs, skipped = self.plan()
+        total = len(jobs) + len(skipped)
+        result = {'total': total, 'published': 0, 'updated': 0, 'skipped': len(skipped), 'failed': [], 'cancelled': False}
+        for path, post_id in skipped:
+            if on_item: on_item(path, 'skipped', post_id)
+        # 先用进程池把所有正文一次性渲染进缓存，组装发布数据时直接命中
+        self.studio.markdown_service.render_many([j['fields']['content'] for j in jobs])
+        for j in jobs:
+            f = j['fields']
+            j['payload'] = self.studio.post_payload(f['title'], f['content'], f['categories'], f['tags'], f['status'], f['date'])
+        done = len(skipped)
+        if progress and total: progress(done, total, 0.0)
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='publish')
+        try:
+            futures = {pool.submit(self._publish, j): j for j in jobs}
+            for fut in as_completed(futures):
+                job = futures[fut]
+                try:
+                    outcome = fut.result()
+                    if outcome is None: continue # 取消时尚未发送，日志保持原状
+                    post_id, status = outcome
+                    self.store.record_publish_job(self.endpoint, job['path'], job['hash'], post_id, 'done', attempts=job['attempts'])
+                    result[status] += 1
+                    try: self.studio.record_published(post_id, job['fields']['title'], job['fields']['content'], job['payload'])
+                    except Exception: pass # 只影响本地索引与 sent 副本，发布本身已成功
+                    if on_item: on_item(job['path'], status, post_id)
+                except Exception as e:
+                    state = 'sending' if job['state'] == 'sending' else 'failed' # 结果未知的保持 sending，下次先查找
+                    self.store.record_publish_job(self.endpoint, job['path'], job['hash'], job['post_id'], state, str(e), job['attempts'])
+                    result['failed'].append((job['path'], str(e)))
+                    if on_item: on_item(job['path'], 'failed', str(e))
+                done += 1
+                if progress: progress(done, total, (done - len(skipped)) / max(time.monotonic() - start, 1e-6))
+        except BaseException:
+            self.cancel(); raise # Ctrl+C 等中断：停止重试，已发出的请求等待结束
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        result['cancelled'] = self.cancel_event.is_set()
+        result['elapsed'] = time.monotonic() - start
+        return result
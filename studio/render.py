@@ -0,0 +1,215 @@
+"""Markdown 渲染：复用实例与缓存的渲染服务，以及实时预览用的增量分块渲染"""
+import bisect
+import collections
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from .metrics import METRICS
+from .text import markdown_block_spans
+
+# --- Markdown 渲染 ---
+PUBLISH_EXTENSIONS = ['extra', 'codehilite', 'toc'] # 发布与预览共用，保证预览与线上一致
+
+class LRUCache:
+    """线程安全的 LRU 缓存，超过 max_items 时淘汰最久未使用的条目"""
+    def __init__(self, max_items=256):
+        self.max_items, self.data, self.lock = max_items, collections.OrderedDict(), threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.data.get(key)
+            if value is None: self.misses += 1
+            else: self.hits += 1; self.data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.data[key] = value; self.data.move_to_end(key)
+            while len(self.data) > self.max_items: self.data.popitem(last=False)
+
+    def __len__(self): return len(self.data)
+
+CODE_HIGHLIGHT_CACHE = LRUCache(4096) # 进程内共享：同一段代码在预览、发布、批量渲染中只高亮一次
+
+def _install_code_cache():
+    """让 codehilite（含 extra 中的围栏代码块）先查 CODE_HIGHLIGHT_CACHE，命中时跳过 Pygments"""
+    from markdown.extensions.codehilite import CodeHilite
+    if getattr(CodeHilite.hilite, 'cached', False): return
+    original = CodeHilite.hilite
+    def hilite(self, shebang=True):
+        # 以代码、语言及全部高亮选项为键（hilite 会改写 src/lang，必须在调用前计算）
+        key = hashlib.sha1(repr((sorted(vars(self).items()), shebang)).encode('utf-8')).hexdigest()
+        html = CODE_HIGHLIGHT_CACHE.get(key)
+        if html is None:
+            html = original(self, shebang); CODE_HIGHLIGHT_CACHE.put(key, html)
+        return html
+    hilite.cached = True
+    CodeHilite.hilite = hilite
+
+_WORKER_SERVICES = {} # 进程池子进程中按扩展组合复用的渲染服务
+
+def _render_in_worker(text, extensions):
+    service = _WORKER_SERVICES.get(extensions)
+    if service is None: service = _WORKER_SERVICES[extensions] = MarkdownService(list(extensions))
+    return service.convert(text)
+
+class MarkdownService:
+    """Markdown 渲染服务：每个线程复用一个预先加载好扩展的 Markdown 实例（每次使用前 reset），
+    整篇 HTML 按内容哈希做 LRU 缓存，代码高亮结果另有块级缓存；render_many 可用进程池并行渲染"""
+    def __init__(self, extensions=PUBLISH_EXTENSIONS, cache_size=256):
+        self.extensions = tuple(extensions)
+        self.html_cache = LRUCache(cache_size)
+        self._local = threading.local() # Markdown 实例不是线程安全的
+        _install_code_cache()
+
+    def _md(self):
+        md = getattr(self._local, 'md', None)
+        if md is None:
+            import markdown # 首次渲染时才加载 Markdown 及其扩展
+            md = self._local.md = markdown.Markdown(extensions=list(self.extensions))
+        return md
+
+    def convert(self, text):
+        """不经过整篇缓存直接渲染（代码块仍走高亮缓存）"""
+        md = self._md(); md.reset()
+        return md.convert(text)
+
+    def key(self, text): return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def render(self, text):
+        key = self.key(text)
+        html = self.html_cache.get(key)
+        if html is None:
+            with METRICS.track('render', 'markdown', bytes_out=len(text)) as span: # 只统计真正渲染的，缓存命中不计
+                html = self.convert(text); span.bytes_in = len(html)
+            self.html_cache.put(key, html)
+        return html
+
+    def render_many(self, texts, workers=None, min_parallel=4):
+        """按输入顺序返回 HTML；已缓存的直接取用，内容相同的只渲染一次，其余分给进程池"""
+        results, todo = [None] * len(texts), {}
+        for i, text in enumerate(texts):
+            key = self.key(text)
+            html = self.html_cache.get(key)
+            if html is None: todo.setdefault(key, []).append(i)
+            else: results[i] = html
+        pending = [(key, texts[idx[0]]) for key, idx in todo.items()]
+        if not pending: return results
+        with METRICS.track('render', 'markdown_batch', bytes_out=sum(len(t) for _, t in pending)) as span: # 一批计一次
+            if len(pending) < min_parallel or workers == 1:
+                rendered = [self.convert(text) for _, text in pending]
+            else:
+                workers = workers or os.cpu_count() or 2
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    rendered = list(pool.map(_render_in_worker, [t for _, t in pending], [self.extensions] * len(pending),
+                                             chunksize=max(1, len(pending) // (workers * 4))))
+            span.bytes_in = sum(map(len, rendered))
+        for (key, _), html in zip(pending, rendered):
+            self.html_cache.put(key, html)
+            for i in todo[key]: results[i] = html
+        return results
+
+_LIST_ITEM = re.compile(r' {0,3}([*+-]|\d{1,9}[.)])(\s|$)')
+_REF_DEF = re.compile(r'^ {0,3}\[(?!\^)[^\]]+\]:[ \t]*\S.*$', re.M)
+
+def common_prefix_len(a, b, step=4096):
+    """先按 step 大小的片段比较（C 层面的内存比较），再在不同的片段内逐字查找"""
+    i, n = 0, min(len(a), len(b))
+    while i < n and a[i:i + step] == b[i:i + step]: i += step
+    while i < n and a[i] == b[i]: i += 1
+    return min(i, n)
+
+_HEADING_HTML = re.compile(r'<h([1-6]) id="([^"]*)">(.*?)</h\1>', re.S)
+
+def toc_html(headings):
+    """headings: [(级别, id, 标题 HTML)]；生成与 toc 扩展结构一致的嵌套目录"""
+    out, stack = ['<div class="toc">'], []
+    for level, anchor, title in headings:
+        level = int(level)
+        while stack and stack[-1] > level: out.append('</li></ul>'); stack.pop()
+        if stack and stack[-1] == level: out.append('</li>')
+        else: out.append('<ul>'); stack.append(level)
+        out.append(f'<li><a href="#{anchor}">{re.sub(r"<[^>]+>", "", title)}</a>')
+    out.append('</li></ul>' * len(stack) + '</div>')
+    return ''.join(out)
+
+def merge_block_spans(text, spans):
+    """合并不能单独渲染的块：缩进的续行（列表内段落、缩进代码）与松散列表的后续项"""
+    merged, prev_list = [], False
+    for a, b in spans:
+        is_list = text[a] in '*+- 0123456789' and bool(_LIST_ITEM.match(text, a))
+        if merged and (text[a] in ' \t' or (is_list and prev_list)):
+            merged[-1] = (merged[-1][0], b)
+        else:
+            merged.append((a, b)); prev_list = is_list
+    return merged
+
+class BlockRenderer:
+    """实时预览的增量渲染：只在改动附近重新切分顶层块，接上未变化的旧切分结果；
+    各块的 HTML 以块源码为键缓存，编辑时只重新渲染变化的块。
+    引用式链接的定义会附加到引用它的块上，[TOC] 由全文标题单独生成"""
+    def __init__(self, service=None):
+        self.service = service or MarkdownService()
+        self.cache = {} # 块源码 -> HTML，只保留当前文档用到的块
+        self.text, self.spans = '', [] # 上次渲染的全文及其顶层块偏移
+        self.last_rendered = 0 # 上次实际渲染的块数
+
+    def _convert(self, source): return self.service.convert(source) # 单个块不进整篇缓存，避免挤掉整篇结果
+
+    def split(self, text):
+        """增量切分：从改动前最后一个块的开头重新扫描，越过改动后一旦回到旧的块边界就直接复用旧结果"""
+        old, spans = self.text, self.spans
+        if not spans: return list(markdown_block_spans(text))
+        prefix = common_prefix_len(old, text)
+        suffix = common_prefix_len(old[prefix:][::-1], text[prefix:][::-1]) # 公共后缀不与公共前缀重叠
+        starts = [a for a, _ in spans]
+        # 从改动所在块的前一块开始：改动落在块首行时（如标题变成普通行）会影响它与前一块的边界
+        k = bisect.bisect_left(starts, prefix) - 2
+        restart, head = (starts[k], spans[:k]) if k >= 0 else (0, [])
+        delta, change_end, hit = len(text) - len(old), len(text) - suffix, []
+        def resume(pos):
+            if pos < change_end: return False
+            j = bisect.bisect_left(starts, pos - delta)
+            if j < len(starts) and starts[j] == pos - delta: hit.append(j); return True
+            return False
+        fresh = list(markdown_block_spans(text, restart, resume))
+        tail = [(a + delta, b + delta) for a, b in spans[hit[0]:]] if hit else []
+        return head + fresh + tail
+
+    def render(self, text):
+        """返回 [(块源码, HTML)]，顺序与文档中的块一致"""
+        with METRICS.track('render', 'preview', bytes_out=len(text)): return self._render(text)
+
+    def _render(self, text):
+        self.spans = self.split(text); self.text = text
+        blocks = [text[a:b] for a, b in merge_block_spans(text, self.spans)]
+        defs = '\n'.join(_REF_DEF.findall(text))
+        cache, parts, self.last_rendered = {}, [], 0
+        toc_at = []
+        for block in blocks:
+            if len(block) < 16 and block.strip() == '[TOC]':
+                toc_at.append(len(parts)); parts.append(None); continue
+            source = f"{block}\n\n{defs}" if defs and '[' in block else block
+            html = cache.get(source) or self.cache.get(source)
+            if html is None:
+                html = self._convert(source); self.last_rendered += 1
+            cache[source] = html; parts.append((source, html))
+        if toc_at: # 目录直接由已渲染的标题生成，不再把全部标题重新交给 Markdown 解析
+            toc = toc_html(_HEADING_HTML.findall(''.join(part[1] for part in parts if part and '<h' in part[1])))
+            for i in toc_at: parts[i] = ('[TOC]\n' + toc, toc)
+        self.cache = cache
+        return parts
+
+def preview_css():
+    """预览面板样式：代码高亮配色与 codehilite 输出的 class 对应"""
+    from pygments.formatters import HtmlFormatter
+    return HtmlFormatter().get_style_defs('.codehilite') + """
+        body { font-family: sans-serif; line-height: 1.6; }
+        pre { background: #f6f8fa; padding: 8px; }
+        code { font-family: Consolas, monospace; }
+        table { border-collapse: collapse; } th, td { border: 1px solid #ccc; padding: 4px 8px; }
+        blockquote { color: #666; border-left: 3px solid #ddd; padding-left: 8px; }"""
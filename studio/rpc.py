@@ -0,0 +1,209 @@
+"""Typecho XMLRPC 客户端工具：长连接、multicall 合并、文章与评论的分页拉取和批量审核"""
+import html
+import re
+import xmlrpc.client
+from datetime import datetime
+
+from .metrics import METRICS
+
+# --- XMLRPC 连接工具 ---
+def rpc_endpoint(host):
+    protocol = "https://" if not host.startswith('http') else ""
+    return f"{protocol}{host}/action/xmlrpc"
+
+_METHOD_NAME = re.compile(rb'<methodName>([^<]+)</methodName>')
+
+class _KeepAliveMixin:
+    """标准 Transport 本身按 HTTP/1.1 复用同一条连接；这里补上单次调用超时，
+    并可选地对较大的请求体做 gzip 压缩（需服务端支持解压请求，默认关闭）。
+    响应的 gzip 解压由标准库根据 Content-Encoding 自动完成"""
+    timeout = 30
+    def make_connection(self, host):
+        conn = super().make_connection(host)
+        conn.timeout = self.timeout # 单次调用超时，防止慢请求永久占住线程
+        if conn.sock is not None: conn.sock.settimeout(self.timeout) # 复用中的长连接同样更新
+        return conn
+
+    # 标准库在长连接被服务端断开时会把同一请求原样重发一次；newPost 这类非幂等调用可能因此执行两次，
+    # 批量发布时关掉，由调用方决定如何重试
+    resend_on_disconnect = True
+    def request(self, host, handler, request_body, verbose=False):
+        m = _METHOD_NAME.search(request_body, 0, 512)
+        self._received = 0
+        # 每次调用计入耗时与收发字节（发送按压缩前的请求体计，接收按线路上的响应计）
+        with METRICS.track('rpc', m.group(1).decode() if m else '?', bytes_out=len(request_body)) as span:
+            try:
+                if self.resend_on_disconnect: return super().request(host, handler, request_body, verbose)
+                return self.single_request(host, handler, request_body, verbose)
+            finally: span.bytes_in = self._received
+
+    def parse_response(self, response):
+        read = response.read
+        def counted(*args):
+            data = read(*args); self._received += len(data)
+            return data
+        response.read = counted
+        return super().parse_response(response)
+
+class KeepAliveTransport(_KeepAliveMixin, xmlrpc.client.Transport): pass
+class SafeKeepAliveTransport(_KeepAliveMixin, xmlrpc.client.SafeTransport): pass
+
+def make_rpc_proxy(endpoint, timeout=30, gzip_requests=False, resend_on_disconnect=True):
+    """ServerProxy 不是线程安全的，每个工作线程都应持有自己的实例（连接随实例长期复用）"""
+    transport = SafeKeepAliveTransport() if endpoint.startswith('https') else KeepAliveTransport()
+    transport.timeout = timeout
+    transport.encode_threshold = 1024 if gzip_requests else None # 超过 1KB 的请求体才压缩
+    transport.resend_on_disconnect = resend_on_disconnect
+    return xmlrpc.client.ServerProxy(endpoint, transport=transport, allow_none=True)
+
+class RpcBatcher:
+    """把多个调用合并成 system.multicall 请求（按 batch_size 分批）；服务端不支持时自动退回逐个调用。
+    结果与调用一一对应，单个调用失败时对应位置为 xmlrpc.client.Fault 实例"""
+    def __init__(self, batch_size=20):
+        self.batch_size = max(1, batch_size)
+        self.multicall_ok = None # None 表示尚未探测
+
+    def run(self, proxy, calls):
+        """calls: [(方法名, 参数元组)]"""
+        results = []
+        for i in range(0, len(calls), self.batch_size):
+            results.extend(self._batch(proxy, calls[i:i + self.batch_size]))
+        return results
+
+    def _batch(self, proxy, calls):
+        if len(calls) > 1 and self.multicall_ok is not False:
+            try:
+                raw = proxy.system.multicall([{'methodName': m, 'params': list(args)} for m, args in calls])
+                self.multicall_ok = True
+                return [xmlrpc.client.Fault(r.get('faultCode', 0), r.get('faultString', '')) if isinstance(r, dict)
+                        else r[0] for r in raw]
+            except xmlrpc.client.Fault:
+                self.multicall_ok = False # 不支持 system.multicall，之后都逐个调用
+        results = []
+        for m, args in calls:
+            try: results.append(getattr(proxy, m)(*args))
+            except xmlrpc.client.Fault as e: results.append(e)
+        return results
+
+def post_summary(p):
+    """统一 metaWeblog / wp 两套接口返回的文章摘要字段"""
+    cats = p.get('categories') or p.get('terms_names', {}).get('category', []) or []
+    return {
+        'postid': str(p.get('postid') or p.get('post_id') or ''),
+        'title': p.get('title') or p.get('post_title') or '无标题',
+        'modified': str(p.get('date_modified_gmt') or p.get('dateModified') or p.get('post_modified_gmt') or p.get('post_modified') or ''),
+        'categories': list(cats),
+        'author': p.get('nickname') or p.get('wp_author_display_name') or p.get('post_author') or '',
+        'status': p.get('post_status') or '',
+    }
+
+def iter_post_summaries(client, user, pwd, page_size=200, cancel_event=None):
+    """分页遍历全部文章；服务端不支持 wp.getPosts 分页时退回一次性 getRecentPosts"""
+    seen, offset = set(), 0
+    try:
+        while not (cancel_event and cancel_event.is_set()):
+            page = client.wp.getPosts(1, user, pwd, {'number': page_size, 'offset': offset})
+            fresh = [s for s in map(post_summary, page) if s['postid'] and s['postid'] not in seen]
+            for s in fresh:
+                seen.add(s['postid']); yield s
+            # 服务端忽略 offset 时会反复返回同一页，没有新文章即视为结束
+            if len(page) < page_size or not fresh: return
+            offset += page_size
+        return
+    except xmlrpc.client.Fault:
+        if seen: raise
+    for s in map(post_summary, client.metaWeblog.getRecentPosts(1, user, pwd, 1000000)):
+        if s['postid'] and s['postid'] not in seen:
+            seen.add(s['postid']); yield s
+
+def fetch_post_page(client, user, pwd, offset, number):
+    """拉取一页文章摘要；不支持 wp.getPosts 时用 getRecentPosts 取前 offset+number 篇再切片"""
+    try:
+        page = client.wp.getPosts(1, user, pwd, {'number': number, 'offset': offset})
+    except xmlrpc.client.Fault:
+        page = client.metaWeblog.getRecentPosts(1, user, pwd, offset + number)[offset:]
+    return [s for s in map(post_summary, page) if s['postid']]
+
+_TAGS = re.compile(r'<[^>]+>')
+
+def content_fingerprint(description):
+    """正文的可见文字（去标签、反转义、去空白），服务端对 HTML 的细微调整不影响比对"""
+    return ''.join(html.unescape(_TAGS.sub('', description or '')).split())
+
+def _timestamp(value):
+    try: return datetime.strptime(str(value)[:17], '%Y%m%dT%H:%M:%S').timestamp()
+    except ValueError: return None
+
+def find_recent_post(client, user, pwd, payload, since=None, window=50, slack=86400):
+    """判断一次结果未知的 newPost 是否其实已经创建成功，返回找到的文章 ID。
+    只在最近 window 篇中查找，标题相同且正文可见文字一致才算同一篇；给出 since（发出请求前的时间戳）时，
+    修改时间早于它的文章不算。服务端时间的时区未知，按 slack 秒放宽"""
+    want = content_fingerprint(payload['description'])
+    for s in fetch_post_page(client, user, pwd, 0, window):
+        if s['title'] != payload['title']: continue
+        modified = _timestamp(s['modified'])
+        if since and modified and modified < since - slack: continue
+        post = client.metaWeblog.getPost(s['postid'], user, pwd)
+        if content_fingerprint(post.get('description')) == want: return s['postid']
+    return None
+
+# --- 评论同步与批量审核 ---
+COMMENT_STATUS = {'hold': '[待审核]', 'approve': '已通过', 'spam': '[垃圾]'}
+COMMENT_COLORS = {'hold': 'orange', 'approve': 'green', 'spam': 'red'}
+
+def comment_summary(c):
+    """统一 wp.getComments 返回的评论字段；Typecho 与 WordPress 的通过状态分别为 approved / approve"""
+    status = c.get('status') or 'approve'
+    return {
+        'comment_id': int(c.get('comment_id') or 0),
+        'post_id': str(c.get('post_id') or ''),
+        'post_title': c.get('post_title') or '',
+        'author': c.get('author') or '',
+        'content': c.get('content') or '',
+        'status': 'approve' if status == 'approved' else status,
+        'created': str(c.get('date_created_gmt') or ''),
+    }
+
+def comment_scope(status=None, post_id=None):
+    """同步水位按筛选条件分别记录：只同步过待审核评论时，不能据此跳过新的已通过评论"""
+    return f"{status or 'all'}:{post_id or ''}"
+
+def fetch_comment_page(client, user, pwd, offset, number, status=None, post_id=None):
+    query = {'number': number, 'offset': offset}
+    if status: query['status'] = status
+    if post_id: query['post_id'] = int(post_id)
+    return [c for c in map(comment_summary, client.wp.getComments(1, user, pwd, query)) if c['comment_id']]
+
+def sync_comments(client, user, pwd, store, status=None, post_id=None, full=False, page_size=100, on_page=None, cancel_event=None):
+    """按 number/offset 从新到旧分页拉取评论写入本地缓存。增量模式遇到不新于上次水位的评论即停止；
+    全量模式拉完后删除缓存中服务端已不存在的评论。返回 (拉取条数, 新评论数)"""
+    scope = comment_scope(status, post_id)
+    mark = 0 if full else store.comment_watermark(scope)
+    seen, fresh, offset, top = set(), 0, 0, mark
+    while not (cancel_event and cancel_event.is_set()):
+        page = fetch_comment_page(client, user, pwd, offset, page_size, status, post_id)
+        page = [c for c in page if c['comment_id'] not in seen] # 同步期间有新评论会把旧评论挤到下一页
+        if not page: break
+        seen.update(c['comment_id'] for c in page)
+        fresh += sum(c['comment_id'] > mark for c in page)
+        top = max(top, max(c['comment_id'] for c in page))
+        store.upsert_comments(page)
+        if on_page: on_page(len(seen))
+        if len(page) < page_size or min(c['comment_id'] for c in page) <= mark: break
+        offset += page_size
+    else: return len(seen), fresh # 被取消：不推进水位，下次重新拉取
+    if full: store.prune_comments(seen, status, post_id)
+    store.set_comment_watermark(scope, top)
+    return len(seen), fresh
+
+def moderate_comments(client, user, pwd, ids, action, batcher):
+    """批量审核：approve / spam 用 wp.editComment 改状态，delete 用 wp.deleteComment；
+    经 RpcBatcher 合并为 system.multicall。返回 (成功的 ID 列表, [(ID, 错误信息)])"""
+    if action == 'delete': calls = [('wp.deleteComment', (1, user, pwd, cid)) for cid in ids]
+    else: calls = [('wp.editComment', (1, user, pwd, cid, {'status': action})) for cid in ids]
+    done, failed = [], []
+    for cid, result in zip(ids, batcher.run(client, calls)):
+        if isinstance(result, xmlrpc.client.Fault): failed.append((cid, result.faultString))
+        elif result is False: failed.append((cid, '服务端返回失败'))
+        else: done.append(cid)
+    return done, failed
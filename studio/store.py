@@ -0,0 +1,309 @@
+"""本地 SQLite 缓存：远程文章、本地文件、评论、AI 结果、媒体链接与草稿历史"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .text import _CJK_CHAR, parse_front_matter
+
+# --- 本地 SQLite 缓存与全文检索 ---
+
+def fts_segment(text):
+    """FTS5 默认分词器会把连续中文当成一个词，这里把每个 CJK 字符拆成独立词元"""
+    return _CJK_CHAR.sub(r' \1 ', text or '')
+
+def fts_query(text):
+    """把用户输入转为 FTS5 查询：每个关键词作为短语匹配（中文按相邻字匹配），最后一个词做前缀匹配"""
+    terms = [t.replace('"', '""') for t in text.split()]
+    parts = [f'"{fts_segment(t).strip()}"' for t in terms if fts_segment(t).strip()]
+    if parts and not _CJK_CHAR.search(terms[-1]): parts[-1] += '*'
+    return ' '.join(parts)
+
+class StudioStore:
+    """本地 SQLite 缓存（不依赖 Qt，线程安全）：远程文章元数据/正文与本地草稿的 FTS5 全文索引"""
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.RLock()
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name='local_files'").fetchone() and \
+                    'meta' not in [r[1] for r in self.conn.execute("PRAGMA table_info(local_files)")]:
+                # 旧版索引没有元数据列：补列并清空 mtime，让所有文件在下次扫描时重新解析
+                self.conn.execute("ALTER TABLE local_files ADD COLUMN meta TEXT")
+                self.conn.execute("UPDATE local_files SET mtime=NULL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS remote_posts (postid TEXT PRIMARY KEY, title TEXT, tags TEXT, categories TEXT,
+                    author TEXT, body TEXT, modified TEXT, synced_at REAL);
+                CREATE VIRTUAL TABLE IF NOT EXISTS remote_posts_fts USING fts5(title, tags, categories, body);
+                CREATE TABLE IF NOT EXISTS local_files (path TEXT PRIMARY KEY, label TEXT, title TEXT, body TEXT, mtime REAL, size INTEGER,
+                    meta TEXT);
+                CREATE VIRTUAL TABLE IF NOT EXISTS local_files_fts USING fts5(title, body);
+                CREATE TABLE IF NOT EXISTS ai_cache (key TEXT PRIMARY KEY, result TEXT, created REAL);
+                CREATE TABLE IF NOT EXISTS media_cache (endpoint TEXT, sha256 TEXT, url TEXT, name TEXT, size INTEGER,
+                    uploaded_at REAL, PRIMARY KEY (endpoint, sha256));
+                CREATE TABLE IF NOT EXISTS drafts (draft_id TEXT PRIMARY KEY, path TEXT, title TEXT, updated REAL);
+                CREATE TABLE IF NOT EXISTS draft_versions (draft_id TEXT, seq INTEGER, created REAL, kind TEXT, data BLOB,
+                    chars INTEGER, PRIMARY KEY (draft_id, seq));
+                CREATE TABLE IF NOT EXISTS comments (comment_id INTEGER PRIMARY KEY, post_id TEXT, post_title TEXT, author TEXT,
+                    content TEXT, status TEXT, created TEXT, synced_at REAL);
+                CREATE INDEX IF NOT EXISTS comments_status ON comments (status, post_id);
+                CREATE TABLE IF NOT EXISTS comment_sync (scope TEXT PRIMARY KEY, max_id INTEGER, synced_at REAL);
+                CREATE TABLE IF NOT EXISTS publish_jobs (endpoint TEXT, path TEXT, hash TEXT, post_id TEXT, state TEXT, error TEXT,
+                    attempts INTEGER, updated REAL, PRIMARY KEY (endpoint, path));
+                CREATE TABLE IF NOT EXISTS sync_map (endpoint TEXT, path TEXT, post_id TEXT, local_hash TEXT, local_mtime REAL,
+                    remote_hash TEXT, remote_modified TEXT, state TEXT, conflict_body TEXT, synced_at REAL, PRIMARY KEY (endpoint, path));
+                CREATE TABLE IF NOT EXISTS pending_ops (op_id INTEGER PRIMARY KEY AUTOINCREMENT, endpoint TEXT, kind TEXT, args TEXT,
+                    created REAL, attempts INTEGER DEFAULT 0, error TEXT);
+            """)
+
+    def _reindex(self, table, rowid, values):
+        self.conn.execute(f"DELETE FROM {table}_fts WHERE rowid=?", (rowid,))
+        self.conn.execute(f"INSERT INTO {table}_fts (rowid, {', '.join(values)}) VALUES (?{', ?' * len(values)})",
+                          (rowid, *map(fts_segment, values.values())))
+
+    def upsert_remote(self, posts):
+        """posts: 形如 {'postid', 'title', 'categories', 'author', 'modified', 可选 'tags', 'body'} 的字典列表；
+        列表页只有元数据，body 为 None 时保留已缓存的正文"""
+        with self.lock, self.conn:
+            for p in posts:
+                cats = ','.join(p.get('categories') or [])
+                self.conn.execute("""INSERT INTO remote_posts (postid, title, tags, categories, author, body, modified, synced_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(postid) DO UPDATE SET title=excluded.title,
+                    tags=COALESCE(excluded.tags, tags), categories=excluded.categories, author=excluded.author,
+                    body=COALESCE(excluded.body, body), modified=excluded.modified, synced_at=excluded.synced_at""",
+                    (p['postid'], p.get('title', ''), p.get('tags'), cats, p.get('author', ''), p.get('body'), p.get('modified', ''), time.time()))
+                row = self.conn.execute("SELECT rowid, title, tags, categories, body FROM remote_posts WHERE postid=?", (p['postid'],)).fetchone()
+                self._reindex('remote_posts', row[0], {'title': row[1], 'tags': row[2], 'categories': row[3], 'body': row[4]})
+
+    def remote_ids_with_body(self):
+        with self.lock:
+            return {r[0] for r in self.conn.execute("SELECT postid FROM remote_posts WHERE body IS NOT NULL")}
+
+    def prune_remote(self, alive_ids):
+        """全量列举后删除服务端已不存在的文章"""
+        alive = set(map(str, alive_ids))
+        with self.lock, self.conn:
+            for rowid, pid in self.conn.execute("SELECT rowid, postid FROM remote_posts").fetchall():
+                if pid not in alive:
+                    self.conn.execute("DELETE FROM remote_posts WHERE rowid=?", (rowid,))
+                    self.conn.execute("DELETE FROM remote_posts_fts WHERE rowid=?", (rowid,))
+
+    def search_remote(self, text, limit=500):
+        """按相关度返回文章摘要；标题权重最高，其次标签/分类，最后正文"""
+        q = fts_query(text)
+        if not q: return []
+        with self.lock:
+            rows = self.conn.execute("""SELECT p.postid, p.title, p.categories, p.author, p.modified FROM remote_posts_fts f
+                JOIN remote_posts p ON p.rowid = f.rowid WHERE remote_posts_fts MATCH ?
+                ORDER BY bm25(remote_posts_fts, 10.0, 4.0, 4.0, 1.0) LIMIT ?""", (q, limit)).fetchall()
+        return [{'postid': r[0], 'title': r[1], 'categories': [c for c in r[2].split(',') if c], 'author': r[3], 'modified': r[4]} for r in rows]
+
+    def upsert_comments(self, comments):
+        with self.lock, self.conn:
+            self.conn.executemany("""INSERT INTO comments (comment_id, post_id, post_title, author, content, status, created, synced_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(comment_id) DO UPDATE SET post_id=excluded.post_id,
+                post_title=excluded.post_title, author=excluded.author, content=excluded.content, status=excluded.status,
+                created=excluded.created, synced_at=excluded.synced_at""",
+                [(c['comment_id'], c['post_id'], c['post_title'], c['author'], c['content'], c['status'], c['created'], time.time())
+                 for c in comments])
+
+    def list_comments(self, status=None, post_id=None):
+        sql, args = "SELECT comment_id, post_id, post_title, author, content, status, created FROM comments WHERE 1=1", []
+        if status: sql += " AND status=?"; args.append(status)
+        if post_id: sql += " AND post_id=?"; args.append(str(post_id))
+        with self.lock:
+            rows = self.conn.execute(sql + " ORDER BY comment_id DESC", args).fetchall()
+        keys = ('comment_id', 'post_id', 'post_title', 'author', 'content', 'status', 'created')
+        return [dict(zip(keys, r)) for r in rows]
+
+    def set_comment_status(self, ids, status):
+        with self.lock, self.conn:
+            self.conn.executemany("UPDATE comments SET status=? WHERE comment_id=?", [(status, int(i)) for i in ids])
+
+    def delete_comments(self, ids):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM comments WHERE comment_id=?", [(int(i),) for i in ids])
+
+    def prune_comments(self, alive_ids, status=None, post_id=None):
+        """全量同步某个筛选范围后，删除该范围内服务端已不存在的评论"""
+        alive = set(alive_ids)
+        dead = [c['comment_id'] for c in self.list_comments(status, post_id) if c['comment_id'] not in alive]
+        self.delete_comments(dead)
+
+    def comment_watermark(self, scope):
+        with self.lock:
+            row = self.conn.execute("SELECT max_id FROM comment_sync WHERE scope=?", (scope,)).fetchone()
+        return row[0] if row else 0
+
+    def set_comment_watermark(self, scope, max_id):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO comment_sync (scope, max_id, synced_at) VALUES (?, ?, ?)", (scope, max_id, time.time()))
+
+    def publish_jobs(self, endpoint):
+        """批量发布日志：{路径: {'hash', 'post_id', 'state', 'error', 'attempts', 'updated'}}"""
+        with self.lock:
+            rows = self.conn.execute("SELECT path, hash, post_id, state, error, attempts, updated FROM publish_jobs WHERE endpoint=?",
+                                     (endpoint,)).fetchall()
+        return {r[0]: dict(zip(('hash', 'post_id', 'state', 'error', 'attempts', 'updated'), r[1:])) for r in rows}
+
+    def record_publish_job(self, endpoint, path, digest, post_id, state, error=None, attempts=0):
+        """每次状态变化立即提交，进程中途退出后下次运行从这里继续"""
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO publish_jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              (endpoint, path, digest, post_id, state, error, attempts, time.time()))
+
+    _SYNC_FIELDS = ('post_id', 'local_hash', 'local_mtime', 'remote_hash', 'remote_modified', 'state', 'conflict_body')
+
+    def sync_entries(self, endpoint):
+        """双向同步映射：{路径: {'post_id', 'local_hash', 'local_mtime', 'remote_hash', 'remote_modified', 'state', 'conflict_body'}}"""
+        with self.lock:
+            rows = self.conn.execute(f"SELECT path, {', '.join(self._SYNC_FIELDS)} FROM sync_map WHERE endpoint=?", (endpoint,)).fetchall()
+        return {r[0]: dict(zip(self._SYNC_FIELDS, r[1:])) for r in rows}
+
+    def save_sync_entry(self, endpoint, path, entry):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO sync_map VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              (endpoint, path, *(entry.get(k) for k in self._SYNC_FIELDS), time.time()))
+
+    def drop_sync_entry(self, endpoint, path):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM sync_map WHERE endpoint=? AND path=?", (endpoint, path))
+
+    def queue_op(self, endpoint, kind, args):
+        with self.lock, self.conn:
+            return self.conn.execute("INSERT INTO pending_ops (endpoint, kind, args, created) VALUES (?, ?, ?, ?)",
+                                     (endpoint, kind, json.dumps(args, ensure_ascii=False), time.time())).lastrowid
+
+    def pending_ops(self, endpoint):
+        """离线期间排队的操作，按加入顺序：[(编号, 类型, 参数字典, 已尝试次数, 上次错误)]"""
+        with self.lock:
+            rows = self.conn.execute("SELECT op_id, kind, args, attempts, error FROM pending_ops WHERE endpoint=? ORDER BY op_id",
+                                     (endpoint,)).fetchall()
+        return [(op_id, kind, json.loads(args), attempts, error) for op_id, kind, args, attempts, error in rows]
+
+    def finish_op(self, op_id):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM pending_ops WHERE op_id=?", (op_id,))
+
+    def retry_op_later(self, op_id, error):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE pending_ops SET attempts=attempts+1, error=? WHERE op_id=?", (error, op_id))
+
+    def index_local(self, path, label, st=None):
+        """重新索引单个文件，返回 (路径, 标签, 标题, mtime, 大小)；文件已消失时删除索引并返回 None。
+        标题优先取 front matter 中的 title，其余元数据以 JSON 保存在 meta 列"""
+        try:
+            st = st or os.stat(path)
+            with open(path, 'r', encoding='utf-8') as f: text = f.read()
+        except FileNotFoundError:
+            self.remove_local(path); return None
+        except (OSError, UnicodeDecodeError): text = ''
+        meta, _ = parse_front_matter(text)
+        title = str(meta.get('title') or os.path.splitext(os.path.basename(path))[0])
+        with self.lock, self.conn:
+            self.conn.execute("""INSERT INTO local_files (path, label, title, body, mtime, size, meta) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET label=excluded.label, title=excluded.title, body=excluded.body,
+                mtime=excluded.mtime, size=excluded.size, meta=excluded.meta""",
+                (path, label, title, text, st.st_mtime, st.st_size, json.dumps(meta, ensure_ascii=False, default=str)))
+            rowid = self.conn.execute("SELECT rowid FROM local_files WHERE path=?", (path,)).fetchone()[0]
+            self._reindex('local_files', rowid, {'title': title, 'body': text})
+        return path, label, title, st.st_mtime, st.st_size
+
+    def remove_local(self, path):
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT rowid FROM local_files WHERE path=?", (path,)).fetchone()
+            if row:
+                self.conn.execute("DELETE FROM local_files WHERE rowid=?", row)
+                self.conn.execute("DELETE FROM local_files_fts WHERE rowid=?", row)
+        return bool(row)
+
+    def sync_local(self, folders):
+        """folders: [(目录, 标签)]；对比目录列表与索引中的 mtime/大小，只重新读取新增或变化的文件，并移除已消失的文件。
+        返回 (变化的行列表, 被删除的路径列表)"""
+        changed, removed = [], []
+        for folder, label in folders:
+            try:
+                with os.scandir(folder) as it:
+                    present = {e.path: e.stat() for e in it if e.name.endswith('.md') and e.is_file()}
+            except OSError: continue
+            with self.lock:
+                known = {r[0]: (r[1], r[2]) for r in self.conn.execute("SELECT path, mtime, size FROM local_files WHERE label=?", (label,))}
+            for path, st in present.items():
+                if known.pop(path, None) == (st.st_mtime, st.st_size): continue
+                row = self.index_local(path, label, st)
+                if row: changed.append(row)
+            for path in known:
+                if self.remove_local(path): removed.append(path)
+        return changed, removed
+
+    def list_local(self):
+        with self.lock:
+            return self.conn.execute("SELECT path, label, title, mtime, size FROM local_files ORDER BY mtime DESC").fetchall()
+
+    def local_meta(self, path):
+        with self.lock:
+            row = self.conn.execute("SELECT meta FROM local_files WHERE path=?", (path,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
+
+    def search_local(self, text, limit=500):
+        q = fts_query(text)
+        if not q: return []
+        with self.lock:
+            return self.conn.execute("""SELECT l.path, l.label, l.title, l.mtime, l.size FROM local_files_fts f JOIN local_files l ON l.rowid = f.rowid
+                WHERE local_files_fts MATCH ? ORDER BY bm25(local_files_fts, 10.0, 1.0) LIMIT ?""", (q, limit)).fetchall()
+
+    def ai_cached(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT result FROM ai_cache WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def remember_ai(self, key, result):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO ai_cache VALUES (?, ?, ?)", (key, result, time.time()))
+
+    def media_url(self, endpoint, digest):
+        with self.lock:
+            row = self.conn.execute("SELECT url FROM media_cache WHERE endpoint=? AND sha256=?", (endpoint, digest)).fetchone()
+        return row[0] if row else None
+
+    def remember_media(self, endpoint, digest, url, name, size):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO media_cache VALUES (?, ?, ?, ?, ?, ?)", (endpoint, digest, url, name, size, time.time()))
+
+    def draft_path(self, draft_id):
+        with self.lock:
+            row = self.conn.execute("SELECT path FROM drafts WHERE draft_id=?", (draft_id,)).fetchone()
+        return row[0] if row else None
+
+    def draft_for_path(self, path):
+        with self.lock:
+            row = self.conn.execute("SELECT draft_id FROM drafts WHERE path=?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def remember_draft(self, draft_id, path, title):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM drafts WHERE path=? AND draft_id<>?", (path, draft_id))
+            self.conn.execute("INSERT OR REPLACE INTO drafts VALUES (?, ?, ?, ?)", (draft_id, path, title, time.time()))
+
+    def add_draft_version(self, draft_id, kind, data, chars):
+        with self.lock, self.conn:
+            seq = self.conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM draft_versions WHERE draft_id=?", (draft_id,)).fetchone()[0]
+            self.conn.execute("INSERT INTO draft_versions VALUES (?, ?, ?, ?, ?, ?)", (draft_id, seq, time.time(), kind, data, chars))
+        return seq
+
+    def draft_versions(self, draft_id):
+        """[(序号, 时间戳, 类型, 存储字节数, 字符数)]，最新的在前"""
+        with self.lock:
+            return self.conn.execute("""SELECT seq, created, kind, length(data), chars FROM draft_versions
+                WHERE draft_id=? ORDER BY seq DESC""", (draft_id,)).fetchall()
+
+    def draft_chain(self, draft_id, seq=None):
+        """还原第 seq 版（默认最新）所需的记录：最近一次全量快照及其后的差异，按序号升序"""
+        with self.lock:
+            if seq is None:
+                seq = self.conn.execute("SELECT MAX(seq) FROM draft_versions WHERE draft_id=?", (draft_id,)).fetchone()[0]
+                if seq is None: return []
+            return self.conn.execute("""SELECT seq, kind, data FROM draft_versions WHERE draft_id=? AND seq<=? AND seq>=(
+                SELECT MAX(seq) FROM draft_versions WHERE draft_id=? AND kind='full' AND seq<=?) ORDER BY seq""",
+                (draft_id, seq, draft_id, seq)).fetchall()
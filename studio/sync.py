@@ -0,0 +1,276 @@
+"""本地草稿目录与博客的双向同步：文件 ↔ 文章 ID 映射、两个方向的最小变更集、冲突标记与离线操作队列"""
+import hashlib
+import os
+import xmlrpc.client
+
+from .drafts import atomic_write, draft_filename
+from .html2md import clean_html
+from .publisher import is_transient
+from .rpc import RpcBatcher, find_recent_post, iter_post_summaries, moderate_comments
+from .text import parse_front_matter
+
+def text_hash(text): return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+def same_content(text, remote):
+    """本地文件与远程文章的标准形式是否一致：忽略 front matter 中的 id 与正文首尾空白"""
+    meta, body = parse_front_matter(text)
+    remote_meta, remote_body = parse_front_matter(remote)
+    meta.pop('id', None)
+    return meta == remote_meta and body.strip() == remote_body.strip()
+
+def remote_text(post):
+    """远程文章在本地的标准形式：front matter（title/tags/categories/status）加 Markdown 正文。
+    拉取时按此写入文件，判断远程是否真的变化时也对它取哈希"""
+    import yaml
+    meta = {'title': post.get('title') or ''}
+    if post.get('mt_keywords'): meta['tags'] = post['mt_keywords']
+    if post.get('categories'): meta['categories'] = list(post['categories'])
+    if post.get('post_status'): meta['status'] = post['post_status']
+    return f"---\n{yaml.safe_dump(meta, allow_unicode=True, sort_keys=False)}---\n\n{clean_html(post.get('description', ''))}\n"
+
+class SyncEngine:
+    """双向同步（不依赖 Qt）。sync_map 表为每个文件记录上次同步时两边的基线：本地内容哈希与 mtime、
+    远程文章的修改时间与标准形式哈希。每次同步：
+
+    - 本地只看 mtime 变化的文件，再用哈希确认；远程只对修改时间变化的文章拉取正文，再用哈希确认；
+    - 只有本地变化的推送（editPost），只有远程变化的拉取覆盖本地文件，两边都变且内容不同的标记为冲突，
+      远程版本存入数据库，两边都不动，用 resolve() 选择保留哪一边；
+    - 目录中没有映射的新文件以 newPost 推送（front matter 没写 status 时作为草稿；已关联的文章沿用远程状态），front matter 带 id 的
+      文件或批量发布过的文件直接关联到对应文章；pull_new 时远程新文章写入目录；
+    - 删除不会传播：本地删除只解除映射，远程删除只做标记，本地文件保留。
+    """
+    def __init__(self, studio, folder, pull_new=False, batch_size=20):
+        self.studio, self.folder, self.pull_new = studio, os.path.abspath(folder), pull_new
+        self.endpoint, self.store = studio.endpoint, studio.store
+        self.batcher = RpcBatcher(batch_size)
+
+    def _local_files(self):
+        with os.scandir(self.folder) as it:
+            return {e.path: e.stat().st_mtime for e in it if e.name.endswith('.md') and e.is_file()}
+
+    def _fetch(self, client, post_ids):
+        """批量拉取文章，返回 {文章 ID: 文章字典或 Fault}"""
+        calls = [('metaWeblog.getPost', (pid, self.studio.user, self.studio.pwd)) for pid in post_ids]
+        return dict(zip(post_ids, self.batcher.run(client, calls))) if calls else {}
+
+    def plan(self, client):
+        """计算变更集（不修改任何一边）：{'push', 'push_new', 'pull', 'pull_new', 'conflict', 'rebase',
+        'local_deleted', 'remote_deleted', 'error'} 为待处理条目的列表，'unchanged' 为无需处理的文件数"""
+        user, pwd = self.studio.user, self.studio.pwd
+        entries = self.store.sync_entries(self.endpoint)
+        summaries = {s['postid']: s for s in iter_post_summaries(client, user, pwd)}
+        journal = self.store.publish_jobs(self.endpoint)
+        files = self._local_files()
+        mapped = {e['post_id'] for e in entries.values() if e['post_id']}
+        plan = {k: [] for k in ('push', 'push_new', 'pull', 'pull_new', 'conflict', 'rebase', 'local_deleted', 'remote_deleted', 'error')}
+        plan['unchanged'], to_check = 0, []
+        for path, mtime in sorted(files.items()):
+            e = entries.get(path)
+            item = {'path': path, 'mtime': mtime, 'entry': dict(e) if e else {}}
+            if e and e['post_id'] and e['local_mtime'] == mtime: # 未关联的文件（含新建失败的）需要读取 front matter
+                item['hash'], local_changed = e['local_hash'], False
+            else:
+                with open(path, 'r', encoding='utf-8') as f: item['text'] = f.read()
+                item['hash'] = text_hash(item['text'])
+                local_changed = not e or e['local_hash'] != item['hash']
+            if not e or not e['post_id']:
+                # 尚未关联：front matter 中的 id、批量发布日志、或上次结果未知的 newPost 按标题与正文找回
+                meta, _ = parse_front_matter(item['text'])
+                job = journal.get(path) or {}
+                pid = str(meta['id']) if meta.get('id') else (job.get('post_id') if job.get('state') == 'done' else None)
+                if not pid and e and e['state'] == 'sending': # 标题与正文都一致、且在发送之后修改过的文章才认领
+                    fields = self.studio.post_fields(item['text'], path)
+                    pid = find_recent_post(client, user, pwd, self.studio.post_payload(fields['title'], fields['content']), e['local_mtime'])
+                if not pid or pid not in summaries or pid in mapped:
+                    plan['push_new'].append(item); continue
+                mapped.add(pid)
+                item['entry'] = {'post_id': pid, 'local_hash': job.get('hash') if job.get('hash') == item['hash'] else None}
+                local_changed = item['entry']['local_hash'] is None
+            entry, pid = item['entry'], item['entry']['post_id']
+            item['post_id'], item['local_changed'] = pid, local_changed
+            if pid not in summaries:
+                if entry.get('state') != 'remote_deleted': plan['remote_deleted'].append(item)
+                elif local_changed: # 远程删除后本地又改过，视为要重新发布
+                    item['post_id'] = None; plan['push_new'].append(item)
+                else: plan['unchanged'] += 1
+                continue
+            item['modified'], item['remote_status'] = summaries[pid]['modified'], summaries[pid]['status']
+            if not entry.get('remote_hash') or item['modified'] != entry.get('remote_modified'): to_check.append(item)
+            elif local_changed: plan['push'].append(item)
+            elif entry.get('local_mtime') != mtime: plan['rebase'].append(item) # 只是 mtime 变了，更新基线
+            else: plan['unchanged'] += 1
+        for path, e in entries.items():
+            if path not in files: plan['local_deleted'].append({'path': path, 'post_id': e['post_id'], 'entry': e})
+        # 修改时间变化的文章拉取正文，用标准形式的哈希确认是否真的变了；
+        # 远程基线未知（刚按 front matter id 或发布日志关联）时无法判断哪边更新：内容一致则以远程为基线，不一致标记为冲突
+        posts = self._fetch(client, [i['post_id'] for i in to_check])
+        for item in to_check:
+            post = posts[item['post_id']]
+            if isinstance(post, xmlrpc.client.Fault): item['error'] = str(post); plan['error'].append(item); continue
+            item['remote'] = remote_text(post)
+            item['remote_status'] = post.get('post_status') or item.get('remote_status')
+            base = item['entry'].get('remote_hash')
+            remote_changed = bool(base) and text_hash(item['remote']) != base
+            if (remote_changed or not base) and item['local_changed']:
+                if same_content(item['text'], item['remote']): plan['rebase'].append(item) # 两边改成了同样的内容
+                else: plan['conflict'].append(item)
+            elif remote_changed: plan['pull'].append(item)
+            elif item['local_changed']: plan['push'].append(item)
+            else: plan['rebase'].append(item)
+        if self.pull_new:
+            plan['pull_new'] = [{'post_id': pid, 'modified': s['modified'], 'title': s['title']}
+                                for pid, s in summaries.items() if pid not in mapped]
+        return plan
+
+    def _save(self, item, path=None, **fields):
+        entry = dict(item.get('entry') or {}, **fields)
+        self.store.save_sync_entry(self.endpoint, path or item['path'], entry)
+
+    def _push(self, client, item):
+        """推送本地文件，返回文章 ID。front matter 没写 status 时：新文章作为草稿推送，
+        已关联的文章沿用远程当前状态（只改正文不会把已发布的文章撤回为草稿）"""
+        if 'text' not in item:
+            with open(item['path'], 'r', encoding='utf-8') as f: item['text'] = f.read()
+        fields = self.studio.post_fields(item['text'], item['path'])
+        meta, _ = parse_front_matter(item['text'])
+        user, pwd = self.studio.user, self.studio.pwd
+        if 'status' in meta: status = fields['status']
+        elif not item.get('post_id'): status = 'draft'
+        else: status = item.get('remote_status') or client.metaWeblog.getPost(item['post_id'], user, pwd).get('post_status') or 'publish'
+        payload = self.studio.post_payload(fields['title'], fields['content'], fields['categories'], fields['tags'], status, fields['date'])
+        if item.get('post_id'):
+            client.metaWeblog.editPost(item['post_id'], user, pwd, payload, status != 'draft')
+            return item['post_id']
+        # 先记下“正在新建”：请求结果未知时下次先按标题和正文找回，而不是再建一篇
+        self._save(item, post_id=None, local_hash=item['hash'], local_mtime=item['mtime'], state='sending')
+        try: return str(client.metaWeblog.newPost(1, user, pwd, payload, status != 'draft'))
+        except Exception as e:
+            if not is_transient(e): # 服务端明确拒绝，文章没有创建，下次不必找回
+                self._save(item, post_id=None, local_hash=item['hash'], local_mtime=item['mtime'], state='failed')
+            raise
+
+    def _write(self, path, text):
+        atomic_write(path, text)
+        return os.stat(path).st_mtime
+
+    def run(self, client=None, dry_run=False, on_item=None):
+        """先重放离线队列，再执行同步；on_item(动作, 路径或文章 ID, 说明)。
+        无法连接服务器时返回 {'offline': True}：本地修改由哈希记录，下次同步自动补推"""
+        client = client or self.studio.client()
+        result = {'offline': False, 'replayed': 0, 'replay_failed': [], 'conflicts': [], 'errors': []}
+        say = on_item or (lambda *a: None)
+        try:
+            if not dry_run:
+                result['replayed'], result['replay_failed'], _ = replay_queue(self.studio, client)
+            plan = self.plan(client)
+        except Exception as e:
+            if not is_transient(e): raise
+            result['offline'] = True; return result
+        result['plan'] = {k: (v if isinstance(v, int) else len(v)) for k, v in plan.items()}
+        for item in plan['error']:
+            result['errors'].append((item['path'], item['error'])); say('error', item['path'], item['error'])
+        for item in plan['conflict']:
+            result['conflicts'].append(item['path'])
+            if not dry_run: self._save(item, state='conflict', conflict_body=item['remote'])
+            say('conflict', item['path'], "两边都有修改，已保留双方内容")
+        for item in plan['local_deleted']:
+            if not dry_run: self.store.drop_sync_entry(self.endpoint, item['path'])
+            say('local_deleted', item['path'], f"本地已删除，远程文章 {item['post_id']} 保留")
+        for item in plan['remote_deleted']:
+            if not dry_run: self._save(item, state='remote_deleted', local_hash=item['hash'], local_mtime=item['mtime'])
+            say('remote_deleted', item['path'], f"远程文章 {item['post_id']} 已不存在，本地文件保留")
+        if dry_run:
+            for kind in ('push', 'push_new', 'pull'):
+                for item in plan[kind]: say(kind, item['path'], '')
+            for item in plan['pull_new']: say('pull_new', item['post_id'], item['title'])
+            return result
+        result.update(push=0, push_new=0, pull=0, pull_new=0)
+        pushed = []
+        for kind in ('push', 'push_new'):
+            for item in plan[kind]:
+                try:
+                    item['post_id'] = self._push(client, item); pushed.append(item); result[kind] += 1
+                    say(kind, item['path'], f"文章 {item['post_id']}")
+                except Exception as e:
+                    if is_transient(e): result['offline'] = True; break # 连接中断，剩下的下次再推
+                    result['errors'].append((item['path'], str(e))); say('error', item['path'], str(e))
+            if result['offline']: break
+        # 推送后重新取一次远程内容作为新的基线；修改时间留空，下次同步时确认后补上
+        fetched = self._fetch(client, [i['post_id'] for i in pushed]) if pushed and not result['offline'] else {}
+        for item in pushed:
+            post = fetched.get(item['post_id'])
+            remote_hash = text_hash(remote_text(post)) if isinstance(post, dict) else None
+            self._save(item, post_id=item['post_id'], local_hash=item['hash'], local_mtime=item['mtime'],
+                       remote_hash=remote_hash, remote_modified=None, state='synced', conflict_body=None)
+        if result['offline']: return result
+        posts = self._fetch(client, [i['post_id'] for i in plan['pull_new']])
+        for item in plan['pull'] + plan['pull_new']:
+            if 'path' not in item:
+                post = posts[item['post_id']]
+                if isinstance(post, xmlrpc.client.Fault):
+                    result['errors'].append((item['post_id'], str(post))); continue
+                item['remote'] = remote_text(post)
+                name = draft_filename(item['title'])
+                if os.path.exists(os.path.join(self.folder, name)): name = f"{name[:-3]}_{item['post_id']}.md"
+                item['path'] = os.path.join(self.folder, name)
+            text = item['remote']
+            mtime = self._write(item['path'], text)
+            self._save(item, post_id=item['post_id'], local_hash=text_hash(text), local_mtime=mtime, remote_hash=text_hash(text),
+                       remote_modified=item['modified'], state='synced', conflict_body=None)
+            kind = 'pull' if 'entry' in item else 'pull_new'
+            result[kind] += 1; say(kind, item['path'], f"文章 {item['post_id']}")
+        for item in plan['rebase']:
+            remote_hash = text_hash(item['remote']) if 'remote' in item else item['entry'].get('remote_hash')
+            self._save(item, post_id=item['post_id'], local_hash=item['hash'], local_mtime=item['mtime'],
+                       remote_hash=remote_hash, remote_modified=item['modified'], state='synced', conflict_body=None)
+        return result
+
+    def resolve(self, path, keep, client=None):
+        """解决冲突：keep='local' 用本地文件覆盖远程，keep='remote' 用远程文章覆盖本地文件"""
+        path = os.path.abspath(path)
+        entry = self.store.sync_entries(self.endpoint).get(path)
+        if not entry or not entry['post_id']: raise ValueError(f"{path} 没有关联的远程文章")
+        client = client or self.studio.client()
+        with open(path, 'r', encoding='utf-8') as f: text = f.read()
+        item = {'path': path, 'post_id': entry['post_id'], 'entry': entry, 'text': text, 'hash': text_hash(text),
+                'mtime': os.stat(path).st_mtime}
+        if keep == 'local': self._push(client, item)
+        post = self._fetch(client, [entry['post_id']])[entry['post_id']]
+        if isinstance(post, xmlrpc.client.Fault): raise post
+        remote = remote_text(post)
+        if keep == 'remote':
+            item['mtime'], item['hash'] = self._write(path, remote), text_hash(remote)
+        self._save(item, local_hash=item['hash'], local_mtime=item['mtime'], remote_hash=text_hash(remote),
+                   remote_modified=None, state='synced', conflict_body=None)
+
+# --- 离线队列 ---
+def replay_queue(studio, client):
+    """按加入顺序重放离线期间排队的操作（'publish' 发布/更新文章，'moderate' 审核评论）。
+    遇到网络错误立即停止，剩下的留待下次；服务端明确拒绝的操作移出队列并报告。返回 (成功数, 失败列表, 剩余数)"""
+    ops = studio.store.pending_ops(studio.endpoint)
+    done, failed = 0, []
+    for n, (op_id, kind, args, attempts, _) in enumerate(ops):
+        try:
+            if kind == 'publish':
+                post_id = args.get('post_id')
+                payload = studio.post_payload(args['title'], args['content'], args['categories'], args['tags'], args['status'])
+                # 排队前那次请求可能已经到达服务器，先按标题和正文找回，避免重复发文
+                if not post_id and (args.get('unsure') or attempts):
+                    post_id = find_recent_post(client, studio.user, studio.pwd, payload, args.get('queued'))
+                if post_id: client.metaWeblog.editPost(post_id, studio.user, studio.pwd, payload, True)
+                else: post_id = client.metaWeblog.newPost(1, studio.user, studio.pwd, payload, True)
+                studio.record_published(post_id, args['title'], args['content'], payload)
+            elif kind == 'moderate':
+                ok, errors = moderate_comments(client, studio.user, studio.pwd, args['ids'], args['action'], RpcBatcher())
+                if args['action'] == 'delete': studio.store.delete_comments(ok)
+                else: studio.store.set_comment_status(ok, args['action'])
+                failed.extend((f"评论 {cid}", err) for cid, err in errors)
+            else:
+                raise ValueError(f"未知的排队操作: {kind}")
+            studio.store.finish_op(op_id); done += 1
+        except Exception as e:
+            if is_transient(e):
+                studio.store.retry_op_later(op_id, str(e))
+                return done, failed, len(ops) - n
+            studio.store.finish_op(op_id); failed.append((kind, str(e)))
+    return done, failed, 0
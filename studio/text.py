@@ -0,0 +1,95 @@
+"""纯文本处理：Markdown 顶层块切分、中日韩字数统计与 front matter 解析"""
+import re
+
+# --- Markdown 分块 ---
+_FENCE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+_HEADING = re.compile(r'^ {0,3}#{1,6}(\s|$)')
+
+def markdown_block_spans(text, start=0, resume=None):
+    """按空行与标题切分 Markdown 顶层块，逐个产出块在 text 中的 (起, 止) 偏移；围栏代码块内部的空行不切分。
+    start 必须是块的边界；每当即将开始一个新块时调用 resume(偏移)，返回真值则停止（供增量切分接上旧结果）"""
+    begin = end = fence = None
+    pos, n = start, len(text)
+    while pos <= n:
+        nl = text.find('\n', pos)
+        if nl < 0: nl = n
+        line = text[pos:nl]
+        m = _FENCE.match(line) if '`' in line or '~' in line else None
+        if fence:
+            end = nl
+            if m and m.group(1)[0] == fence[0] and len(m.group(1)) >= len(fence) and not line.strip()[len(m.group(1)):]: fence = None
+        elif not m and not line.strip():
+            if begin is not None: yield begin, end; begin = None
+        else:
+            if begin is not None and not m and _HEADING.match(line):
+                yield begin, end; begin = None
+            if begin is None:
+                if resume and resume(pos): return
+                begin = pos
+            if m: fence = m.group(1)
+            end = nl
+        pos = nl + 1
+    if begin is not None: yield begin, end
+
+def split_markdown_blocks(text):
+    """按空行与标题切分 Markdown 顶层块；围栏代码块内部的空行不切分，保证代码块完整"""
+    return [text[a:b] for a, b in markdown_block_spans(text)]
+
+def markdown_chunk_spans(text, max_chars=3000):
+    """把长文打包成不超过 max_chars 的分段，返回每段在 text 中的 (起, 止) 偏移；段内原样保留块之间的空白，
+    段与段之间的空白由调用方按偏移取回。尽量在标题处断开，单个超长块（如大段代码）独占一段"""
+    spans, begin, end = [], None, None
+    for a, b in markdown_block_spans(text):
+        if begin is not None and (b - begin > max_chars or (_HEADING.match(text[a:b]) and end - begin >= max_chars // 2)):
+            spans.append((begin, end)); begin = None
+        if begin is None: begin = a
+        end = b
+    if begin is not None: spans.append((begin, end))
+    return spans
+
+# --- 字数统计 ---
+_CJK_CHAR = re.compile(r'([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af])')
+_LATIN_WORD = re.compile(r"[^\W_]+(?:['’.-][^\W_]+)*")
+
+def block_stats(text):
+    """单个段落的 (中日韩字数, 其他语言词数, 非空白字符数)"""
+    cjk = len(_CJK_CHAR.findall(text))
+    latin = len(_LATIN_WORD.findall(_CJK_CHAR.sub(' ', text))) if cjk else len(_LATIN_WORD.findall(text))
+    return cjk, latin, len(text) - sum(map(str.isspace, text))
+
+class TextStats:
+    """按段落缓存统计结果，编辑时只重算被改动的段落，总数增量维护；
+    字数 = 中日韩字数 + 其他语言单词数，阅读时间按每分钟 300 字 / 200 词估算"""
+    def __init__(self):
+        self.blocks, self.totals = [(0, 0, 0)], [0, 0, 0, 0] # 中日韩字, 单词, 字符, 非空段落
+
+    def reset(self, texts):
+        self.blocks = [block_stats(t) for t in texts] or [(0, 0, 0)]
+        self.totals = [sum(b[0] for b in self.blocks), sum(b[1] for b in self.blocks),
+                       sum(b[2] for b in self.blocks), sum(1 for b in self.blocks if b[2])]
+
+    def replace(self, start, old_count, texts):
+        """用 texts 的统计替换从第 start 段开始的 old_count 个旧段落"""
+        new = [block_stats(t) for t in texts]
+        for sign, blocks in ((-1, self.blocks[start:start + old_count]), (1, new)):
+            for b in blocks:
+                self.totals[0] += sign * b[0]; self.totals[1] += sign * b[1]
+                self.totals[2] += sign * b[2]; self.totals[3] += sign * bool(b[2])
+        self.blocks[start:start + old_count] = new
+
+    def summary(self):
+        cjk, latin, chars, paragraphs = self.totals
+        return {'words': cjk + latin, 'chars': chars, 'paragraphs': paragraphs,
+                'minutes': (cjk / 300 + latin / 200) if chars else 0}
+
+# --- 本地文件 ---
+_FRONT_MATTER = re.compile(r'\A---[ \t]*\r?\n(.*?)\r?\n---[ \t]*(?:\r?\n|\Z)', re.S)
+
+def parse_front_matter(text):
+    """拆出 Markdown 开头 --- 包裹的 YAML 元数据，返回 (元数据字典, 正文)；没有或解析失败时元数据为空"""
+    m = _FRONT_MATTER.match(text or '')
+    if not m: return {}, text or ''
+    import yaml # 只有带 front matter 的文件才需要
+    try: meta = yaml.safe_load(m.group(1)) or {}
+    except yaml.YAMLError: return {}, text
+    return (meta, text[m.end():]) if isinstance(meta, dict) else ({}, text)
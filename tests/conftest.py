@@ -0,0 +1,24 @@
+"""测试公共设置：把程序目录与 benchmarks/ 加入导入路径，提供本地模拟 Typecho 服务端与指向临时目录的 Studio"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+@pytest.fixture
+def mock_blog():
+    from mock_typecho import MockTypecho
+    mock = MockTypecho(posts=3, comments=0)
+    mock.start()
+    yield mock
+    mock.stop()
+
+@pytest.fixture
+def studio(tmp_path, mock_blog):
+    from studio.core import Studio
+    s = Studio(str(tmp_path))
+    s.connect(mock_blog.url, mock_blog.user, mock_blog.password)
+    return s
@@ -0,0 +1,147 @@
+"""AI 调用：本地 SSE 端点上的流式解析，以及长文分段润色的拼接"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from studio.ai import AICancelled, ChunkedPolisher, abort_response, chat_completion, iter_sse_events
+
+def delta(**fields): return 'data: ' + json.dumps({'choices': [{'delta': fields}]}, ensure_ascii=False) + '\n\n'
+
+class _SSEHandler(BaseHTTPRequestHandler):
+    """按路径返回不同的事件流；分块编码逐个事件写出并立即 flush，gate 用来确认客户端是边收边处理"""
+    protocol_version = 'HTTP/1.1'
+    def log_message(self, *args): pass
+
+    def chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data)); self.wfile.flush()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        server = self.server
+        if self.path == '/incremental':
+            self.chunk(': keep-alive\n\n' + delta(role='assistant') + delta(content='你'))
+            server.gate.wait(5) # 客户端收到第一段后才继续发送
+            self.chunk(delta(content='好'))
+        elif self.path == '/reasoning':
+            self.chunk(delta(reasoning_content='先想') + delta(reasoning_content='一想') + delta(content='答案'))
+        elif self.path == '/multiline': # 一个事件的 data 分成多行，按规范用换行拼接
+            self.chunk('data: {"choices": [{"delta":\ndata:  {"content": "多行"}}]}\n\n')
+        elif self.path == '/done-open': # [DONE] 之后连接不关闭，客户端必须自己结束
+            self.chunk(delta(content='完') + 'data: [DONE]\n\n' + delta(content='多余'))
+            server.gate.wait(5); return
+        elif self.path == '/error':
+            self.chunk(delta(content='半') + 'data: {"error": {"message": "额度不足"}}\n\n')
+        elif self.path == '/disconnect': # 分块写到一半断开
+            self.chunk(delta(content='半'))
+            self.wfile.write(b'ff\r\ndata: {"cho'); self.wfile.flush()
+            self.close_connection = True; return
+        elif self.path == '/stall': # 发出一段后长时间没有数据
+            self.chunk(delta(content='停'))
+            server.gate.wait(10); return
+        elif self.path == '/endless':
+            for i in range(200):
+                if server.gate.is_set(): break
+                self.chunk(delta(content=str(i)))
+        self.chunk('data: [DONE]\n\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+@pytest.fixture
+def sse_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SSEHandler)
+    server.daemon_threads, server.gate = True, threading.Event()
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", server.gate
+    server.gate.set(); server.shutdown(); server.server_close()
+
+def stream(url, on_delta=None, **kwargs):
+    events = []
+    def collect(kind, text):
+        events.append((kind, text))
+        if on_delta: on_delta(kind, text)
+    result = chat_completion('key', 'model', [{'role': 'user', 'content': 'hi'}], url, on_delta=collect, timeout=(2, 3), **kwargs)
+    return result, events
+
+def test_iter_sse_events_parsing():
+    lines = [': ping', 'event: message', 'data: a', 'data:b', '', '', 'data: c', 'data:  d', '', 'data: [DONE]', '', 'data: after', '']
+    assert list(iter_sse_events(lines)) == ['a\nb', 'c\n d']
+    assert list(iter_sse_events([b'data: x', b''])) == ['x']
+    assert list(iter_sse_events(['data: tail'])) == ['tail'] # 没有结尾空行的最后一个事件
+
+def test_incremental_deltas(sse_url):
+    url, gate = sse_url
+    def on_delta(kind, text):
+        if text == '你': gate.set() # 第一段在服务端发出第二段之前就已经到达
+    result, events = stream(url + '/incremental', on_delta)
+    assert result == '你好' and events == [('content', '你'), ('content', '好')]
+
+def test_reasoning_content(sse_url):
+    result, events = stream(sse_url[0] + '/reasoning')
+    assert result == '答案'
+    assert events == [('reasoning', '先想'), ('reasoning', '一想'), ('content', '答案')]
+
+def test_multiline_data(sse_url):
+    assert stream(sse_url[0] + '/multiline')[0] == '多行'
+
+def test_done_terminates_without_waiting_for_close(sse_url):
+    result, events = stream(sse_url[0] + '/done-open')
+    assert result == '完' and events == [('content', '完')]
+
+def test_error_event_raises(sse_url):
+    with pytest.raises(RuntimeError, match='额度不足'): stream(sse_url[0] + '/error')
+
+def test_mid_stream_disconnect_raises(sse_url):
+    with pytest.raises(Exception) as info: stream(sse_url[0] + '/disconnect')
+    assert isinstance(info.value, requests.exceptions.RequestException) # 不能把半截回复当成完整结果
+
+def test_cancel_during_stream(sse_url):
+    url, gate = sse_url
+    cancel = threading.Event()
+    def on_delta(kind, text):
+        if text == '3': cancel.set()
+    with pytest.raises(AICancelled): stream(url + '/endless', on_delta, cancel_event=cancel)
+    gate.set()
+
+def test_cancel_while_waiting_for_data(sse_url):
+    """界面取消时除了置位 cancel_event，还会中断 on_response 交出的响应，不必等下一段数据或读超时"""
+    url, gate = sse_url
+    cancel, holder = threading.Event(), {}
+    def cancel_soon(kind, text):
+        def fire():
+            cancel.set(); abort_response(holder['response'])
+        threading.Timer(0.2, fire).start()
+    start = time.monotonic()
+    with pytest.raises(Exception):
+        chat_completion('key', 'model', [], url + '/stall', on_delta=cancel_soon, cancel_event=cancel,
+                        on_response=lambda r: holder.setdefault('response', r), timeout=(2, 8))
+    assert time.monotonic() - start < 4
+    gate.set()
+
+class _EchoPolisher(ChunkedPolisher):
+    """不访问网络：把每段原样“润色”回来（与真实调用一样去掉首尾空白），或按 replace 改写"""
+    replace = None
+    def _polish(self, chunk):
+        return (self.replace(chunk) if self.replace else chunk).strip()
+
+LONG = ("# 标题一\n\n第一段。\n\n\n\n第二段，前面多了两个空行。\n"
+        "```python\nprint(1)\n\nprint(2)\n```\n\n\n## 标题二\n紧跟标题的段落\n\n- 列表\n- 项\n") * 20
+
+def test_unchanged_chunks_keep_original_spacing():
+    text = "\n" + LONG + "\n\n"
+    result, stats = _EchoPolisher('k', 'm', max_chars=200, rate=0).run(text)
+    assert stats['total'] > 5 and stats['failed'] == 0
+    assert result == text
+
+def test_only_polished_lines_change():
+    polisher = _EchoPolisher('k', 'm', max_chars=200, rate=0)
+    polisher.replace = lambda chunk: chunk.replace('第一段。', '第一段！')
+    result, _ = polisher.run(LONG)
+    assert result == LONG.replace('第一段。', '第一段！')
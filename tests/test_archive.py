@@ -0,0 +1,13 @@
+"""单文件归档备份对模拟服务端的回归测试"""
+import os
+
+def test_cancelled_archive_leaves_no_file(studio):
+    engine = studio.archive_backup(media=False)
+    result = engine.run(lambda done, total, rate: engine.cancel())
+    assert result['cancelled'] and result['path'] == studio.dir_backups
+    assert os.listdir(studio.dir_backups) == [] and engine.latest_archive() is None
+
+def test_completed_archive_is_the_next_base(studio):
+    result = studio.archive_backup(media=False).run()
+    assert not result['cancelled'] and result['saved'] == 3
+    assert studio.archive_backup(media=False).latest_archive() == result['path']
@@ -0,0 +1,12 @@
+"""增量备份对模拟服务端的回归测试"""
+
+def test_cancel_during_listing_keeps_manifest(studio):
+    first = studio.backup_engine().run()
+    assert first['saved'] == 3 and len(studio.backup_engine().load_manifest()) == 3
+    engine = studio.backup_engine()
+    engine.cancel() # 文章列表还没拉完就取消
+    result = engine.run()
+    assert result['cancelled'] and result['total'] == 0
+    assert len(engine.load_manifest()) == 3 # 没列出来的文章不能被当作已删除
+    again = studio.backup_engine().run()
+    assert again['reused'] == 3 and again['fetched'] == 0
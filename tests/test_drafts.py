@@ -0,0 +1,13 @@
+"""草稿原子写入"""
+from studio.drafts import atomic_write
+from studio.metrics import METRICS
+
+def written_bytes():
+    return sum(d['bytes_out'] for k, n, d in METRICS.snapshot() if (k, n) == ('disk', 'atomic_write'))
+
+def test_atomic_write_records_encoded_size(tmp_path):
+    path, text = tmp_path / 'a.md', "中文草稿\n"
+    before = written_bytes()
+    atomic_write(str(path), text)
+    assert path.read_bytes() == text.encode('utf-8')
+    assert written_bytes() - before == len(text.encode('utf-8')) # 按 UTF-8 字节计，不是字符数
@@ -0,0 +1,90 @@
+"""HTML → Markdown：逐类元素核对转换结果，另含 Markdown 往返与病态、未闭合输入"""
+import time
+
+import pytest
+
+from bench_html2md import structure, visible_text
+from studio.html2md import clean_html, html_to_markdown
+from studio.render import MarkdownService
+
+@pytest.mark.parametrize('html, md', [
+    ('<h1>Title</h1><h2>Sub <em>it</em></h2><h6>six</h6><p>para</p>', '# Title\n\n## Sub *it*\n\n###### six\n\npara\n'),
+    ('<p><strong>b</strong> <em>i</em> <del>d</del> <code>a*b</code></p>', '**b** *i* ~~d~~ `a*b`\n'),
+    ('<p><a href="http://e.com" title="T">link</a> <code>x`y</code></p>', '[link](http://e.com "T") ``x`y``\n'),
+    ('<p><a href="https://e.com/a">https://e.com/a</a></p>', '<https://e.com/a>\n'),
+    ('<p><img alt="pic" src="a.png" title="T"></p>', '![pic](a.png "T")\n'),
+    ('<blockquote><p>q1</p><p>q2</p></blockquote>', '> q1\n>\n> q2\n'),
+    ('<p>before</p><hr><p>after</p>', 'before\n\n* * *\n\nafter\n'),
+    ('<p>a<!--more-->b</p><!--more--><p>c</p>', 'a<!--more-->b\n\n<!--more-->\n\nc\n'),
+])
+def test_inline_and_blocks(html, md):
+    assert html_to_markdown(html) == md
+
+def test_table_keeps_column_alignment_and_escapes_pipes():
+    html = ('<table><thead><tr><th style="text-align: left;">L</th><th style="text-align: center;">C</th>'
+            '<th style="text-align: right;">R</th><th>N</th></tr></thead>'
+            '<tbody><tr><td>1</td><td>2</td><td>3|x</td><td>4</td></tr></tbody></table>')
+    assert html_to_markdown(html) == '| L | C | R | N |\n| :--- | :---: | ---: | --- |\n| 1 | 2 | 3\\|x | 4 |\n'
+
+@pytest.mark.parametrize('html, md', [
+    ('<pre><code class="language-python">def f():\n    return 1 &lt; 2\n</code></pre>', '```python\ndef f():\n    return 1 < 2\n```\n'),
+    ('<pre><code>plain *not md*\n</code></pre>', '```\nplain *not md*\n```\n'),
+    ('<div class="codehilite"><pre><span></span><code><span class="nb">print</span>(1)\n</code></pre></div>', '```\nprint(1)\n```\n'),
+    ('<pre><code>a\n```\nb\n</code></pre>', '````\na\n```\nb\n````\n'),
+])
+def test_fenced_code(html, md):
+    assert html_to_markdown(html) == md
+
+def test_nested_lists_indent_and_number():
+    html = '<ul><li>a<ul><li>b<ol><li>c</li><li>d</li></ol></li></ul></li><li>e</li></ul>'
+    assert html_to_markdown(html) == '- a\n    - b\n        1. c\n        2. d\n- e\n'
+    assert html_to_markdown('<ol start="3"><li>x</li><li>y</li></ol>') == '3. x\n4. y\n'
+
+def test_footnotes_move_to_the_end():
+    html = ('<p>Text<sup id="fnref:1"><a class="footnote-ref" href="#fn:1">1</a></sup></p>'
+            '<div class="footnote"><hr><ol><li id="fn:1"><p>Note here.&#160;'
+            '<a class="footnote-backref" href="#fnref:1" title="Jump back">&#8617;</a></p></li></ol></div>')
+    assert html_to_markdown(html) == 'Text[^1]\n\n[^1]: Note here.\n'
+
+def test_entities_and_markdown_escaping():
+    html = '<p>a &amp; b &lt;tag&gt; &quot;q&quot; &copy; &#20013; 5*3 [x]</p>'
+    assert html_to_markdown(html) == 'a & b &lt;tag> "q" © 中 5\\*3 \\[x\\]\n'
+    assert html_to_markdown('<p>1. not a list</p><p># not a heading</p>') == '1\\. not a list\n\n\\# not a heading\n'
+
+def test_clean_html_passes_markdown_posts_through():
+    assert clean_html('<!--markdown--># Already **md**\n\n- x') == '# Already **md**\n\n- x'
+    assert clean_html('plain &amp; simple') == 'plain & simple'
+    assert clean_html('<p>Hi <b>there</b></p>') == 'Hi **there**'
+    assert clean_html(None) == ''
+
+def test_round_trip_through_the_renderer():
+    service = MarkdownService()
+    source = ('# T\n\nPara with **b**, *i*, `c` and [l](http://e.com).\n\n> quote\n\n- a\n    - b\n- c\n\nmid\n\n'
+              '1. one\n2. two\n\n| A | B |\n| :--- | ---: |\n| 1 | 2 |\n\n```python\nx = 1\n```\n\nEnd[^1].\n\n[^1]: Note.\n')
+    html = service.render(source)
+    again = service.render(html_to_markdown(html))
+    assert visible_text(again) == visible_text(html) and structure(again) == structure(html)
+
+def test_unclosed_img_is_linear_and_keeps_every_image():
+    html = '<p>' + '<img src="a.png" alt="x">' * 2000 + 'tail'
+    start = time.perf_counter()
+    md = html_to_markdown(html)
+    assert time.perf_counter() - start < 2
+    assert md.count('![x](a.png)') == 2000 and md.endswith('tail\n')
+
+@pytest.mark.parametrize('html, md', [
+    ('<p>one<p>two <strong>bold<p>three', 'one\n\ntwo **bold**\n\nthree\n'),
+    ('<p><a href="http://e.com/x">link <em>it</p><p>next</p>', '[link *it*](http://e.com/x)\n\nnext\n'),
+    ('<p>intro<ul><li>a<li>b</ul>', 'intro\n\n- a\n- b\n'),
+    ('<ul><li><b>a<li>b<ul><li>c<li>d</ul><li>e</ul>', '- **a**\n- b\n    - c\n    - d\n- e\n'),
+    ('<table><tr><th>A<th>B<tr><td>1<td>2</table>', '| A | B |\n| --- | --- |\n| 1 | 2 |\n'),
+    ('<dl><dt>T<dd>D<dt>T2<dd>D2</dl>', 'T\n:   D\n\nT2\n:   D2\n'),
+    ('<h1>a<h2>b', '# a\n\n## b\n'),
+    ('<div>stray</p> text</em></div>', 'stray text\n'),
+])
+def test_unclosed_tags_keep_all_text(html, md):
+    assert html_to_markdown(html) == md
+
+def test_block_paragraphs_inside_table_cells():
+    html = '<table><tr><th>A</th><th>B</th></tr><tr><td>x<p>para</p></td><td><p>p1</p><p>p2</p></td></tr></table>'
+    assert html_to_markdown(html) == '| A | B |\n| --- | --- |\n| x<br>para | p1<br>p2 |\n'
@@ -0,0 +1,67 @@
+"""上传队列：按内容去重、每个文件完成即回调"""
+import os
+import threading
+
+import pytest
+
+from studio import media
+from studio.media import MediaUploadQueue
+from studio.store import StudioStore
+
+def make_files(tmp_path, contents):
+    paths = []
+    for name, data in contents:
+        paths.append(str(tmp_path / name))
+        with open(paths[-1], 'wb') as f: f.write(data)
+    return paths
+
+class _FakeUpload:
+    """代替 StreamingMediaUpload，记录每次真正发出的上传"""
+    sent = []
+    def __init__(self, endpoint, user, pwd, path, timeout=60):
+        self.path, self.name = path, os.path.basename(path)
+    def cancel(self): pass
+    def run(self, on_progress=None):
+        self.sent.append(self.path)
+        return {'url': f"https://example.com/uploads/{self.name}"}
+
+def test_upload_dedup_and_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(media, 'StreamingMediaUpload', _FakeUpload); _FakeUpload.sent = []
+    store = StudioStore(str(tmp_path / 'studio.db'))
+    paths = make_files(tmp_path, [('a.png', b'A' * 1000), ('b.png', b'B' * 1000), ('a2.png', b'A' * 1000)])
+    seen = {}
+    queue = MediaUploadQueue('https://example.com/action/xmlrpc', 'u', 'p', paths, store=store, concurrency=2)
+    stats = queue.run(on_done=lambda i, s, r: seen.setdefault(i, (s, r)))
+    assert stats == {'uploaded': 2, 'cached': 1, 'cancelled': 0, 'error': 0}
+    assert seen[0][1]['url'] == seen[2][1]['url'] != seen[1][1]['url']
+    assert len(_FakeUpload.sent) == 2
+    again = MediaUploadQueue('https://example.com/action/xmlrpc', 'u', 'p', paths, store=store).run()
+    assert again['cached'] == 3 and len(_FakeUpload.sent) == 2 # 第二次全部命中本地缓存
+
+class _GatedQueue(MediaUploadQueue):
+    """slow.bin 的上传要等 release 置位后才返回，用来检查其他文件是否提前回调"""
+    release = None
+    def _upload(self, path, digest, on_progress):
+        if path.endswith('slow.bin'): assert self.release.wait(10)
+        return {'url': f"https://example.com/{os.path.basename(path)}"}
+
+def test_on_done_fires_as_soon_as_each_file_finishes(tmp_path):
+    paths = make_files(tmp_path, [('slow.bin', b'S'), ('fast1.bin', b'1'), ('fast2.bin', b'2')])
+    queue = _GatedQueue('https://example.com/action/xmlrpc', 'u', 'p', paths, concurrency=3)
+    queue.release = threading.Event()
+    order = []
+    def on_done(i, status, payload):
+        order.append((i, status, queue.release.is_set()))
+        if len(order) == 2: queue.release.set() # 两个快的都回调之后才放行慢的
+    stats = queue.run(on_done=on_done)
+    assert stats['uploaded'] == 3
+    assert sorted(i for i, _, _ in order[:2]) == [1, 2] and not order[0][2] and not order[1][2]
+    assert order[2][0] == 0
+
+def test_optimize_keeps_smaller_original_jpeg(tmp_path):
+    Image = pytest.importorskip('PIL.Image')
+    src = str(tmp_path / 'photo.jpeg')
+    Image.linear_gradient('L').convert('RGB').resize((64, 64)).save(src, 'JPEG', quality=10, optimize=True) # 已经压得很小，重新压缩只会变大
+    result = media.optimize_image(src, str(tmp_path / 'out'))
+    assert result['path'].endswith('photo.jpg')
+    with open(src, 'rb') as a, open(result['path'], 'rb') as b: assert a.read() == b.read()
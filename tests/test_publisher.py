@@ -0,0 +1,76 @@
+"""批量发布断点续传：结果未知的 newPost 只认领真正由它创建的文章"""
+import hashlib
+import os
+import time
+import xmlrpc.client
+from types import SimpleNamespace
+
+from studio.core import Studio
+from studio.publisher import BulkPublisher
+from studio.rpc import find_recent_post
+
+class FakeBlog:
+    """进程内的假 XML-RPC 客户端，只实现发布与找回用到的方法；文章按 ID 倒序即最近的在前"""
+    def __init__(self):
+        self.posts, self.edited = {}, []
+        self.wp = SimpleNamespace(getPosts=self.get_posts)
+        self.metaWeblog = SimpleNamespace(getPost=self.get_post, newPost=self.new_post, editPost=self.edit_post)
+
+    def add(self, title, description, modified=None):
+        post_id = str(len(self.posts) + 1)
+        self.posts[post_id] = {'postid': post_id, 'title': title, 'description': description,
+                               'dateModified': xmlrpc.client.DateTime(modified or time.time())}
+        return post_id
+
+    def get_posts(self, blog_id, user, pwd, query):
+        recent = [self.posts[k] for k in sorted(self.posts, key=int, reverse=True)]
+        return recent[query['offset']:query['offset'] + query['number']]
+
+    def get_post(self, post_id, user, pwd): return self.posts[post_id]
+    def new_post(self, blog_id, user, pwd, payload, publish): return self.add(payload['title'], payload['description'])
+    def edit_post(self, post_id, user, pwd, payload, publish):
+        self.edited.append(post_id); self.posts[post_id].update(description=payload['description']); return True
+
+def test_find_recent_post_requires_title_and_body():
+    blog = FakeBlog()
+    mine = blog.add('周报', '<p>我的 &amp; 周报</p>')
+    blog.add('周报', '<p>别人的周报</p>')
+    assert find_recent_post(blog, 'u', 'p', {'title': '周报', 'description': '<p>我的 &amp; 周报</p>\n'}) == mine
+    assert find_recent_post(blog, 'u', 'p', {'title': '周报', 'description': '<p>第三篇</p>'}) is None
+
+def test_find_recent_post_skips_posts_older_than_the_send():
+    blog = FakeBlog()
+    old = blog.add('周报', '<p>同样的内容</p>', modified=time.time() - 3 * 86400)
+    payload = {'title': '周报', 'description': '<p>同样的内容</p>'}
+    assert find_recent_post(blog, 'u', 'p', payload, since=time.time()) is None
+    assert find_recent_post(blog, 'u', 'p', payload, since=time.time() - 3 * 86400) == old
+
+class _FakePublisher(BulkPublisher):
+    blog = None
+    def _client(self): return self.blog
+
+def resume(tmp_path, blog, text):
+    """模拟上次运行在 newPost 途中退出：日志停在 sending，没有文章 ID，然后重新运行"""
+    studio = Studio(str(tmp_path))
+    studio.connect('https://blog.example.com', 'u', 'p')
+    path = os.path.join(studio.dir_drafts, 'weekly.md')
+    with open(path, 'w', encoding='utf-8') as f: f.write(text)
+    studio.store.record_publish_job(studio.endpoint, path, hashlib.sha256(text.encode('utf-8')).hexdigest(), None, 'sending')
+    publisher = _FakePublisher(studio, [path], rate=1000)
+    publisher.blog = blog
+    return studio, path, publisher.run()
+
+def test_resume_does_not_adopt_other_post_with_same_title(tmp_path):
+    blog = FakeBlog()
+    other = blog.add('周报', '<p>别人的周报</p>')
+    _, _, result = resume(tmp_path, blog, "---\ntitle: 周报\n---\n\n我的周报\n")
+    assert result['published'] == 1 and result['updated'] == 0
+    assert blog.posts[other]['description'] == '<p>别人的周报</p>' and not blog.edited # 同名文章没有被覆盖
+
+def test_resume_adopts_post_created_by_lost_request(tmp_path):
+    blog = FakeBlog()
+    created = blog.add('周报', '<p>我的周报</p>') # 请求其实已经到达
+    studio, path, result = resume(tmp_path, blog, "---\ntitle: 周报\n---\n\n我的周报\n")
+    assert result['updated'] == 1 and result['published'] == 0
+    assert studio.store.publish_jobs(studio.endpoint)[path]['post_id'] == created
+    assert blog.edited == [created] and len(blog.posts) == 1
@@ -0,0 +1,83 @@
+"""双向同步对模拟服务端的回归测试"""
+import os
+import xmlrpc.client
+
+import pytest
+
+def write(path, text):
+    with open(path, 'w', encoding='utf-8') as f: f.write(text)
+    st = os.stat(path)
+    os.utime(path, (st.st_atime, st.st_mtime + 1)) # 保证 mtime 变化，不依赖文件系统的时间精度
+
+def test_push_keeps_remote_status_of_linked_post(studio, mock_blog):
+    path = os.path.join(studio.dir_drafts, 'hello.md')
+    write(path, "---\ntitle: 你好\n---\n\n第一版\n")
+    result = studio.bulk_publisher(studio.dir_drafts, rate=1000).run()
+    assert result['published'] == 1
+    pid = int(studio.store.publish_jobs(studio.endpoint)[path]['post_id'])
+    assert mock_blog.edited[pid]['post_status'] == 'publish'
+
+    studio.sync_engine().run() # 建立基线
+    write(path, "---\ntitle: 你好\n---\n\n第二版\n")
+    result = studio.sync_engine().run()
+    assert result['push'] == 1 and not result['errors']
+    assert '第二版' in mock_blog.edited[pid]['description']
+    assert mock_blog.edited[pid]['post_status'] == 'publish' # 没写 status 时不能撤回为草稿
+
+def test_new_file_without_status_is_pushed_as_draft(studio, mock_blog):
+    write(os.path.join(studio.dir_drafts, 'new.md'), "---\ntitle: 新文章\n---\n\n正文\n")
+    result = studio.sync_engine().run()
+    assert result['push_new'] == 1
+    pid = max(mock_blog.edited)
+    assert mock_blog.edited[pid]['title'] == '新文章' and mock_blog.edited[pid]['post_status'] == 'draft'
+
+def test_explicit_status_wins(studio, mock_blog):
+    path = os.path.join(studio.dir_drafts, 'p.md')
+    write(path, "---\ntitle: 私密\nstatus: publish\n---\n\n正文\n")
+    studio.sync_engine().run()
+    pid = max(mock_blog.edited)
+    write(path, "---\ntitle: 私密\nstatus: private\n---\n\n正文\n")
+    assert studio.sync_engine().run()['push'] == 1
+    assert mock_blog.edited[pid]['post_status'] == 'private'
+
+@pytest.fixture
+def rejecting_blog():
+    from mock_typecho import MockTypecho
+    mock = MockTypecho(posts=0, comments=0)
+    def reject(*args): raise xmlrpc.client.Fault(500, "分类不存在")
+    mock.new_post = reject # start() 注册方法前替换
+    mock.start()
+    yield mock
+    mock.stop()
+
+def test_rejected_new_post_is_not_left_sending(tmp_path, rejecting_blog):
+    from studio.core import Studio
+    studio = Studio(str(tmp_path))
+    studio.connect(rejecting_blog.url, rejecting_blog.user, rejecting_blog.password)
+    path = os.path.join(studio.dir_drafts, 'a.md')
+    write(path, "---\ntitle: 被拒绝\n---\n\n正文\n")
+    result = studio.sync_engine().run()
+    assert result['errors'] and result['push_new'] == 0
+    assert studio.store.sync_entries(studio.endpoint)[path]['state'] == 'failed'
+    result = studio.sync_engine().run() # 下次直接重新新建，不去找回从未创建的文章
+    assert rejecting_blog.counters['calls'].get('metaWeblog.getPost', 0) == 0
+    assert len(result['errors']) == 1
+
+def test_front_matter_id_link_does_not_overwrite_edited_remote(studio, mock_blog):
+    mock_blog.edit_post('1', 'u', 'p', {'title': '远程标题', 'description': '<p>远程改过的正文</p>'})
+    path = os.path.join(studio.dir_drafts, 'linked.md')
+    write(path, "---\ntitle: 本地标题\nid: 1\n---\n\n本地正文\n")
+    result = studio.sync_engine().run()
+    assert result['conflicts'] == [path] and result['push'] == 0 # 基线未知时不能用本地覆盖远程
+    assert mock_blog.edited[1]['description'] == '<p>远程改过的正文</p>'
+    studio.sync_engine().resolve(path, 'remote')
+    with open(path, encoding='utf-8') as f: assert '远程改过的正文' in f.read()
+
+def test_front_matter_id_link_with_same_content_only_sets_baseline(studio, mock_blog):
+    from studio.sync import remote_text
+    mock_blog.edit_post('1', 'u', 'p', {'title': '同一篇', 'description': '<p>正文</p>'})
+    path = os.path.join(studio.dir_drafts, 'same.md')
+    write(path, "---\nid: 1\n" + remote_text(mock_blog.edited[1])[4:])
+    result = studio.sync_engine().run()
+    assert not result['conflicts'] and result['push'] == 0
+    assert studio.store.sync_entries(studio.endpoint)[path]['post_id'] == '1'
@@ -1,79 +1,668 @@
 import sys
+
+if __name__ == '__main__' and len(sys.argv) > 1: # 带子命令时走命令行（backup/publish/sync/comments），不加载 Qt
+    import multiprocessing
+    multiprocessing.freeze_support()
+    from studio.cli import main
+    sys.exit(main())
+
 import os
-import yaml
 import xmlrpc.client
-import markdown
-import re
 import webbrowser
-import json
-import requests 
+import time
+import threading
+import collections
+import bisect
+import uuid
+import sqlite3
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout, 
-                             QLineEdit, QTextEdit, QPushButton, QLabel, 
-                             QComboBox, QTreeWidgetItem, QFileDialog, QMenu,
-                             QTreeWidget, QGroupBox, QGridLayout, QCheckBox,
-                             QDateTimeEdit, QScrollArea, QTabWidget, QHeaderView, QInputDialog)
-from PyQt6.QtCore import Qt, QDateTime, QTimer, QThread, pyqtSignal
-from PyQt6.QtGui import QColor, QFont, QAction
-
-# 新增：异步 AI 处理线程，防止 UI 卡死
+                             QLineEdit, QTextEdit, QTextBrowser, QPushButton, QLabel, 
+                             QComboBox, QFileDialog, QMenu,
+                             QGroupBox, QGridLayout, QCheckBox,
+                             QDateTimeEdit, QScrollArea, QTabWidget, QHeaderView, QInputDialog,
+                             QSpinBox, QTreeView, QSplitter, QAbstractItemView, QMessageBox)
+from PyQt6.QtCore import Qt, QDateTime, QTimer, QThread, QObject, pyqtSignal, QAbstractTableModel, QModelIndex, QFileSystemWatcher
+from PyQt6.QtGui import QColor, QFont, QAction, QTextCursor, QTextFrameFormat
+
+from studio.ai import DEEPSEEK_API_URL, AICancelled, abort_response, ai_messages, chat_completion, ChunkedPolisher
+from studio.core import Studio, STATUS_MAP
+from studio.html2md import clean_html
+from studio.logs import LOG_LEVELS, COLOR_LEVELS, FileLogger
+from studio.media import media_snippet, pillow_available
+from studio.metrics import METRICS, KIND_NAMES
+from studio.publisher import is_transient
+from studio.render import BlockRenderer, preview_css
+from studio.rpc import (rpc_endpoint, make_rpc_proxy, RpcBatcher, post_summary, fetch_post_page,
+                        sync_comments, moderate_comments, COMMENT_STATUS, COMMENT_COLORS)
+from studio.text import TextStats
+
+# 异步 AI 处理线程，防止 UI 卡死；默认流式返回，逐段推送到界面
 class AIWorker(QThread):
+    chunk = pyqtSignal(str, str) # 类型 (reasoning/content), 增量文本
     finished = pyqtSignal(str, str) # 状态, 内容
     
-    def __init__(self, api_key, model, content, prompt_type):
+    def __init__(self, api_key, model, content, prompt_type, api_url=DEEPSEEK_API_URL, stream=True):
         super().__init__()
         self.api_key = api_key
         self.model = model
         self.content = content
         self.prompt_type = prompt_type
+        self.api_url = api_url
+        self.stream = stream
+        self.cancel_event = threading.Event()
+        self.response = None
+
+    def cancel(self):
+        self.cancel_event.set()
+        # 立即断开 HTTP 流，阻塞在读取上的工作线程随即退出
+        try:
+            if self.response is not None: abort_response(self.response)
+        except Exception: pass
+
+    def run(self):
+        try:
+            result = chat_completion(self.api_key, self.model, ai_messages(self.prompt_type, self.content), self.api_url,
+                                     on_delta=(lambda kind, text: self.chunk.emit(kind, text)) if self.stream else None,
+                                     cancel_event=self.cancel_event, on_response=lambda r: setattr(self, 'response', r))
+            self.finished.emit("success", result)
+        except Exception as e:
+            self.finished.emit("cancelled" if self.cancel_event.is_set() else "error", str(e))
+
+class ChunkedAIWorker(QThread):
+    progress = pyqtSignal(int, int, int) # 已完成段数, 总段数, 缓存命中数
+    finished = pyqtSignal(str, str) # 状态, 内容
+    stats = None
+
+    def __init__(self, polisher, content):
+        super().__init__()
+        self.polisher, self.content = polisher, content
+
+    def cancel(self): self.polisher.cancel()
+
+    def run(self):
+        try:
+            result, self.stats = self.polisher.run(self.content, lambda d, t, c: self.progress.emit(d, t, c))
+            self.finished.emit("success", result)
+        except AICancelled as e:
+            self.finished.emit("cancelled", str(e))
+        except Exception as e:
+            self.finished.emit("error", str(e))
+
+class BackupWorker(QThread):
+    progress = pyqtSignal(int, int, float) # 已完成, 总数, 篇/秒
+    finished = pyqtSignal(str, object) # 状态, 结果
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+
+    def run(self):
+        try:
+            self.finished.emit("success", self.engine.run(lambda d, t, r: self.progress.emit(d, t, r)))
+        except Exception as e:
+            self.finished.emit("error", str(e))
+
+class BulkPublishWorker(QThread):
+    progress = pyqtSignal(int, int, float) # 已完成, 总数, 篇/秒
+    item_done = pyqtSignal(str, str, str) # 路径, 状态, 文章 ID / 错误信息
+    finished = pyqtSignal(str, object) # 状态, 结果
+
+    def __init__(self, publisher):
+        super().__init__()
+        self.publisher = publisher
+
+    def run(self):
+        try:
+            self.finished.emit("success", self.publisher.run(lambda d, t, r: self.progress.emit(d, t, r),
+                                                             lambda p, s, x: self.item_done.emit(p, s, str(x))))
+        except Exception as e:
+            self.finished.emit("error", str(e))
+
+class RestoreWorker(QThread):
+    progress = pyqtSignal(str, int, int) # 阶段 (media / posts), 已完成, 总数
+    item_done = pyqtSignal(str, str, str) # 路径, 状态, 文章 ID / 错误信息
+    finished = pyqtSignal(str, object) # 状态, 结果
+
+    def __init__(self, restore):
+        super().__init__()
+        self.restore = restore
+
+    def run(self):
+        try:
+            self.finished.emit("success", self.restore.run(lambda s, d, t: self.progress.emit(s, d, t),
+                                                           lambda p, s, x: self.item_done.emit(p, s, str(x))))
+        except Exception as e:
+            self.finished.emit("error", str(e))
+
+class TwoWaySyncWorker(QThread):
+    item_done = pyqtSignal(str, str, str) # 动作, 路径 / 文章 ID, 说明
+    finished = pyqtSignal(str, object) # 状态, 结果
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+
+    def run(self):
+        try:
+            self.finished.emit("success", self.engine.run(on_item=lambda k, t, n: self.item_done.emit(k, str(t), n)))
+        except Exception as e:
+            self.finished.emit("error", str(e))
+
+class QueueReplayWorker(QThread):
+    finished = pyqtSignal(str, object) # 状态, (成功数, 失败列表, 剩余数) / 错误信息
+
+    def __init__(self, core):
+        super().__init__()
+        self.core = core
+
+    def run(self):
+        try: self.finished.emit("success", self.core.replay_queue())
+        except Exception as e: self.finished.emit("error", str(e))
+
+class RpcExecutor(QObject):
+    """统一的 XMLRPC 调用执行器：持有到 /action/xmlrpc 的连接，所有调用在线程池中执行，
+    结果通过 Qt 信号回到主线程回调；相同参数的读取请求在途时只发送一次"""
+    _done = pyqtSignal(int, bool, object) # 令牌, 是否成功, 结果 / 异常
+
+    def __init__(self, endpoint, user, pwd, workers=4, gzip_requests=False, parent=None):
+        super().__init__(parent)
+        self.endpoint, self.user, self.pwd, self.gzip_requests = endpoint, user, pwd, gzip_requests
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rpc')
+        self._local = threading.local()
+        self._token = 0
+        self._pending, self._inflight = {}, {} # 令牌 -> (合并键, 回调列表), 合并键 -> 令牌
+        self._done.connect(self._dispatch)
+
+    def _proxy(self, timeout):
+        if getattr(self._local, 'proxy', None) is None:
+            self._local.proxy = make_rpc_proxy(self.endpoint, timeout, self.gzip_requests)
+        self._local.proxy('transport').timeout = timeout
+        return self._local.proxy
+
+    def call(self, method, *args, on_success=None, on_error=None, timeout=30, retries=None, coalesce=None):
+        """异步调用 method(*args)。读取类方法（名称含 .get）默认合并重复请求、失败重试两次；
+        写入类方法默认不重试，避免超时后重复创建文章"""
+        is_read = '.get' in method
+        coalesce = is_read if coalesce is None else coalesce
+        retries = (2 if is_read else 0) if retries is None else retries
+        key = (method, repr(args)) if coalesce else None
+        if key in self._inflight:
+            token = self._inflight[key]
+            self._pending[token][1].append((on_success, on_error))
+            return token
+        self._token += 1
+        token = self._token
+        self._pending[token] = (key, [(on_success, on_error)])
+        if key: self._inflight[key] = token
+        self.pool.submit(self._run, token, method, args, timeout, retries)
+        return token
+
+    def _run(self, token, method, args, timeout, retries):
+        for attempt in range(retries + 1):
+            try:
+                self._done.emit(token, True, getattr(self._proxy(timeout), method)(*args)); return
+            except xmlrpc.client.Fault as e:
+                self._done.emit(token, False, e); return # 服务端明确拒绝，重试无意义
+            except Exception as e:
+                self._local.proxy = None # 连接可能已损坏，下次重建
+                if attempt == retries:
+                    self._done.emit(token, False, e); return
+                time.sleep(0.5 * 2 ** attempt)
+
+    def _dispatch(self, token, ok, payload):
+        key, callbacks = self._pending.pop(token, (None, []))
+        if key: self._inflight.pop(key, None)
+        for on_success, on_error in callbacks:
+            callback = on_success if ok else on_error
+            if callback: callback(payload)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class RemotePageWorker(QThread):
+    finished = pyqtSignal(str, int, object) # 状态, offset, 文章摘要列表 / 错误信息
+
+    def __init__(self, client, user, pwd, offset, number, store=None):
+        super().__init__()
+        self.client, self.user, self.pwd = client, user, pwd
+        self.offset, self.number, self.store = offset, number, store
+
+    def run(self):
+        try:
+            page = fetch_post_page(self.client, self.user, self.pwd, self.offset, self.number)
+            if self.store: self.store.upsert_remote(page) # 列表元数据顺带写入本地索引，离线也能搜索
+            self.finished.emit("success", self.offset, page)
+        except Exception as e:
+            self.finished.emit("error", self.offset, str(e))
+
+class RemotePostModel(QAbstractTableModel):
+    """远程文章列表模型：滚动接近底部时按页后台加载，刷新时按 ID 就地更新而不重建"""
+    headers = ["ID", "文章标题", "分类", "作者"]
+    page_loaded = pyqtSignal(int, int) # 本页 offset, 已加载总数
+    load_failed = pyqtSignal(str)
+
+    def __init__(self, page_size=100, store=None, parent=None):
+        super().__init__(parent)
+        self.page_size, self.store = page_size, store
+        self.rows, self.row_of = [], {} # 文章摘要列表, postid -> 行号
+        self.source = None
+        self.exhausted = True
+        self.worker = None
+
+    def set_source(self, endpoint, user, pwd, gzip_requests=False):
+        if self.source == (endpoint, user, pwd): return
+        self.beginResetModel()
+        self.source, self.rows, self.row_of, self.exhausted = (endpoint, user, pwd), [], {}, False
+        # 同一时刻只有一个分页线程在跑，共用一个 ServerProxy 以复用长连接
+        self.client = make_rpc_proxy(endpoint, gzip_requests=gzip_requests)
+        self.endResetModel()
+
+    def set_rows(self, rows):
+        """静态模式：直接展示给定结果（如搜索结果），不再分页加载"""
+        self.beginResetModel()
+        self.source, self.rows, self.exhausted = None, list(rows), True
+        self.row_of = {p['postid']: i for i, p in enumerate(self.rows)}
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()): return 0 if parent.isValid() else len(self.rows)
+    def columnCount(self, parent=QModelIndex()): return len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole: return self.headers[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        p = self.rows[index.row()]
+        if role == Qt.ItemDataRole.UserRole: return p['postid']
+        if role == Qt.ItemDataRole.DisplayRole:
+            col = index.column()
+            if col == 0: return p['postid']
+            if col == 1: return p['title']
+            if col == 2: return p['categories'][0] if p['categories'] else "未分类"
+            return p['author'] or "未知"
+        return None
+
+    # 不使用 canFetchMore/fetchMore：QTreeView 在行布局完成前就会反复调用它，导致一口气加载完全部分页
+    def can_load_more(self): return self.source is not None and not self.exhausted and self.worker is None
+
+    def load_more(self):
+        if self.can_load_more(): self._load(len(self.rows))
+
+    def refresh(self):
+        """重新拉取第一页：已有文章就地更新，新文章插入顶部，已加载的后续页保持不动"""
+        if self.source is None or self.worker is not None: return
+        self._load(0)
+
+    def _load(self, offset):
+        self.worker = RemotePageWorker(self.client, *self.source[1:], offset, self.page_size, self.store)
+        self.worker.finished.connect(self._on_page)
+        self.worker.start()
+
+    def _on_page(self, status, offset, payload):
+        self.worker.wait() # 自定义 finished 在 run() 返回前发出，等线程真正退出再释放，避免 QThread 被提前销毁
+        self.worker = None
+        if status != "success":
+            self.load_failed.emit(payload); return
+        first_load, fresh = not self.rows, []
+        for p in payload:
+            row = self.row_of.get(p['postid'])
+            if row is None: fresh.append(p); continue
+            if self.rows[row] != p:
+                self.rows[row] = p
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.headers) - 1))
+        if fresh:
+            at = 0 if offset == 0 and self.rows else len(self.rows)
+            self.beginInsertRows(QModelIndex(), at, at + len(fresh) - 1)
+            self.rows[at:at] = fresh
+            self.row_of = {p['postid']: i for i, p in enumerate(self.rows)}
+            self.endInsertRows()
+        if offset > 0 or first_load: self.exhausted = len(payload) < self.page_size
+        self.page_loaded.emit(offset, len(self.rows))
+
+class CommentSyncWorker(QThread):
+    progress = pyqtSignal(int) # 已拉取条数
+    finished = pyqtSignal(str, object) # 状态, (拉取条数, 新评论数) / 错误信息
+
+    def __init__(self, endpoint, user, pwd, store, status=None, post_id=None, full=False, gzip_requests=False):
+        super().__init__()
+        self.endpoint, self.user, self.pwd, self.store, self.gzip_requests = endpoint, user, pwd, store, gzip_requests
+        self.status, self.post_id, self.full = status, post_id, full
+
+    def run(self):
+        try:
+            client = make_rpc_proxy(self.endpoint, gzip_requests=self.gzip_requests)
+            result = sync_comments(client, self.user, self.pwd, self.store, self.status, self.post_id, self.full, on_page=self.progress.emit)
+            self.finished.emit("success", result)
+        except Exception as e:
+            self.finished.emit("error", str(e))
+
+class CommentModerationWorker(QThread):
+    finished = pyqtSignal(str, object, object) # 操作, 成功的 ID 列表, [(ID, 错误)] / 异常
+
+    def __init__(self, endpoint, user, pwd, ids, action, batch_size=20, gzip_requests=False):
+        super().__init__()
+        self.endpoint, self.user, self.pwd, self.gzip_requests = endpoint, user, pwd, gzip_requests
+        self.ids, self.action, self.batcher = list(ids), action, RpcBatcher(batch_size)
+
+    def run(self):
+        try:
+            client = make_rpc_proxy(self.endpoint, gzip_requests=self.gzip_requests)
+            done, failed = moderate_comments(client, self.user, self.pwd, self.ids, self.action, self.batcher)
+            self.finished.emit(self.action, done, failed)
+        except Exception as e:
+            self.finished.emit(self.action, [], e)
+
+class CommentModel(QAbstractTableModel):
+    """评论列表模型：数据来自本地缓存，审核结果按 ID 就地更新/删除行，不整表重建"""
+    headers = ["ID", "关联文章", "评论者", "评论内容", "状态"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows, self.row_of = [], {}
+        self.status_filter = None
+
+    def set_rows(self, rows, status_filter=None):
+        self.beginResetModel()
+        self.rows, self.status_filter = list(rows), status_filter
+        self.row_of = {c['comment_id']: i for i, c in enumerate(self.rows)}
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()): return 0 if parent.isValid() else len(self.rows)
+    def columnCount(self, parent=QModelIndex()): return len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole: return self.headers[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        c, col = self.rows[index.row()], index.column()
+        if role == Qt.ItemDataRole.UserRole: return c['comment_id']
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == 0: return str(c['comment_id'])
+            if col == 1: return c['post_title']
+            if col == 2: return c['author']
+            if col == 3: return c['content'].replace('\n', ' ')
+            return COMMENT_STATUS.get(c['status'], c['status'])
+        if role == Qt.ItemDataRole.ForegroundRole and col == 4: return QColor(COMMENT_COLORS.get(c['status'], 'black'))
+        if role == Qt.ItemDataRole.ToolTipRole and col == 3: return c['content']
+        return None
+
+    def set_status(self, ids, status):
+        """状态筛选下改成其他状态的评论移出列表，其余原地刷新状态列"""
+        if self.status_filter and status != self.status_filter:
+            self.remove_ids(ids); return
+        for cid in ids:
+            row = self.row_of.get(cid)
+            if row is None: continue
+            self.rows[row]['status'] = status
+            self.dataChanged.emit(self.index(row, 4), self.index(row, 4))
+
+    def remove_ids(self, ids):
+        rows = sorted((self.row_of[cid] for cid in ids if cid in self.row_of), reverse=True)
+        while rows: # 连续的行合并为一次 beginRemoveRows，避免上万行时逐行通知视图
+            last = first = rows.pop(0)
+            while rows and rows[0] == first - 1: first = rows.pop(0)
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.rows[first:last + 1]
+            self.endRemoveRows()
+        self.row_of = {c['comment_id']: i for i, c in enumerate(self.rows)}
+
+class LocalIndexer(QObject):
+    """用 QFileSystemWatcher 监视草稿/发布目录，合并 200ms 内的变更后在后台线程增量更新本地索引"""
+    updated = pyqtSignal(object, object) # 变化的行列表, 被删除的路径列表
+    failed = pyqtSignal(str)
+
+    def __init__(self, store, folders, parent=None):
+        super().__init__(parent)
+        self.store, self.folders = store, dict(folders) # 目录 -> 标签
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.addPaths([d for d in self.folders if os.path.isdir(d)])
+        self.watcher.directoryChanged.connect(self._dir_changed) # 新建、删除、改名
+        self.watcher.fileChanged.connect(self._file_changed) # 原地修改
+        self.pending_dirs, self.pending_files = set(), set()
+        self.timer = QTimer(self); self.timer.setSingleShot(True); self.timer.setInterval(200)
+        self.timer.timeout.connect(self._flush)
+        self.updated.connect(self._watch_files)
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='local-index')
+
+    def rescan(self): self._dir_changed(*self.folders)
+
+    def _dir_changed(self, *dirs):
+        self.pending_dirs.update(dirs); self.timer.start()
+
+    def _file_changed(self, path):
+        self.pending_files.add(path); self.timer.start()
+
+    def _flush(self):
+        dirs, files = self.pending_dirs, self.pending_files - {os.path.join(d, '') for d in self.pending_dirs}
+        self.pending_dirs, self.pending_files = set(), set()
+        self.pool.submit(self._apply, dirs, files)
+
+    def _apply(self, dirs, files):
+        try:
+            changed, removed = self.store.sync_local([(d, self.folders[d]) for d in dirs])
+            for path in files - {r[0] for r in changed}:
+                if os.path.dirname(path) in dirs: continue # 目录扫描已处理
+                row = self.store.index_local(path, self.folders.get(os.path.dirname(path), ''))
+                if row: changed.append(row)
+                elif not os.path.exists(path): removed.append(path)
+            if changed or removed: self.updated.emit(changed, removed)
+        except Exception as e: self.failed.emit(str(e))
+
+    def _watch_files(self, changed, removed):
+        watched = set(self.watcher.files())
+        fresh = [r[0] for r in changed if r[0] not in watched]
+        if fresh: self.watcher.addPaths(fresh)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class LocalFileModel(QAbstractTableModel):
+    """本地文章列表模型：按修改时间倒序，索引变更时只移动/插入/删除对应的行"""
+    headers = ["类型", "标题", "文件名", "最后修改时间"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = [] # (路径, 标签, 标题, mtime, 大小)
+
+    def set_rows(self, rows):
+        self.beginResetModel(); self.rows = list(rows); self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()): return 0 if parent.isValid() else len(self.rows)
+    def columnCount(self, parent=QModelIndex()): return len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole: return self.headers[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        path, label, title, mtime, size = self.rows[index.row()]
+        if role == Qt.ItemDataRole.UserRole: return path
+        if role == Qt.ItemDataRole.ToolTipRole: return f"{path}\n{size / 1024:.1f} KB"
+        if role == Qt.ItemDataRole.DisplayRole:
+            return (label, title, os.path.basename(path), datetime.fromtimestamp(mtime or 0).strftime('%Y-%m-%d %H:%M:%S'))[index.column()]
+        return None
+
+    def apply(self, changed, removed):
+        for path in [*removed, *(r[0] for r in changed)]:
+            row = next((i for i, r in enumerate(self.rows) if r[0] == path), None)
+            if row is None: continue
+            self.beginRemoveRows(QModelIndex(), row, row); del self.rows[row]; self.endRemoveRows()
+        for r in changed:
+            at = bisect.bisect_right(self.rows, -(r[3] or 0), key=lambda x: -(x[3] or 0))
+            self.beginInsertRows(QModelIndex(), at, at); self.rows.insert(at, r); self.endInsertRows()
+
+class MarkdownPreview(QTextBrowser):
+    """内嵌实时预览：每个 Markdown 块渲染进自己的 QTextFrame，更新时只替换首尾相同部分之间变化的块，
+    不重新解析整篇 HTML，长文每次击键的更新也能在一帧内完成"""
+    def __init__(self, service=None, parent=None):
+        super().__init__(parent)
+        self.setOpenExternalLinks(True)
+        self.document().setUndoRedoEnabled(False)
+        self.document().setDefaultStyleSheet(preview_css())
+        self.renderer = BlockRenderer(service)
+        self.keys, self.frames = [], []
+
+    def set_markdown(self, text):
+        """返回本次实际重新渲染的块数"""
+        self.apply_blocks(self.renderer.render(text))
+        return self.renderer.last_rendered
+
+    def apply_blocks(self, items):
+        keys = [k for k, _ in items]
+        n, m, p, q = len(self.keys), len(keys), 0, 0
+        limit = min(n, m)
+        while p < limit and self.keys[p] == keys[p]: p += 1
+        while q < limit - p and self.keys[n - 1 - q] == keys[m - 1 - q]: q += 1
+        doc = self.document(); cursor = QTextCursor(doc); cursor.beginEditBlock()
+        for frame in self.frames[p:n - q]: # 变化的块整体删除重建，避免残留的段落格式
+            cursor.setPosition(frame.firstPosition() - 1); cursor.setPosition(frame.lastPosition() + 1, QTextCursor.MoveMode.KeepAnchor)
+            cursor.removeSelectedText()
+        fresh, prev = [], self.frames[p - 1] if p else None
+        for _, html in items[p:m - q]:
+            cursor.setPosition(prev.lastPosition() + 1 if prev else 0)
+            prev = cursor.insertFrame(QTextFrameFormat())
+            cursor.insertHtml(html); fresh.append(prev)
+        cursor.endEditBlock()
+        self.frames[p:n - q], self.keys = fresh, keys
+
+class MediaQueueWorker(QThread):
+    progress = pyqtSignal(int, object, object) # 序号, 已发送字节, 总字节（可能超过 32 位整数）
+    item_done = pyqtSignal(int, str, object) # 序号, 状态, 结果字典 / 错误信息
+    finished = pyqtSignal(str, object) # 状态, 统计 / 错误信息
+
+    def __init__(self, queue):
+        super().__init__()
+        self.queue = queue
 
     def run(self):
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            prompt = "请作为资深博客编辑，对以下内容进行润色，优化表达并保持Markdown格式：" if self.prompt_type == "润色" else "请为我续写并完善以下文章内容："
-            data = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": "你是一个专业的博文写作专家。"},
-                    {"role": "user", "content": f"{prompt}\n\n{self.content}"}
-                ],
-                "stream": False
-            }
-            response = requests.post("https://api.deepseek.com/chat/completions", headers=headers, json=data, timeout=60)
-            res_json = response.json()
-            if "choices" in res_json:
-                result = res_json['choices'][0]['message']['content']
-                self.finished.emit("success", result)
-            else:
-                self.finished.emit("error", f"API 错误: {res_json.get('error', {}).get('message', '未知错误')}")
+            stats = self.queue.run(lambda i, sent, total: self.progress.emit(i, sent, total),
+                                   lambda i, status, payload: self.item_done.emit(i, status, payload))
+            self.finished.emit("success", stats)
         except Exception as e:
             self.finished.emit("error", str(e))
 
+class StudioLogger(QObject):
+    """线程安全的日志入口：任意线程调用 log()，记录经信号排队回到主线程的视图模型，文件由 FileLogger 异步写入"""
+    record = pyqtSignal(object) # (时间, 级别, 消息, 颜色)
+
+    def __init__(self, path, file_level='DEBUG', parent=None, **writer_opts):
+        super().__init__(parent)
+        self.file_logger = FileLogger(path, file_level, on_record=self.record.emit, **writer_opts)
+
+    def log(self, level, text, color=None): self.file_logger.log(level, text, color)
+
+    def close(self): self.file_logger.close()
+
+class LogRingModel(QAbstractTableModel):
+    """日志面板的环形缓冲模型：最多保留 capacity 条，超出时丢弃最旧的；同一波记录合并成一次插入"""
+    headers = ["时间", "级别", "系统消息"]
+
+    def __init__(self, capacity=2000, parent=None):
+        super().__init__(parent)
+        self.rows = collections.deque(maxlen=capacity)
+        self.pending, self.min_level = [], LOG_LEVELS['DEBUG']
+
+    def rowCount(self, parent=QModelIndex()): return 0 if parent.isValid() else len(self.rows)
+    def columnCount(self, parent=QModelIndex()): return len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole: return self.headers[section]
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        now, level, text, color = self.rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole: return (f"{now:%H:%M:%S}", level, text)[index.column()]
+        if role == Qt.ItemDataRole.ToolTipRole: return f"{now:%Y-%m-%d %H:%M:%S}"
+        if role == Qt.ItemDataRole.ForegroundRole and index.column() > 0: return QColor(color)
+
+    def append(self, rec):
+        if LOG_LEVELS[rec[1]] < self.min_level: return
+        if not self.pending: QTimer.singleShot(50, self._flush)
+        self.pending.append(rec)
+
+    def _flush(self):
+        batch, self.pending = self.pending[-self.rows.maxlen:], []
+        overflow = len(self.rows) + len(batch) - self.rows.maxlen
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            for _ in range(overflow): self.rows.popleft()
+            self.endRemoveRows()
+        if not batch: return
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(batch) - 1)
+        self.rows.extend(batch)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel(); self.rows.clear(); self.pending = []; self.endResetModel()
+
+class MetricsModel(QAbstractTableModel):
+    """性能统计表：每次刷新按 (类别, 名称) 原位更新数值，只有出现新条目时才重建，选中行不会丢失"""
+    headers = ["类别", "名称", "次数", "失败", "平均 ms", "p50 ms", "p95 ms", "p99 ms", "最大 ms", "发送 KB", "接收 KB"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = [] # [(类别, 名称, 统计字典)]
+
+    def set_snapshot(self, snap):
+        if [r[:2] for r in snap] == [r[:2] for r in self.rows]:
+            self.rows = snap
+            if snap: self.dataChanged.emit(self.index(0, 2), self.index(len(snap) - 1, len(self.headers) - 1))
+            return
+        self.beginResetModel(); self.rows = snap; self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()): return 0 if parent.isValid() else len(self.rows)
+    def columnCount(self, parent=QModelIndex()): return len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole: return self.headers[section]
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        kind, name, d = self.rows[index.row()]
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == 0: return KIND_NAMES.get(kind, kind)
+            if col == 1: return name
+            if col in (2, 3): return str(d['count'] if col == 2 else d['errors'])
+            if col <= 8:
+                v = d[('avg', 'p50', 'p95', 'p99', 'max')[col - 4]]
+                return '' if v is None else f"{v * 1000:.1f}"
+            return f"{d['bytes_out' if col == 9 else 'bytes_in'] / 1024:.1f}"
+        if role == Qt.ItemDataRole.TextAlignmentRole and col >= 2: return Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+        if role == Qt.ItemDataRole.ForegroundRole and col == 3 and d['errors']: return QColor('red')
+        return None
+
 class TypechoContentStudio(QWidget):
     def __init__(self):
         super().__init__()
-        # --- 核心修改：确保路径始终指向 EXE 所在的真实文件夹 ---
-        if getattr(sys, 'frozen', False):
-            # 如果是打包后的 EXE 运行
-            self.base_dir = os.path.dirname(sys.executable)
-        else:
-            # 如果是普通的 .py 脚本运行
-            self.base_dir = os.path.dirname(os.path.abspath(__file__))
-        
-        # 剩下的路径保持不变
-        self.config_path = os.path.join(self.base_dir, 'config.yaml')
-        self.log_file_path = os.path.join(self.base_dir, 'studio_log.txt')
-        self.dir_drafts = os.path.join(self.base_dir, 'content', 'drafts')
-        self.dir_sent = os.path.join(self.base_dir, 'content', 'sent')
-        self.dir_backups = os.path.join(self.base_dir, 'backups')
-        
-        self.init_directories()
+        self.core = Studio() # 目录、配置与各项操作都在不依赖 Qt 的核心里，界面只负责交互
+        self.base_dir, self.config_path, self.log_file_path = self.core.base_dir, self.core.config_path, self.core.log_file_path
+        self.dir_drafts, self.dir_sent, self.dir_backups = self.core.dir_drafts, self.core.dir_sent, self.core.dir_backups
+        self.logger = StudioLogger(self.log_file_path, parent=self) # 日志文件按 1MB 轮转，保留 3 份
+        self.log_model = LogRingModel(parent=self)
+        self.logger.record.connect(self.log_model.append)
+        self.store, self.drafts, self.markdown_service = self.core.store, self.core.drafts, self.core.markdown_service
+        self.draft_id, self.draft_dirty = uuid.uuid4().hex, False # 当前编辑内容对应的草稿，及是否有未保存的修改
+        self.draft_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='autosave') # 单线程保证保存顺序
+        self.draft_failed = {} # 草稿 ID -> 保存失败的 (标题, 正文)，由定时器按原草稿重试
         self.rpc_client = None
         self.current_post_id = None
         self.ai_thread = None # AI 线程引用
+        self.ai_retired = [] # 已取消但尚未退出的 AI 线程
+        self.backup_thread = None # 备份线程引用
+        self.bulk_thread = None # 批量发布线程引用
+        self.restore_thread = None # 归档恢复线程引用
+        self.two_way_thread = None # 双向同步线程引用
+        self.replay_thread = None # 离线队列重放线程引用
+        self.upload_thread = None # 上传队列线程引用
+        self.ai_api_url = DEEPSEEK_API_URL # 可在 config.yaml 中用 ai_api_url 指向其他兼容接口
+        self.ai_chunk_chars = 3000 # 分段润色时每段的最大字符数
         
         self.setup_ui_structure()
         self.bind_events()
@@ -82,10 +671,10 @@ class TypechoContentStudio(QWidget):
         self.save_timer = QTimer()
         self.save_timer.timeout.connect(self.auto_save_draft)
         self.save_timer.start(60000)
-
-    def init_directories(self):
-        for d in [self.dir_drafts, self.dir_sent, self.dir_backups]:
-            os.makedirs(d, exist_ok=True)
+        # 离线队列：连接恢复前每分钟尝试重放一次
+        self.replay_timer = QTimer(self)
+        self.replay_timer.timeout.connect(self.replay_offline_queue)
+        self.replay_timer.start(60000)
 
     def setup_ui_structure(self):
         self.setWindowTitle('Typecho Studio')
@@ -97,6 +686,7 @@ class TypechoContentStudio(QWidget):
         self.tab_local = QWidget(); self.setup_local_tab(); self.tabs.addTab(self.tab_local, "本地仓库")
         self.tab_remote = QWidget(); self.setup_remote_tab(); self.tabs.addTab(self.tab_remote, "远程管理")
         self.tab_comment = QWidget(); self.setup_comment_tab(); self.tabs.addTab(self.tab_comment, "评论管理")
+        self.tab_metrics = QWidget(); self.setup_metrics_tab(); self.tabs.addTab(self.tab_metrics, "性能统计")
         self.tab_about = QWidget(); self.setup_about_tab(); self.tabs.addTab(self.tab_about, "关于软件")
         self.main_layout.addWidget(self.tabs)
         
@@ -104,21 +694,26 @@ class TypechoContentStudio(QWidget):
         log_header.addWidget(QLabel("系统运行日志 (自动同步至本地文本)"))
         self.btn_clear_log = QPushButton("清空面板日志")
         self.btn_clear_log.setFixedWidth(100)
+        self.cb_log_level = QComboBox(); self.cb_log_level.addItems(list(LOG_LEVELS)); self.cb_log_level.setCurrentText('DEBUG')
         log_header.addStretch()
+        log_header.addWidget(QLabel("面板级别:")); log_header.addWidget(self.cb_log_level)
         log_header.addWidget(self.btn_clear_log)
         self.main_layout.addLayout(log_header)
 
-        self.console_output = QTreeWidget()
-        self.console_output.setColumnCount(2)
-        self.console_output.setHeaderLabels(["时间", "系统消息"])
-        self.console_output.setColumnWidth(0, 80)
+        self.console_output = QTreeView()
+        self.console_output.setModel(self.log_model)
+        self.console_output.setRootIsDecorated(False); self.console_output.setUniformRowHeights(True)
+        self.console_output.setColumnWidth(0, 80); self.console_output.setColumnWidth(1, 70)
         self.console_output.setFixedHeight(140)
         self.console_output.setStyleSheet("background-color: white; border: 1px solid #aaa; font-size: 11px;")
         self.main_layout.addWidget(self.console_output)
 
     def bind_events(self):
         self.tabs.currentChanged.connect(lambda i: self.write_log(f"切换至标签页: {self.tabs.tabText(i)}"))
+        for w in (self.edit_title, self.edit_tags, self.edit_body): w.textChanged.connect(self.mark_draft_dirty)
         self.btn_clear_log.clicked.connect(self.clear_ui_logs)
+        self.cb_log_level.currentTextChanged.connect(self.set_log_level)
+        self.log_model.rowsInserted.connect(lambda *_: self.console_output.scrollToBottom())
 
     def setup_editor_tab(self):
         layout = QHBoxLayout(self.tab_editor)
@@ -126,16 +721,36 @@ class TypechoContentStudio(QWidget):
         self.edit_title = QLineEdit(); self.edit_title.setPlaceholderText("标题"); self.edit_title.setFixedHeight(35)
         self.edit_tags = QLineEdit(); self.edit_tags.setPlaceholderText("标签 (英文逗号隔开)")
         self.edit_body = QTextEdit(); self.edit_body.setFont(QFont("Consolas", 11))
-        self.edit_body.textChanged.connect(self.update_word_count)
+        self.text_stats = TextStats()
+        self.edit_body.document().contentsChange.connect(self.on_body_contents_change)
+        self.word_count_timer = QTimer(); self.word_count_timer.setSingleShot(True); self.word_count_timer.setInterval(300)
+        self.word_count_timer.timeout.connect(self.update_word_count)
         self.label_word_count = QLabel("字数: 0")
         self.label_word_count.setStyleSheet("color: gray; font-size: 10px;")
-        editor_area.addWidget(self.edit_title); editor_area.addWidget(self.edit_tags); editor_area.addWidget(self.edit_body); editor_area.addWidget(self.label_word_count)
+        # AI 结果面板：与正文并排，流式显示生成内容，确认后再采纳
+        self.ai_panel = QWidget(); apl = QVBoxLayout(self.ai_panel); apl.setContentsMargins(0, 0, 0, 0)
+        self.label_ai_status = QLabel("AI 结果"); self.label_ai_status.setStyleSheet("color: purple; font-size: 10px;")
+        self.ai_result_view = QTextEdit(); self.ai_result_view.setReadOnly(True); self.ai_result_view.setFont(QFont("Consolas", 11))
+        abl = QHBoxLayout()
+        self.btn_ai_cancel = QPushButton("停止生成"); self.btn_ai_cancel.clicked.connect(self.cancel_ai)
+        self.btn_ai_apply = QPushButton("采纳结果"); self.btn_ai_apply.clicked.connect(self.apply_ai_result)
+        self.btn_ai_close = QPushButton("关闭"); self.btn_ai_close.clicked.connect(self.close_ai_panel)
+        abl.addWidget(self.btn_ai_cancel); abl.addWidget(self.btn_ai_apply); abl.addStretch(); abl.addWidget(self.btn_ai_close)
+        apl.addWidget(self.label_ai_status); apl.addWidget(self.ai_result_view); apl.addLayout(abl)
+        self.ai_panel.hide()
+        self.editor_splitter = QSplitter(Qt.Orientation.Horizontal)
+        self.preview_view = MarkdownPreview(self.markdown_service); self.preview_view.hide()
+        self.preview_timer = QTimer(); self.preview_timer.setSingleShot(True); self.preview_timer.setInterval(80)
+        self.preview_timer.timeout.connect(self.update_preview)
+        self.editor_splitter.addWidget(self.edit_body); self.editor_splitter.addWidget(self.preview_view); self.editor_splitter.addWidget(self.ai_panel)
+        editor_area.addWidget(self.edit_title); editor_area.addWidget(self.edit_tags); editor_area.addWidget(self.editor_splitter); editor_area.addWidget(self.label_word_count)
         
         bl = QHBoxLayout()
         self.btn_upload = QPushButton("上传图片附件"); self.btn_upload.clicked.connect(self.process_media)
-        self.btn_save_now = QPushButton("保存本地草稿"); self.btn_save_now.clicked.connect(self.auto_save_draft)
-        self.btn_preview = QPushButton("浏览器预览"); self.btn_preview.clicked.connect(self.preview_markdown)
-        bl.addWidget(self.btn_upload); bl.addWidget(self.btn_save_now); bl.addWidget(self.btn_preview); bl.addStretch()
+        self.btn_save_now = QPushButton("保存本地草稿"); self.btn_save_now.clicked.connect(lambda: self.auto_save_draft(force=True))
+        self.btn_history = QPushButton("历史版本"); self.btn_history.clicked.connect(self.show_draft_history)
+        self.btn_preview = QPushButton("实时预览"); self.btn_preview.setCheckable(True); self.btn_preview.toggled.connect(self.toggle_preview)
+        bl.addWidget(self.btn_upload); bl.addWidget(self.btn_save_now); bl.addWidget(self.btn_history); bl.addWidget(self.btn_preview); bl.addStretch()
         editor_area.addLayout(bl)
         
         param_scroll = QScrollArea(); param_scroll.setFixedWidth(260); param_scroll.setWidgetResizable(True)
@@ -147,12 +762,14 @@ class TypechoContentStudio(QWidget):
         gcl.addWidget(QLabel("账号:"), 1, 0); gcl.addWidget(self.in_user, 1, 1)
         gcl.addWidget(QLabel("密码:"), 2, 0); gcl.addWidget(self.in_pass, 2, 1)
         gcl.addWidget(QLabel("AI秘钥:"), 3, 0); gcl.addWidget(self.in_ai_key, 3, 1)
+        self.chk_gzip = QCheckBox("压缩请求体 (需服务端支持)")
+        gcl.addWidget(self.chk_gzip, 4, 0, 1, 2)
         btn_s = QPushButton("同步配置并连接"); btn_s.clicked.connect(self.sync_server_data)
-        gcl.addWidget(btn_s, 4, 0, 1, 2); gc.setLayout(gcl)
+        gcl.addWidget(btn_s, 5, 0, 1, 2); gc.setLayout(gcl)
         
         gp = QGroupBox("发布参数"); gpl = QVBoxLayout()
         self.cb_cat = QComboBox(); self.cb_status = QComboBox()
-        self.status_map = {"公开": "publish", "待审核": "pending", "私密": "private", "隐藏": "hidden", "密码保护": "password"}
+        self.status_map = STATUS_MAP
         self.cb_status.addItems(list(self.status_map.keys()))
         self.in_post_pass = QLineEdit(); self.in_post_pass.setPlaceholderText("访问密码")
         self.dt_picker = QDateTimeEdit(QDateTime.currentDateTime()); self.dt_picker.setCalendarPopup(True)
@@ -164,6 +781,7 @@ class TypechoContentStudio(QWidget):
         gol = QVBoxLayout()
         self.cb_ai_model = QComboBox()
         self.cb_ai_model.addItems(["deepseek-chat", "deepseek-reasoner"])
+        self.chk_ai_chunked = QCheckBox("长文分段并行润色"); self.chk_ai_chunked.setChecked(True)
         self.btn_ai_fix = QPushButton("✨ AI 智能润色正文")
         self.btn_ai_fix.setStyleSheet("background-color: #9b59b6; color: white; border-radius: 3px;")
         self.btn_ai_fix.clicked.connect(self.execute_ai_beautify)
@@ -171,15 +789,37 @@ class TypechoContentStudio(QWidget):
         self.btn_backup = QPushButton("一键全站本地备份")
         self.btn_backup.setStyleSheet("background-color: #3498db; color: white; border-radius: 3px;")
         self.btn_backup.clicked.connect(self.execute_full_backup)
+        self.spin_backup_workers = QSpinBox(); self.spin_backup_workers.setRange(1, 32); self.spin_backup_workers.setValue(4)
+        self.chk_incremental = QCheckBox("增量备份 (仅拉取变更文章)"); self.chk_incremental.setChecked(True)
+        self.chk_archive = QCheckBox("单文件归档 (含附件)")
+        self.chk_archive.setToolTip("备份为一个 zip 归档并下载正文引用的图片等附件，可用「从归档恢复」迁移到新博客")
+        self.btn_restore = QPushButton("从归档恢复...")
+        self.btn_restore.clicked.connect(self.execute_restore)
+        self.spin_batch_size = QSpinBox(); self.spin_batch_size.setRange(1, 200); self.spin_batch_size.setValue(20)
+        self.spin_batch_size.setToolTip("每个 system.multicall 请求合并的文章数，设为 1 即逐篇请求")
+        self.spin_upload_workers = QSpinBox(); self.spin_upload_workers.setRange(1, 8); self.spin_upload_workers.setValue(3)
         
-        gol.addWidget(QLabel("AI 模型:")); gol.addWidget(self.cb_ai_model)
-        gol.addWidget(self.btn_ai_fix); gol.addWidget(self.btn_backup)
+        gol.addWidget(QLabel("AI 模型:")); gol.addWidget(self.cb_ai_model); gol.addWidget(self.chk_ai_chunked)
+        gol.addWidget(self.btn_ai_fix); gol.addWidget(QLabel("备份并发数:")); gol.addWidget(self.spin_backup_workers)
+        gol.addWidget(QLabel("每批合并篇数:")); gol.addWidget(self.spin_batch_size); gol.addWidget(self.chk_incremental); gol.addWidget(self.chk_archive)
+        gol.addWidget(self.btn_backup); gol.addWidget(self.btn_restore)
+        gol.addWidget(QLabel("上传并发数:")); gol.addWidget(self.spin_upload_workers)
         go.setLayout(gol)
+
+        gi = QGroupBox("图片优化 (需安装 Pillow)"); gil = QGridLayout()
+        self.chk_img_opt = QCheckBox("上传前压缩图片"); self.chk_img_webp = QCheckBox("转换为 WebP"); self.chk_img_srcset = QCheckBox("生成 srcset")
+        self.spin_img_width = QSpinBox(); self.spin_img_width.setRange(320, 8000); self.spin_img_width.setSingleStep(100); self.spin_img_width.setValue(1600)
+        self.spin_img_quality = QSpinBox(); self.spin_img_quality.setRange(30, 100); self.spin_img_quality.setValue(82)
+        gil.addWidget(self.chk_img_opt, 0, 0, 1, 2)
+        gil.addWidget(QLabel("最大宽度:"), 1, 0); gil.addWidget(self.spin_img_width, 1, 1)
+        gil.addWidget(QLabel("压缩质量:"), 2, 0); gil.addWidget(self.spin_img_quality, 2, 1)
+        gil.addWidget(self.chk_img_webp, 3, 0); gil.addWidget(self.chk_img_srcset, 3, 1)
+        gi.setLayout(gil)
         
         self.btn_pub = QPushButton("确认提交文章"); self.btn_pub.setFixedHeight(50); self.btn_pub.setStyleSheet("background-color: #27ae60; color: white; font-weight: bold; border-radius: 5px;")
         self.btn_pub.clicked.connect(self.execute_publish)
         
-        pl.addWidget(gc); pl.addWidget(gp); pl.addWidget(go); pl.addStretch(); pl.addWidget(self.btn_pub)
+        pl.addWidget(gc); pl.addWidget(gp); pl.addWidget(go); pl.addWidget(gi); pl.addStretch(); pl.addWidget(self.btn_pub)
         param_scroll.setWidget(pp); layout.addLayout(editor_area, 1); layout.addWidget(param_scroll)
 
     def execute_ai_beautify(self):
@@ -192,66 +832,298 @@ class TypechoContentStudio(QWidget):
         self.write_log(f"正在发送请求至 DeepSeek ({self.cb_ai_model.currentText()})...", "purple")
         self.btn_ai_fix.setEnabled(False)
         self.btn_ai_fix.setText("AI 正在思考中...")
+        self.ai_result_view.clear(); self.ai_panel.show()
+        self.btn_ai_cancel.setEnabled(True); self.btn_ai_apply.setEnabled(False)
+        self.label_ai_status.setText("等待 AI 响应...")
+        self.ai_started, self.ai_first_token, self.ai_reasoning_chars = time.monotonic(), None, 0
         
-        self.ai_thread = AIWorker(key, self.cb_ai_model.currentText(), content, "润色")
+        if self.chk_ai_chunked.isChecked() and len(content) > self.ai_chunk_chars:
+            # 长文：分段并行润色，命中缓存的分段不再发送
+            polisher = ChunkedPolisher(key, self.cb_ai_model.currentText(), "润色", self.ai_api_url, self.store,
+                                       max_chars=self.ai_chunk_chars)
+            self.ai_thread = ChunkedAIWorker(polisher, content)
+            self.ai_thread.progress.connect(self.on_ai_chunk_progress)
+            self.label_ai_status.setText("正在切分并发送分段...")
+        else:
+            self.ai_thread = AIWorker(key, self.cb_ai_model.currentText(), content, "润色", self.ai_api_url)
+            self.ai_thread.chunk.connect(self.on_ai_chunk)
         self.ai_thread.finished.connect(self.on_ai_finished)
         self.ai_thread.start()
 
+    def on_ai_chunk(self, kind, text):
+        if self.sender() is not self.ai_thread: return # 已取消的旧请求
+        if self.ai_first_token is None:
+            self.ai_first_token = time.monotonic() - self.ai_started
+            self.write_log(f"AI 首段响应用时 {self.ai_first_token:.1f} 秒", "purple")
+        if kind == "reasoning":
+            self.ai_reasoning_chars += len(text)
+            self.label_ai_status.setText(f"AI 正在思考... (已思考 {self.ai_reasoning_chars} 字)")
+            return
+        self.label_ai_status.setText("AI 正在输出...")
+        cursor = self.ai_result_view.textCursor(); cursor.movePosition(cursor.MoveOperation.End)
+        cursor.insertText(text)
+
+    def on_ai_chunk_progress(self, done, total, cached):
+        if self.sender() is not self.ai_thread: return
+        self.label_ai_status.setText(f"分段润色中 {done}/{total} (缓存命中 {cached} 段)")
+
+    def cancel_ai(self):
+        if self.ai_thread and self.ai_thread.isRunning():
+            self.ai_thread.cancel()
+            self.write_log("点击：停止 AI 生成", "orange")
+            # 线程可能还在等待下一段数据，保留引用直到它真正退出，避免 QThread 被提前销毁
+            self.ai_retired = [t for t in self.ai_retired if not t.isFinished()] + [self.ai_thread]
+        self.btn_ai_fix.setEnabled(True); self.btn_ai_fix.setText("✨ AI 智能润色正文")
+        self.btn_ai_cancel.setEnabled(False); self.btn_ai_apply.setEnabled(bool(self.ai_result_view.toPlainText()))
+        self.label_ai_status.setText("已停止生成 (可采纳已生成的部分)")
+        self.ai_thread = None
+
+    def apply_ai_result(self):
+        result = self.ai_result_view.toPlainText()
+        if not result: return
+        self.edit_body.setPlainText(result)
+        self.close_ai_panel()
+        self.write_log("✅ 已采纳 AI 结果，编辑器内容已更新", "green")
+
+    def close_ai_panel(self):
+        if self.ai_thread and self.ai_thread.isRunning(): self.cancel_ai()
+        self.ai_panel.hide()
+
     def on_ai_finished(self, status, result):
+        if self.sender() is not self.ai_thread: return # 已取消的旧请求，结果丢弃
         self.btn_ai_fix.setEnabled(True)
         self.btn_ai_fix.setText("✨ AI 智能润色正文")
+        self.btn_ai_cancel.setEnabled(False)
         if status == "success":
-            self.edit_body.setPlainText(result)
-            self.write_log("✅ AI 润色完成，编辑器内容已更新", "green")
+            if result != self.ai_result_view.toPlainText(): self.ai_result_view.setPlainText(result) # 非流式返回
+            self.btn_ai_apply.setEnabled(True)
+            self.label_ai_status.setText(f"生成完成，用时 {time.monotonic() - self.ai_started:.1f} 秒")
+            stats = getattr(self.ai_thread, 'stats', None)
+            if stats:
+                self.write_log(f"分段润色：共 {stats['total']} 段，发送 {stats['sent']}，缓存命中 {stats['cached']}，"
+                               f"代码段跳过 {stats['skipped']}，失败 {stats['failed']} (失败段落保留原文)", "orange" if stats['failed'] else "purple")
+            self.write_log("✅ AI 润色完成，请在右侧核对后点击“采纳结果”", "green")
         else:
+            self.label_ai_status.setText("生成失败")
             self.write_log(f"❌ AI 润色失败: {result}", "red")
 
     def execute_full_backup(self):
+        # 备份进行中再次点击即为取消
+        if self.backup_thread and self.backup_thread.isRunning():
+            self.backup_thread.engine.cancel()
+            self.btn_backup.setEnabled(False); self.btn_backup.setText("正在取消...")
+            self.write_log("点击：取消全站备份，等待进行中的请求结束", "orange")
+            return
         if not self.rpc_client:
             self.write_log("无法备份：请先同步服务器信息", "red")
             return
-        self.write_log("开始全站备份任务...", "blue")
+        workers = self.spin_backup_workers.value()
+        mode = ("增量" if self.chk_incremental.isChecked() else "完整") + ("归档" if self.chk_archive.isChecked() else "")
+        self.write_log(f"开始全站{mode}备份任务 (并发 {workers})...", "blue")
+        make = self.core.archive_backup if self.chk_archive.isChecked() else self.core.backup_engine
+        engine = make(workers, self.chk_incremental.isChecked(), self.spin_batch_size.value())
+        self.backup_thread = BackupWorker(engine)
+        self.backup_thread.progress.connect(self.on_backup_progress)
+        self.backup_thread.finished.connect(self.on_backup_finished)
+        self.btn_backup.setText("正在列举文章... (点击取消)")
+        self.backup_thread.start()
+
+    def on_backup_progress(self, done, total, rate):
+        self.btn_backup.setText(f"备份中 {done}/{total} ({rate:.1f} 项/秒) 点击取消")
+
+    def on_backup_finished(self, status, result):
+        self.btn_backup.setEnabled(True); self.btn_backup.setText("一键全站本地备份")
+        if status != "success":
+            self.write_log(f"备份失败: {result}", "red")
+            return
+        for pid, title, err in result['failed'][:20]:
+            self.write_log(f"⚠️ 文章 {pid}《{title}》备份失败: {err}", "orange")
+        head = "⏹ 备份已取消" if result['cancelled'] else "✅ 备份成功"
+        self.write_log(f"{head}！已导出 {result['saved']}/{result['total']} 篇文章 (新拉取 {result['fetched']}，未变化 {result['reused']})，"
+                       f"失败 {len(result['failed'])} 篇，耗时 {result['elapsed']:.1f} 秒", "orange" if result['cancelled'] or result['failed'] else "green")
+        if 'media' in result: # 单文件归档
+            for url, err in result['media_failed'][:20]: self.write_log(f"⚠️ 附件下载失败 {url}: {err}", "orange")
+            self.write_log(f"附件 {result['media']} 个 (新下载 {result['media_downloaded']}，沿用旧归档 {result['media_reused']}，"
+                           f"失败 {len(result['media_failed'])}) -> {os.path.basename(result['path'])}", "orange" if result['media_failed'] else "green")
+        try: os.startfile(os.path.dirname(result['path']) if os.path.isfile(result['path']) else result['path'])
+        except Exception: pass
+
+    def execute_restore(self):
+        # 恢复进行中再次点击即为取消
+        if self.restore_thread and self.restore_thread.isRunning():
+            self.restore_thread.restore.cancel()
+            self.btn_restore.setEnabled(False); self.btn_restore.setText("正在取消...")
+            self.write_log("点击：取消归档恢复，等待进行中的请求结束", "orange")
+            return
+        if not self.rpc_client:
+            self.write_log("无法恢复：请先同步服务器信息", "red"); return
+        path, _ = QFileDialog.getOpenFileName(self, "选择备份归档", self.dir_backups, "备份归档 (archive_*.zip)")
+        if not path: return
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            save_path = os.path.join(self.dir_backups, f"backup_{timestamp}")
-            os.makedirs(save_path, exist_ok=True)
-            posts = self.rpc_client.metaWeblog.getRecentPosts(1, self.in_user.text(), self.in_pass.text(), 1000)
-            count = 0
-            for p in posts:
-                pid = p['postid']; title = p['title']
-                safe_title = "".join([i for i in title if i.isalnum() or i in (' ', '_')]).rstrip()
-                if not safe_title: safe_title = f"post_{pid}"
-                full_post = self.rpc_client.metaWeblog.getPost(pid, self.in_user.text(), self.in_pass.text())
-                content = self.clean_html(full_post['description'])
-                meta = f"---\ntitle: {title}\nid: {pid}\ncategories: {full_post.get('categories', [])}\ntags: {full_post.get('mt_keywords', '')}\n---\n\n"
-                with open(os.path.join(save_path, f"{safe_title}.md"), "w", encoding="utf-8") as f:
-                    f.write(meta + content)
-                count += 1
-            self.write_log(f"✅ 备份成功！已导出 {count} 篇文章", "green")
-            os.startfile(save_path)
-        except Exception as e: self.write_log(f"备份失败: {e}", "red")
+            with self.core.open_archive(path) as archive: count, media, created = len(archive.posts), len(archive.media), archive.index['created']
+        except Exception as e:
+            self.write_log(f"无法读取归档: {e}", "red"); return
+        modes = ["全部新建文章 (迁移到新博客)", "按原文章 ID 更新 (回滚本博客)"]
+        mode, ok = QInputDialog.getItem(self, "从归档恢复", f"归档创建于 {created}，共 {count} 篇文章、{media} 个附件。\n"
+                                        f"恢复到 {self.core.host} 的方式：", modes, 0, False)
+        if not ok: return
+        restore = self.core.archive_restore(path, keep_ids=mode == modes[1])
+        self.write_log(f"开始从 {os.path.basename(path)} 恢复 ({mode})...", "blue")
+        self.restore_thread = RestoreWorker(restore)
+        self.restore_thread.progress.connect(lambda stage, d, t: self.btn_restore.setText(
+            f"{'上传附件' if stage == 'media' else '发布文章'} {d}/{t} 点击取消"))
+        self.restore_thread.item_done.connect(self.on_bulk_item_done)
+        self.restore_thread.finished.connect(self.on_restore_finished)
+        self.btn_restore.setText("正在解压附件... (点击取消)")
+        self.restore_thread.start()
+
+    def on_restore_finished(self, status, result):
+        self.restore_thread.wait(); self.restore_thread = None
+        self.btn_restore.setEnabled(True); self.btn_restore.setText("从归档恢复...")
+        if status != "success":
+            self.write_log(f"归档恢复失败: {result}", "red"); return
+        for url, err in result['media_failed'][:20]: self.write_log(f"⚠️ 附件上传失败 {url}: {err}", "orange")
+        pub = result['publish'] or {'published': 0, 'updated': 0, 'skipped': 0, 'failed': []}
+        failed = pub['failed'] or result['media_failed']
+        head = "⏹ 归档恢复已取消" if result['cancelled'] else "归档恢复结束"
+        self.write_log(f"{head}：文章 {result['posts']} 篇 (新发布 {pub['published']}，更新 {pub['updated']}，跳过 {pub['skipped']}，"
+                       f"失败 {len(pub['failed'])})，附件 {result['media']} 个 (上传 {result['media_uploaded']}，复用 {result['media_cached']}，"
+                       f"失败 {len(result['media_failed'])})，耗时 {result['elapsed']:.1f} 秒", "orange" if result['cancelled'] or failed else "green")
+        if pub['published'] or pub['updated']: self.refresh_remote_list()
+
+    def execute_bulk_publish(self):
+        # 发布进行中再次点击即为取消
+        if self.bulk_thread and self.bulk_thread.isRunning():
+            self.bulk_thread.publisher.cancel()
+            self.btn_bulk_publish.setEnabled(False); self.btn_bulk_publish.setText("正在取消...")
+            self.write_log("点击：取消批量发布，等待进行中的请求结束", "orange")
+            return
+        if not self.rpc_client:
+            self.write_log("无法发布：请先同步服务器信息", "red")
+            return
+        publisher = self.core.bulk_publisher(self.dir_drafts)
+        if not publisher.paths:
+            self.write_log("草稿箱中没有 Markdown 文件", "orange"); return
+        if QMessageBox.question(self, "批量发布", f"将把草稿箱中的 {len(publisher.paths)} 个文件发布到 {self.core.host}（已发布且未修改的会跳过），继续吗？") \
+                != QMessageBox.StandardButton.Yes:
+            return
+        self.write_log(f"开始批量发布草稿箱 ({len(publisher.paths)} 个文件，并发 {publisher.workers})...", "blue")
+        self.bulk_thread = BulkPublishWorker(publisher)
+        self.bulk_thread.progress.connect(lambda d, t, r: self.btn_bulk_publish.setText(f"发布中 {d}/{t} ({r:.1f} 篇/秒) 点击取消"))
+        self.bulk_thread.item_done.connect(self.on_bulk_item_done)
+        self.bulk_thread.finished.connect(self.on_bulk_publish_finished)
+        self.btn_bulk_publish.setText("正在渲染... (点击取消)")
+        self.bulk_thread.start()
+
+    def on_bulk_item_done(self, path, status, detail):
+        name = os.path.basename(path)
+        if status == 'failed': self.write_log(f"❌ {name} 发布失败: {detail}", "red")
+        elif status == 'skipped': self.write_log(f"{name} 未修改，跳过 (文章 {detail})", "gray", level="DEBUG")
+        else: self.write_log(f"✅ {name} {'已发布为' if status == 'published' else '已更新'}文章 {detail}", "green")
+
+    def on_bulk_publish_finished(self, status, result):
+        self.bulk_thread.wait(); self.bulk_thread = None
+        self.btn_bulk_publish.setEnabled(True); self.btn_bulk_publish.setText("批量发布草稿箱")
+        if status != "success":
+            self.write_log(f"批量发布失败: {result}", "red"); return
+        head = "⏹ 批量发布已取消" if result['cancelled'] else "批量发布结束"
+        self.write_log(f"{head}：新发布 {result['published']}，更新 {result['updated']}，跳过 {result['skipped']}，"
+                       f"失败 {len(result['failed'])}，耗时 {result['elapsed']:.1f} 秒", "orange" if result['cancelled'] or result['failed'] else "green")
+        if result['published'] or result['updated']: self.refresh_remote_list()
+
+    def execute_two_way_sync(self):
+        if self.two_way_thread: return
+        if not self.rpc_client:
+            self.write_log("无法同步：请先同步服务器信息", "red"); return
+        self.write_log("开始双向同步草稿箱...", "blue")
+        self.two_way_thread = TwoWaySyncWorker(self.core.sync_engine())
+        self.two_way_thread.item_done.connect(self.on_two_way_item)
+        self.two_way_thread.finished.connect(self.on_two_way_finished)
+        self.btn_two_way.setEnabled(False); self.btn_two_way.setText("同步中...")
+        self.two_way_thread.start()
+
+    def on_two_way_item(self, kind, target, note):
+        names = {'push': ("⬆ 推送", "green"), 'push_new': ("⬆ 新建", "green"), 'pull': ("⬇ 拉取", "green"), 'pull_new': ("⬇ 拉取新文章", "green"),
+                 'conflict': ("⚠️ 冲突", "orange"), 'local_deleted': ("本地已删除", "gray"), 'remote_deleted': ("⚠️ 远程已删除", "orange"),
+                 'error': ("❌ 失败", "red")}
+        label, color = names[kind]
+        self.write_log(f"{label}: {os.path.basename(target)} {note}".rstrip(), color)
+
+    def on_two_way_finished(self, status, result):
+        self.two_way_thread.wait(); self.two_way_thread = None
+        self.btn_two_way.setEnabled(True); self.btn_two_way.setText("双向同步草稿箱")
+        if status != "success":
+            self.write_log(f"双向同步失败: {result}", "red"); return
+        if result['offline']:
+            self.write_log("无法连接服务器：本地修改已记录，恢复连接后再同步即可", "orange"); return
+        for kind, err in result['replay_failed']: self.write_log(f"❌ 离线队列中的{kind}操作被服务端拒绝: {err}", "red")
+        self.write_log(f"双向同步完成：推送 {result['push']}，新建 {result['push_new']}，拉取 {result['pull']}，冲突 {len(result['conflicts'])}，"
+                       f"离线队列重放 {result['replayed']}", "orange" if result['conflicts'] or result['errors'] else "green")
+        if result['conflicts']:
+            self.write_log("冲突文件请在命令行用 typecho.py resolve <文件> --keep local|remote 选择保留哪一边", "gray", level="INFO")
+
+    def queue_offline(self, kind, **args):
+        try:
+            self.core.queue_op(kind, **args)
+            self.write_log("网络不可用，操作已加入离线队列，恢复连接后自动重发", "orange")
+        except Exception as e: self.write_log(f"加入离线队列失败: {e}", "red")
+
+    def replay_offline_queue(self):
+        if self.replay_thread or self.two_way_thread or not self.rpc_client or not self.core.pending_ops(): return
+        self.replay_thread = QueueReplayWorker(self.core)
+        self.replay_thread.finished.connect(self.on_queue_replayed)
+        self.replay_thread.start()
+
+    def on_queue_replayed(self, status, result):
+        self.replay_thread.wait(); self.replay_thread = None
+        if status != "success": return # 仍然离线，下次定时再试
+        done, failed, remaining = result
+        for kind, err in failed: self.write_log(f"❌ 离线队列中的{kind}操作被服务端拒绝: {err}", "red")
+        if done: self.write_log(f"✅ 已重发离线期间的 {done} 个操作" + (f"，还剩 {remaining} 个" if remaining else ""), "green")
 
     def setup_local_tab(self):
         layout = QVBoxLayout(self.tab_local)
-        self.local_search = QLineEdit(); self.local_search.setPlaceholderText("搜索本地文章..."); self.local_search.textChanged.connect(self.filter_local)
+        self.local_search = QLineEdit(); self.local_search.setPlaceholderText("搜索本地文章 (标题/正文)..."); self.local_search.textChanged.connect(self.filter_local)
+        self.local_search_timer = QTimer(self); self.local_search_timer.setSingleShot(True); self.local_search_timer.setInterval(250)
+        self.local_search_timer.timeout.connect(self.run_local_search)
         layout.addWidget(self.local_search)
-        self.local_tree = QTreeWidget(); self.local_tree.setColumnCount(3); self.local_tree.setHeaderLabels(["类型", "文件名", "最后修改时间"])
+        self.local_model = LocalFileModel(self); self.local_search_model = LocalFileModel(self)
+        self.local_tree = QTreeView(); self.local_tree.setModel(self.local_model)
+        self.local_tree.setRootIsDecorated(False); self.local_tree.setUniformRowHeights(True)
         self.local_tree.header().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        self.local_tree.setColumnWidth(0, 50); self.local_tree.setColumnWidth(2, 200)
         self.local_tree.doubleClicked.connect(self.load_local_file)
+        self.local_indexer = LocalIndexer(self.store, [(self.dir_drafts, "草稿"), (self.dir_sent, "发布")], self)
+        self.local_indexer.updated.connect(self.on_local_index_updated)
+        self.local_indexer.failed.connect(lambda e: self.write_log(f"本地索引更新失败: {e}", "red"))
+        self.local_model.set_rows(self.store.list_local()) # 先展示上次的索引，再由后台扫描补齐差异
+        self.local_indexer.rescan()
         layout.addWidget(self.local_tree)
         side = QHBoxLayout()
         b_rf = QPushButton("刷新列表"); b_rf.clicked.connect(self.refresh_local_list)
         b_od = QPushButton("稿箱目录"); b_od.clicked.connect(lambda: (self.write_log("点击：打开草稿箱目录"), os.startfile(self.dir_drafts)))
         b_ob = QPushButton("查看备份"); b_ob.clicked.connect(lambda: (self.write_log("点击：打开备份目录"), os.startfile(self.dir_backups)))
-        side.addWidget(b_rf); side.addWidget(b_od); side.addWidget(b_ob); side.addStretch()
+        self.btn_two_way = QPushButton("双向同步草稿箱"); self.btn_two_way.clicked.connect(self.execute_two_way_sync)
+        self.btn_two_way.setToolTip("推送本地修改、拉取远程修改；两边都改过的文件只标记冲突，不会覆盖")
+        self.btn_bulk_publish = QPushButton("批量发布草稿箱"); self.btn_bulk_publish.clicked.connect(self.execute_bulk_publish)
+        self.btn_bulk_publish.setToolTip("发布 content/drafts 中的全部 Markdown；已发布且未修改的文件自动跳过，修改过的更新原文章")
+        side.addWidget(b_rf); side.addWidget(b_od); side.addWidget(b_ob); side.addStretch(); side.addWidget(self.btn_two_way); side.addWidget(self.btn_bulk_publish)
         layout.addLayout(side)
 
     def setup_remote_tab(self):
         layout = QVBoxLayout(self.tab_remote)
-        self.remote_search = QLineEdit(); self.remote_search.setPlaceholderText("搜索远程文章..."); self.remote_search.textChanged.connect(self.filter_remote)
+        self.remote_search = QLineEdit(); self.remote_search.setPlaceholderText("搜索远程文章 (标题/标签/分类/正文，离线可用)..."); self.remote_search.textChanged.connect(self.filter_remote)
+        self.remote_search_timer = QTimer(self); self.remote_search_timer.setSingleShot(True); self.remote_search_timer.setInterval(250)
+        self.remote_search_timer.timeout.connect(self.run_remote_search)
         layout.addWidget(self.remote_search)
-        self.remote_tree = QTreeWidget(); self.remote_tree.setColumnCount(4)
-        self.remote_tree.setHeaderLabels(["ID", "文章标题", "分类", "作者"])
+        self.remote_model = RemotePostModel(store=self.store, parent=self)
+        self.remote_search_model = RemotePostModel(parent=self)
+        self.remote_model.page_loaded.connect(self.on_remote_page_loaded)
+        self.remote_model.load_failed.connect(lambda e: self.write_log(f"拉取失败: {e}", "red"))
+        # QTreeView 只绘制可见行，配合统一行高即使上万篇文章也能流畅滚动
+        self.remote_tree = QTreeView(); self.remote_tree.setModel(self.remote_model)
+        self.remote_tree.setRootIsDecorated(False); self.remote_tree.setUniformRowHeights(True)
+        self.remote_tree.verticalScrollBar().valueChanged.connect(self.on_remote_scrolled)
         self.remote_tree.setColumnWidth(0, 50); self.remote_tree.setColumnWidth(2, 100); self.remote_tree.setColumnWidth(3, 80)
         self.remote_tree.header().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
         self.remote_tree.doubleClicked.connect(self.fetch_remote_post)
@@ -261,75 +1133,214 @@ class TypechoContentStudio(QWidget):
 
     def setup_comment_tab(self):
         layout = QVBoxLayout(self.tab_comment)
-        self.comment_tree = QTreeWidget(); self.comment_tree.setColumnCount(5)
-        self.comment_tree.setHeaderLabels(["ID", "关联文章", "评论者", "评论内容", "状态"])
-        self.comment_tree.setColumnWidth(0, 50); self.comment_tree.setColumnWidth(1, 150); self.comment_tree.setColumnWidth(2, 100); self.comment_tree.setColumnWidth(4, 80)
+        bar = QHBoxLayout()
+        self.cb_comment_status = QComboBox()
+        for label, status in (("全部状态", None), ("待审核", 'hold'), ("已通过", 'approve'), ("垃圾", 'spam')):
+            self.cb_comment_status.addItem(label, status)
+        self.cb_comment_status.currentIndexChanged.connect(self.show_cached_comments)
+        self.in_comment_post = QLineEdit(); self.in_comment_post.setPlaceholderText("文章 ID (留空为全部)"); self.in_comment_post.setFixedWidth(140)
+        self.in_comment_post.editingFinished.connect(self.show_cached_comments)
+        b_sync = QPushButton("同步新评论"); b_sync.clicked.connect(self.refresh_comments)
+        b_full = QPushButton("全量重新同步"); b_full.clicked.connect(lambda: self.refresh_comments(full=True))
+        b_full.setToolTip("重新分页拉取当前筛选范围内的全部评论，用于同步网页后台中的改动")
+        self.lbl_comment_count = QLabel("")
+        bar.addWidget(self.cb_comment_status); bar.addWidget(self.in_comment_post); bar.addWidget(b_sync); bar.addWidget(b_full)
+        bar.addStretch(); bar.addWidget(self.lbl_comment_count)
+        layout.addLayout(bar)
+        self.comment_model = CommentModel(self)
+        self.comment_tree = QTreeView(); self.comment_tree.setModel(self.comment_model)
+        self.comment_tree.setRootIsDecorated(False); self.comment_tree.setUniformRowHeights(True)
+        self.comment_tree.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection) # Ctrl/Shift 多选后批量审核
+        self.comment_tree.setColumnWidth(0, 60); self.comment_tree.setColumnWidth(1, 150); self.comment_tree.setColumnWidth(2, 100); self.comment_tree.setColumnWidth(4, 80)
         self.comment_tree.header().setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch)
         self.comment_tree.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
         self.comment_tree.customContextMenuRequested.connect(self.show_comment_context_menu)
         layout.addWidget(self.comment_tree)
-        b_sync = QPushButton("同步全部状态评论"); b_sync.clicked.connect(self.refresh_comments)
-        layout.addWidget(b_sync)
-
-    def write_log(self, text, color="black"):
-        if not hasattr(self, 'console_output'): return
-        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        item = QTreeWidgetItem(self.console_output)
-        item.setText(0, now.split(' ')[1])
-        item.setText(1, text)
-        item.setForeground(1, QColor(color))
-        self.console_output.scrollToBottom()
+        actions = QHBoxLayout()
+        for label, action in (("批量通过", 'approve'), ("标为垃圾", 'spam'), ("彻底删除", 'delete')):
+            b = QPushButton(label); b.clicked.connect(lambda _, a=action: self.moderate_selected_comments(a)); actions.addWidget(b)
+        layout.addLayout(actions)
+        self.comment_sync_worker = self.comment_mod_worker = None
+        self.show_cached_comments()
+
+    def setup_metrics_tab(self):
+        layout = QVBoxLayout(self.tab_metrics)
+        bar = QHBoxLayout()
+        self.chk_metrics = QCheckBox("启用统计"); self.chk_metrics.setToolTip("记录每次 XMLRPC 调用、AI 请求、渲染与写盘的耗时和字节数，开销可忽略")
+        self.chk_metrics.toggled.connect(self.toggle_metrics)
+        b_reset = QPushButton("清零"); b_reset.clicked.connect(self.reset_metrics)
+        b_json = QPushButton("导出 JSON"); b_json.clicked.connect(lambda: self.export_metrics('json'))
+        b_prom = QPushButton("导出 Prometheus"); b_prom.clicked.connect(lambda: self.export_metrics('prom'))
+        self.lbl_metrics_since = QLabel("")
+        bar.addWidget(self.chk_metrics); bar.addWidget(b_reset); bar.addWidget(b_json); bar.addWidget(b_prom)
+        bar.addStretch(); bar.addWidget(self.lbl_metrics_since)
+        layout.addLayout(bar)
+        self.metrics_model = MetricsModel(self)
+        self.metrics_view = QTreeView(); self.metrics_view.setModel(self.metrics_model)
+        self.metrics_view.setRootIsDecorated(False); self.metrics_view.setUniformRowHeights(True)
+        self.metrics_view.setColumnWidth(0, 70); self.metrics_view.setColumnWidth(1, 220)
+        self.metrics_view.selectionModel().currentRowChanged.connect(lambda *_: self.show_metrics_histogram())
+        layout.addWidget(self.metrics_view, 3)
+        self.metrics_histogram = QTextBrowser(); self.metrics_histogram.setStyleSheet("font-family: monospace;")
+        layout.addWidget(self.metrics_histogram, 2)
+        # 只在本页可见时定时刷新；数据一直在后台累计
+        self.metrics_timer = QTimer(self); self.metrics_timer.setInterval(2000)
+        self.metrics_timer.timeout.connect(self.refresh_metrics)
+        self.tabs.currentChanged.connect(lambda _: self.metrics_timer.start() if self.tabs.currentWidget() is self.tab_metrics else self.metrics_timer.stop())
+        self.tabs.currentChanged.connect(lambda _: self.tabs.currentWidget() is self.tab_metrics and self.refresh_metrics())
+
+    def refresh_metrics(self):
+        self.metrics_model.set_snapshot(METRICS.snapshot())
+        self.lbl_metrics_since.setText(f"统计自 {METRICS.started:%m-%d %H:%M:%S}" + ("" if METRICS.enabled else "（已暂停）"))
+        self.show_metrics_histogram()
+
+    def show_metrics_histogram(self):
+        """选中行的耗时分布：每个桶一行文字条形图"""
+        row = self.metrics_view.currentIndex().row()
+        if not 0 <= row < len(self.metrics_model.rows):
+            self.metrics_histogram.setPlainText("选中一行查看耗时分布"); return
+        kind, name, d = self.metrics_model.rows[row]
+        peak = max(d['buckets'].values()) or 1
+        lines, lower = [f"{KIND_NAMES.get(kind, kind)} {name}：共 {d['count']} 次，失败 {d['errors']} 次", ""], 0
+        for le, n in d['buckets'].items():
+            label = f"> {lower * 1000:g} ms" if le == '+Inf' else f"≤ {float(le) * 1000:g} ms"
+            if n: lines.append(f"{label:>12}  {'█' * max(1, round(40 * n / peak)):<40} {n}")
+            lower = float(le) if le != '+Inf' else lower
+        self.metrics_histogram.setPlainText('\n'.join(lines))
+
+    def toggle_metrics(self, on):
+        METRICS.enabled = on
+        if on != self.core.config['metrics_enabled']: self.core.save_config({'metrics_enabled': on})
+        self.refresh_metrics()
+
+    def reset_metrics(self):
+        METRICS.reset(); self.refresh_metrics()
+        self.write_log("性能统计已清零")
+
+    def export_metrics(self, fmt):
+        default = os.path.join(self.core.base_dir, f"metrics_{datetime.now():%Y%m%d_%H%M%S}.{fmt}")
+        path, _ = QFileDialog.getSaveFileName(self, "导出性能统计", default, "JSON (*.json)" if fmt == 'json' else "Prometheus 文本 (*.prom *.txt)")
+        if not path: return
         try:
-            with open(self.log_file_path, "a", encoding="utf-8") as f:
-                f.write(f"[{now}] {text}\n")
-        except: pass
+            METRICS.dump(path); self.write_log(f"性能统计已导出: {path}", "green")
+        except OSError as e: self.write_log(f"导出性能统计失败: {e}", "red")
+
+    def write_log(self, text, color="black", level=None):
+        """可在任意线程调用；未指定级别时按颜色推断（红色为 ERROR，橙色为 WARNING 等）"""
+        self.logger.log(level or COLOR_LEVELS.get(color, 'INFO'), text, color if color != "black" else None)
+
+    def set_log_level(self, level):
+        self.log_model.min_level = LOG_LEVELS[level] # 只影响之后进入面板的记录，文件仍完整记录
 
     def clear_ui_logs(self):
-        self.console_output.clear()
-        self.write_log("点击：清空面板日志 (本地文本已保留)", "gray")
+        self.log_model.clear()
+        self.write_log("点击：清空面板日志 (本地文本已保留)", level='INFO')
+
+    def closeEvent(self, event):
+        self.auto_save_draft(); self.draft_pool.shutdown(wait=True) # 退出前保存未落盘的修改
+        self.local_indexer.shutdown()
+        if self.bulk_thread and self.bulk_thread.isRunning(): # 发布日志已落盘，下次从断点继续
+            self.bulk_thread.publisher.cancel(); self.bulk_thread.wait()
+        if self.restore_thread and self.restore_thread.isRunning():
+            self.restore_thread.restore.cancel(); self.restore_thread.wait()
+        for t in (self.two_way_thread, self.replay_thread):
+            if t: t.wait()
+        self.logger.close() # 把缓冲中的日志写完
+        super().closeEvent(event)
 
     def show_comment_context_menu(self, pos):
-        item = self.comment_tree.itemAt(pos)
-        if not item: return
-        menu = QMenu(); cid = item.text(0)
-        act_del = QAction("彻底删除评论", self); act_del.triggered.connect(lambda: self.handle_comment_action(cid, "delete"))
-        menu.addAction(act_del); menu.exec(self.comment_tree.viewport().mapToGlobal(pos))
-
-    def handle_comment_action(self, cid, action):
-        if not self.rpc_client: return
-        self.write_log(f"操作：评论 {cid} {action}", "blue")
-        try:
-            user, pwd = self.in_user.text(), self.in_pass.text()
-            if action == "delete": self.rpc_client.wp.deleteComment(1, user, pwd, cid)
-            QTimer.singleShot(500, self.refresh_comments)
-        except Exception as e: self.write_log(f"操作失败: {e}", "red")
-
-    def refresh_comments(self):
-        if not self.rpc_client: return
-        self.write_log("同步评论...", "blue")
-        try:
-            comments = self.rpc_client.wp.getComments(1, self.in_user.text(), self.in_pass.text(), {})
-            self.comment_tree.clear()
-            for c in comments:
-                item = QTreeWidgetItem(self.comment_tree)
-                item.setText(0, str(c['comment_id'])); item.setText(1, c.get('post_title', '')); item.setText(2, c.get('author', ''))
-                item.setText(3, c.get('content', '').replace('\n', ' ')); st = c.get('status', 'approved')
-                item.setText(4, "[待审核]" if st == 'hold' else ("[垃圾]" if st == 'spam' else "已通过"))
-                item.setForeground(4, QColor("orange" if st == 'hold' else ("red" if st == 'spam' else "green")))
-        except Exception as e: self.write_log(f"失败: {e}", "red")
+        if not self.comment_tree.indexAt(pos).isValid(): return
+        menu = QMenu()
+        for label, action in (("通过", 'approve'), ("标为垃圾", 'spam'), ("彻底删除", 'delete')):
+            act = QAction(f"{label}选中的评论", self); act.triggered.connect(lambda _, a=action: self.moderate_selected_comments(a))
+            menu.addAction(act)
+        menu.exec(self.comment_tree.viewport().mapToGlobal(pos))
+
+    def comment_filter(self):
+        return self.cb_comment_status.currentData(), self.in_comment_post.text().strip() or None
+
+    def show_cached_comments(self):
+        """筛选条件变化时先从本地缓存展示，离线也能浏览"""
+        status, post_id = self.comment_filter()
+        if post_id and not post_id.isdigit():
+            self.write_log("文章 ID 必须是数字", "orange"); return
+        self.comment_model.set_rows(self.store.list_comments(status, post_id), status)
+        self.lbl_comment_count.setText(f"共 {self.comment_model.rowCount()} 条")
+
+    def refresh_comments(self, full=False):
+        if not self.rpc_client or self.comment_sync_worker is not None: return
+        status, post_id = self.comment_filter()
+        if post_id and not post_id.isdigit():
+            self.write_log("文章 ID 必须是数字", "orange"); return
+        self.write_log("全量同步评论..." if full else "同步新评论...", "blue")
+        c = self.rpc_client
+        self.comment_sync_worker = CommentSyncWorker(c.endpoint, c.user, c.pwd, self.store, status, post_id, full, c.gzip_requests)
+        self.comment_sync_worker.progress.connect(lambda n: self.lbl_comment_count.setText(f"已拉取 {n} 条..."))
+        self.comment_sync_worker.finished.connect(self.on_comments_synced)
+        self.comment_sync_worker.start()
+
+    def on_comments_synced(self, status, payload):
+        self.comment_sync_worker.wait(); self.comment_sync_worker = None
+        if status != "success":
+            self.write_log(f"评论同步失败: {payload}", "red"); self.show_cached_comments(); return
+        fetched, fresh = payload
+        self.write_log(f"评论同步完成：拉取 {fetched} 条，其中新评论 {fresh} 条", "green")
+        self.show_cached_comments()
+
+    def moderate_selected_comments(self, action):
+        ids = [i.data(Qt.ItemDataRole.UserRole) for i in self.comment_tree.selectionModel().selectedRows()]
+        if not ids or not self.rpc_client: return
+        if self.comment_mod_worker is not None:
+            self.write_log("上一批审核操作仍在进行", "orange"); return
+        self.write_log(f"批量操作：{len(ids)} 条评论 {action}", "blue")
+        c = self.rpc_client
+        self.comment_mod_worker = CommentModerationWorker(c.endpoint, c.user, c.pwd, ids, action, self.spin_batch_size.value(), c.gzip_requests)
+        self.comment_mod_worker.finished.connect(self.on_comments_moderated)
+        self.comment_mod_worker.start()
+
+    def on_comments_moderated(self, action, done, failed):
+        ids = self.comment_mod_worker.ids
+        self.comment_mod_worker.wait(); self.comment_mod_worker = None
+        if isinstance(failed, Exception):
+            if is_transient(failed): self.queue_offline('moderate', ids=ids, action=action)
+            else: self.write_log(f"操作失败: {failed}", "red")
+            return
+        if action == 'delete':
+            self.store.delete_comments(done); self.comment_model.remove_ids(done)
+        else:
+            self.store.set_comment_status(done, action); self.comment_model.set_status(done, action)
+        self.lbl_comment_count.setText(f"共 {self.comment_model.rowCount()} 条")
+        self.write_log(f"已处理 {len(done)} 条评论", "green")
+        for cid, err in failed: self.write_log(f"评论 {cid} 操作失败: {err}", "red")
 
     def sync_server_data(self):
         host = self.in_host.text().strip()
         if not host: return
         self.write_log(f"点击：保存配置并同步 {host}", "blue")
+        user, pwd, endpoint = self.in_user.text(), self.in_pass.text(), rpc_endpoint(host)
+        gzip_requests = self.chk_gzip.isChecked()
+        if not self.rpc_client or (self.rpc_client.endpoint, self.rpc_client.user, self.rpc_client.pwd, self.rpc_client.gzip_requests) != (endpoint, user, pwd, gzip_requests):
+            if self.rpc_client: self.rpc_client.shutdown()
+            self.rpc_client = RpcExecutor(endpoint, user, pwd, gzip_requests=gzip_requests, parent=self)
+        self.core.connect(host, user, pwd, gzip_requests)
+        self.rpc_client.call('metaWeblog.getCategories', 1, user, pwd,
+                             on_success=lambda cats: self.on_server_synced(host, cats),
+                             on_error=lambda e: self.write_log(f"失败: {e}", "red"))
+
+    def on_server_synced(self, host, cats):
         try:
-            protocol = "https://" if not host.startswith('http') else ""
-            self.rpc_client = xmlrpc.client.ServerProxy(f"{protocol}{host}/action/xmlrpc", allow_none=True)
-            cats = self.rpc_client.metaWeblog.getCategories(1, self.in_user.text(), self.in_pass.text())
             self.cb_cat.clear(); self.cb_cat.addItems([c['description'] for c in cats])
-            with open(self.config_path, 'w', encoding='utf-8') as f: 
-                yaml.dump({'host': host, 'user': self.in_user.text(), 'pass': self.in_pass.text(), 'ai_key': self.in_ai_key.text()}, f)
+            self.core.save_config({'host': host, 'user': self.in_user.text(), 'pass': self.in_pass.text(), 'ai_key': self.in_ai_key.text(),
+                                   'backup_workers': self.spin_backup_workers.value(), 'backup_incremental': self.chk_incremental.isChecked(),
+                                   'backup_archive': self.chk_archive.isChecked(),
+                                   'upload_workers': self.spin_upload_workers.value(),
+                                   'image_optimize': self.chk_img_opt.isChecked(), 'image_max_width': self.spin_img_width.value(),
+                                   'image_quality': self.spin_img_quality.value(), 'image_webp': self.chk_img_webp.isChecked(),
+                                   'image_srcset': self.chk_img_srcset.isChecked(), 'ai_api_url': self.ai_api_url,
+                                   'ai_chunked': self.chk_ai_chunked.isChecked(), 'ai_chunk_chars': self.ai_chunk_chars,
+                                   'rpc_batch_size': self.spin_batch_size.value(), 'rpc_gzip': self.chk_gzip.isChecked()})
             self.write_log("同步成功，AI 秘钥已记录", "green")
+            self.replay_offline_queue() # 连接恢复，重放离线期间排队的操作
         except Exception as e: self.write_log(f"失败: {e}", "red")
 
     def refresh_remote_list(self):
@@ -338,31 +1349,18 @@ class TypechoContentStudio(QWidget):
             return
         
         self.write_log("正在从服务器获取最新文章列表...", "blue")
-        try:
-            # 获取最近的 50 篇文章
-            posts = self.rpc_client.metaWeblog.getRecentPosts(1, self.in_user.text(), self.in_pass.text(), 50)
-            self.remote_tree.clear()
-            
-            for p in posts:
-                item = QTreeWidgetItem(self.remote_tree)
-                # 填充四列数据
-                item.setText(0, str(p.get('postid', '')))
-                item.setText(1, p.get('title', '无标题'))
-                
-                # 处理分类 (通常返回的是列表)
-                cats = p.get('categories', [])
-                item.setText(2, cats[0] if cats else "未分类")
-                
-                # 处理作者：XMLRPC 扩展字段中通常包含 nickname 或 wp_author_display_name
-                author = p.get('nickname') or p.get('wp_author_display_name') or "未知"
-                item.setText(3, author)
-                
-                # 绑定隐藏数据，方便双击读取
-                item.setData(0, Qt.ItemDataRole.UserRole, p.get('postid'))
-            
-            self.write_log(f"成功拉取 {len(posts)} 篇文章", "green")
-        except Exception as e:
-            self.write_log(f"拉取失败: {e}", "red")
+        self.remote_model.set_source(self.rpc_client.endpoint, self.rpc_client.user, self.rpc_client.pwd, self.chk_gzip.isChecked())
+        if self.remote_model.rowCount(): self.remote_model.refresh()
+        else: self.remote_model.load_more()
+
+    def on_remote_page_loaded(self, offset, total):
+        if offset == 0: self.write_log(f"成功拉取文章列表 (已加载 {total} 篇，滚动到底部自动加载更多)", "green")
+        QTimer.singleShot(0, self.on_remote_scrolled) # 等视图完成布局后再判断是否需要下一页
+
+    def on_remote_scrolled(self, *_):
+        # 滚动到距底部不足一屏时预取下一页；内容不满一屏时也继续加载
+        bar = self.remote_tree.verticalScrollBar()
+        if bar.maximum() - bar.value() <= bar.pageStep(): self.remote_model.load_more()
 
     def execute_publish(self):
         """发布文章并记录详细日志"""
@@ -379,66 +1377,110 @@ class TypechoContentStudio(QWidget):
         self.write_log(f"正在发布文章: {title} ...", "blue")
         
         try:
-            # 转换 Markdown 为 HTML
-            html_content = markdown.markdown(content, extensions=['extra', 'codehilite', 'toc'])
-            
-            # 组织发布数据
-            payload = {
-                'title': title,
-                'description': html_content,
-                'categories': [self.cb_cat.currentText()],
-                'mt_keywords': self.edit_tags.text(),
-                'post_status': self.status_map.get(self.cb_status.currentText(), "publish")
-            }
-            
-            if self.current_post_id:
-                # 编辑现有文章
-                self.rpc_client.metaWeblog.editPost(self.current_post_id, self.in_user.text(), self.in_pass.text(), payload, True)
-                action_text = "更新"
-            else:
-                # 发布新文章
-                new_id = self.rpc_client.metaWeblog.newPost(1, self.in_user.text(), self.in_pass.text(), payload, True)
-                action_text = "发布"
-
-            # 核心新增：发布成功日志
-            self.write_log(f"🎉 成功！文章《{title}》已完成{action_text}并同步到服务器", "green")
-            
-            # 发布后自动将当前内容存入 sent 目录
-            sent_path = os.path.join(self.dir_sent, f"{title}.md")
-            with open(sent_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            # 重置编辑器或刷新列表
-            self.refresh_remote_list()
-            self.reset_editor() # 如果你想发布后清空编辑器，取消此行注释
-            
+            # 转换 Markdown 为 HTML 并组织发布数据
+            payload = self.core.post_payload(title, content, [self.cb_cat.currentText()], self.edit_tags.text(),
+                                             self.status_map.get(self.cb_status.currentText(), "publish"))
+        except Exception as e:
+            self.write_log(f"❌ 提交失败: {e}", "red"); return
+        post_id = self.current_post_id
+        done = lambda result: self.on_publish_done(post_id or result, title, content, payload, "更新" if post_id else "发布")
+        def failed(e):
+            self.btn_pub.setEnabled(True)
+            if not is_transient(e): self.write_log(f"❌ 提交失败: {e}", "red"); return
+            # 新建文章超时时请求可能已经到达服务器，重放前先按标题与正文查找
+            self.queue_offline('publish', title=title, content=content, categories=payload['categories'], tags=payload['mt_keywords'],
+                               status=payload['post_status'], post_id=post_id, unsure=not post_id)
+        self.btn_pub.setEnabled(False) # 请求返回前禁止重复提交
+        if post_id:
+            # 编辑现有文章
+            self.rpc_client.call('metaWeblog.editPost', post_id, self.in_user.text(), self.in_pass.text(), payload, True,
+                                 on_success=done, on_error=failed, timeout=60)
+        else:
+            # 发布新文章
+            self.rpc_client.call('metaWeblog.newPost', 1, self.in_user.text(), self.in_pass.text(), payload, True,
+                                 on_success=done, on_error=failed, timeout=60)
+
+    def on_publish_done(self, post_id, title, content, payload, action_text):
+        self.btn_pub.setEnabled(True)
+        # 核心新增：发布成功日志
+        self.write_log(f"🎉 成功！文章《{title}》已完成{action_text}并同步到服务器", "green")
+        try:
+            # 发布后更新本地索引，并自动将当前内容存入 sent 目录
+            self.core.record_published(post_id, title, content, payload)
         except Exception as e:
-            self.write_log(f"❌ 提交失败: {e}", "red")
+            self.write_log(f"❌ 保存发布记录失败: {e}", "red")
+        
+        # 重置编辑器或刷新列表
+        self.refresh_remote_list()
+        self.reset_editor() # 如果你想发布后清空编辑器，取消此行注释
 
-    def auto_save_draft(self):
-        """每分钟自动保存草稿，并记录日志"""
+    def mark_draft_dirty(self, *_): self.draft_dirty = True
+
+    def auto_save_draft(self, force=False):
+        """每分钟检查一次，仅在有未保存修改时保存草稿；文件写入与历史记录在后台线程完成。
+        之前保存失败的内容按原草稿 ID 重试，不会写进之后载入的草稿"""
+        for draft_id in list(self.draft_failed):
+            failed = self.draft_failed.pop(draft_id, None)
+            if not failed: continue
+            if draft_id == self.draft_id: self.draft_dirty = True # 仍在编辑同一篇，保存当前内容即可
+            else: self.draft_pool.submit(self._save_draft, draft_id, *failed)
+        if not (self.draft_dirty or force): return
         title = self.edit_title.text().strip() or "未命名"
         content = self.edit_body.toPlainText().strip()
         
         # 如果内容为空，不执行保存，也不写日志防止刷屏
         if not content:
             return
-            
+        self.draft_dirty = False
+        self.draft_pool.submit(self._save_draft, self.draft_id, title, content)
+
+    def _save_draft(self, draft_id, title, content):
+        """在 autosave 线程中运行"""
         try:
-            filename = f"{title}.md"
-            # 过滤文件名非法字符
-            safe_filename = "".join([i for i in filename if i.isalnum() or i in (' ', '.', '_', '-')]).strip()
-            save_path = os.path.join(self.dir_drafts, safe_filename)
-            
-            with open(save_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            
-            self.write_log(f"💾 自动保存成功: {safe_filename}", "#1a06f1") 
+            path, seq = self.drafts.save(draft_id, title, content)
+            self.draft_failed.pop(draft_id, None) # 之前失败的那次已被这次保存取代
+            if seq: self.write_log(f"💾 自动保存成功: {os.path.basename(path)} (版本 {seq})", "#1a06f1")
         except Exception as e:
+            self.draft_failed[draft_id] = (title, content) # 下次定时器触发时重试，不改动当前草稿的状态
             self.write_log(f"❌ 自动保存失败: {e}", "red")
 
-    def update_word_count(self): self.label_word_count.setText(f"字数: {len(self.edit_body.toPlainText())}")
+    def load_draft_state(self, draft_id=None):
+        """编辑器载入新内容后调用：切换到对应草稿，载入本身不算修改"""
+        self.draft_id, self.draft_dirty = draft_id or uuid.uuid4().hex, False
+
+    def show_draft_history(self):
+        versions = self.drafts.versions(self.draft_id)
+        if not versions:
+            self.write_log("当前草稿还没有历史版本 (保存一次后即可回溯)", "orange"); return
+        labels = [f"版本 {seq}  {datetime.fromtimestamp(ts):%Y-%m-%d %H:%M:%S}  {chars} 字符" for seq, ts, _, _, chars in versions]
+        label, ok = QInputDialog.getItem(self, "历史版本", f"共 {len(versions)} 个版本，选择要恢复的版本：", labels, 0, False)
+        if not ok: return
+        seq = versions[labels.index(label)][0]
+        try:
+            self.edit_body.setPlainText(self.drafts.restore(self.draft_id, seq)) # 恢复后视为新的修改，下次保存成为最新版本
+            self.write_log(f"已恢复到版本 {seq}", "green")
+        except Exception as e: self.write_log(f"恢复历史版本失败: {e}", "red")
+
+    def on_body_contents_change(self, position, removed, added):
+        """只重算本次改动涉及的段落；旧文档被替换的段落数 = 新段落数 - 总段落数变化量"""
+        doc = self.edit_body.document()
+        first = doc.findBlock(position)
+        last = doc.findBlock(position + added)
+        if not last.isValid(): last = doc.lastBlock()
+        new_count = last.blockNumber() - first.blockNumber() + 1
+        old_count = new_count - (doc.blockCount() - len(self.text_stats.blocks))
+        if old_count < 1 or first.blockNumber() + old_count > len(self.text_stats.blocks):
+            self.text_stats.reset(doc.toPlainText().split('\n')) # 统计与文档脱节时全量重建
+        else:
+            texts, block = [], first
+            for _ in range(new_count): texts.append(block.text()); block = block.next()
+            self.text_stats.replace(first.blockNumber(), old_count, texts)
+        self.word_count_timer.start() # 连续输入时合并刷新
+        if self.preview_view.isVisible(): self.preview_timer.start()
+
+    def update_word_count(self):
+        st = self.text_stats.summary()
+        self.label_word_count.setText(f"字数: {st['words']} | 字符: {st['chars']} | 段落: {st['paragraphs']} | 预计阅读 {max(1, round(st['minutes'])) if st['chars'] else 0} 分钟")
 
     def reset_editor(self):
         """清空编辑器，准备撰写新文章"""
@@ -447,44 +1489,73 @@ class TypechoContentStudio(QWidget):
         self.edit_tags.clear()
         self.current_post_id = None # 关键：必须清空 ID，否则会覆盖旧文
         self.cb_status.setCurrentIndex(0)
+        self.load_draft_state()
         self.write_log("🧹 编辑器已清空，当前处于“新建文章”模式", "#2a08ec")
 
-    def clean_html(self, raw_html):
-        c = re.sub(r'<img.*?src="(.*?)".*?/>', r'![](\1)', raw_html)
-        c = re.sub(r'</?(h\d|p|span|div|blockquote|ul|li|ol|pre|code|a).*?>', '', c)
-        return html_unescape(c).strip()
-
     def refresh_local_list(self):
-        self.local_tree.clear()
-        for folder, label in [(self.dir_drafts, "草稿"), (self.dir_sent, "发布")]:
-            if os.path.exists(folder):
-                for f in os.listdir(folder):
-                    if f.endswith('.md'):
-                        item = QTreeWidgetItem(self.local_tree); item.setText(0, label); item.setText(1, f)
-                        item.setData(0, Qt.ItemDataRole.UserRole, os.path.join(folder, f))
+        """目录变化由文件监视器自动同步；手动刷新只是补一次全量比对（例如监视失效的网络盘）"""
+        self.local_indexer.rescan()
+
+    def on_local_index_updated(self, changed, removed):
+        self.local_model.apply(changed, removed)
+        if self.local_search.text().strip(): self.run_local_search() # 搜索结果随之更新
+
+    # 搜索框输入先防抖，停止输入 250ms 后才查询本地 SQLite 全文索引
+    def filter_local(self, t): self.local_search_timer.start()
 
-    def filter_local(self, t):
-        for i in range(self.local_tree.topLevelItemCount()): self.local_tree.topLevelItem(i).setHidden(t.lower() not in self.local_tree.topLevelItem(i).text(1).lower())
+    def filter_remote(self, t): self.remote_search_timer.start()
 
-    def filter_remote(self, t):
-        for i in range(self.remote_tree.topLevelItemCount()): self.remote_tree.topLevelItem(i).setHidden(t.lower() not in self.remote_tree.topLevelItem(i).text(1).lower())
+    def run_local_search(self):
+        t = self.local_search.text().strip()
+        if not t:
+            self.local_tree.setModel(self.local_model); return
+        try: self.local_search_model.set_rows(self.store.search_local(t)) # 只查索引，不扫描磁盘
+        except sqlite3.Error as e:
+            self.write_log(f"本地搜索失败: {e}", "red"); return
+        self.local_tree.setModel(self.local_search_model)
+
+    def run_remote_search(self):
+        t = self.remote_search.text().strip()
+        if not t:
+            self.remote_tree.setModel(self.remote_model); return
+        try: self.remote_search_model.set_rows(self.store.search_remote(t))
+        except sqlite3.Error as e:
+            self.write_log(f"远程搜索失败: {e}", "red"); return
+        self.remote_tree.setModel(self.remote_search_model)
 
     def fetch_remote_post(self):
-        item = self.remote_tree.currentItem(); pid = item.data(0, Qt.ItemDataRole.UserRole)
+        pid = self.remote_tree.currentIndex().data(Qt.ItemDataRole.UserRole)
+        if not pid or not self.rpc_client: return
+        self.write_log(f"正在拉取文章 {pid} ...", "blue")
+        self.rpc_client.call('metaWeblog.getPost', pid, self.in_user.text(), self.in_pass.text(),
+                             on_success=lambda p: self.on_remote_post_fetched(pid, p),
+                             on_error=lambda e: self.write_log(f"拉取文章失败: {e}", "red"))
+
+    def on_remote_post_fetched(self, pid, p):
         try:
-            p = self.rpc_client.metaWeblog.getPost(pid, self.in_user.text(), self.in_pass.text())
-            self.edit_title.setText(p['title']); self.edit_body.setPlainText(self.clean_html(p['description']))
+            body = clean_html(p['description'])
+            self.edit_title.setText(p['title']); self.edit_body.setPlainText(body)
             self.current_post_id = pid; self.tabs.setCurrentIndex(0)
-        except: pass
+            self.load_draft_state(f"post-{pid}") # 远程文章的草稿与历史按文章 ID 关联
+            self.store.upsert_remote([dict(post_summary(p), postid=str(pid), tags=p.get('mt_keywords', ''), body=body)])
+        except Exception as e: self.write_log(f"加载文章失败: {e}", "red")
 
     def load_local_file(self):
-        item = self.local_tree.currentItem(); p = item.data(0, Qt.ItemDataRole.UserRole)
+        index = self.local_tree.currentIndex()
+        if not index.isValid(): return
+        p, _, title, _, _ = self.local_tree.model().rows[index.row()]
         try:
-            with open(p, 'r', encoding='utf-8') as f: self.edit_body.setPlainText(self.clean_html(f.read()))
-            self.edit_title.setText(item.text(1).replace('.md', '')); self.tabs.setCurrentIndex(0)
+            with open(p, 'r', encoding='utf-8') as f: self.edit_body.setPlainText(f.read()) # 本地都是 Markdown 文件，原样载入，不再剥标签
+            self.edit_title.setText(title); self.tabs.setCurrentIndex(0)
+            self.load_draft_state(self.store.draft_for_path(p))
         except: pass
 
     def process_media(self):
+        # 上传进行中再次点击即为取消
+        if self.upload_thread and self.upload_thread.isRunning():
+            self.upload_thread.queue.cancel()
+            self.write_log("点击：取消上传", "orange")
+            return
         if not self.rpc_client: 
             self.write_log("上传失败：请先连接服务器", "red")
             return
@@ -500,79 +1571,79 @@ class TypechoContentStudio(QWidget):
                      f"档案文件 ({doc_exts});;" \
                      f"所有文件 (*.*)"
                      
-        f, _ = QFileDialog.getOpenFileName(self, "选择上传文件", "", filter_str)
+        files, _ = QFileDialog.getOpenFileNames(self, "选择上传文件 (可多选)", "", filter_str)
         
-        if f:
-            file_name = os.path.basename(f)
-            self.write_log(f"点击：尝试上传 {file_name}", "blue")
-            try:
-                with open(f, "rb") as rb: 
-                    b = xmlrpc.client.Binary(rb.read())
-                
-                ext = os.path.splitext(f)[1].lower().replace('.', '')
-                
-                # 2. 增强型 MIME 类型映射
-                mime_map = {
-                    # 图片
-                    'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'svg': 'image/svg+xml', 'ico': 'image/x-icon',
-                    # 视频
-                    'mp4': 'video/mp4', 'mov': 'video/quicktime', 'flv': 'video/x-flv', 'avi': 'video/x-msvideo',
-                    'wmv': 'video/x-ms-wmv', 'rmvb': 'application/vnd.rn-realmedia-vbr', 'ogv': 'video/ogg',
-                    # 音频
-                    'mp3': 'audio/mpeg', 'wma': 'audio/x-ms-wma', 'ogg': 'audio/ogg', 'oga': 'audio/ogg',
-                    # 档案
-                    'pdf': 'application/pdf', 'zip': 'application/zip', 'rar': 'application/x-rar-compressed',
-                    'doc': 'application/msword', 'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                    'xls': 'application/vnd.ms-excel', 'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                    'ppt': 'application/vnd.ms-powerpoint', 'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
-                }
-                mime_type = mime_map.get(ext, 'application/octet-stream')
-                
-                # 3. 执行上传
-                res = self.rpc_client.metaWeblog.newMediaObject(1, 
-                    self.in_user.text(), self.in_pass.text(), 
-                    {'name': file_name, 'bits': b, 'type': mime_type})
-                
-                url = res['url']
-                
-                # Markdown/HTML 代码
-                insert_code = ""
-                
-                # 图片类
-                if ext in ['jpg', 'jpeg', 'png', 'gif', 'webp', 'svg', 'bmp']:
-                    insert_code = f"\n<p align=\"center\">\n  <img src=\"{url}\" alt=\"{file_name}\" style=\"max-width:100%;\">\n</p>\n"
-                
-                # 视频类： 
-                elif ext in ['mp4', 'mov', 'avi', 'wmv', 'flv', 'rmvb', 'ogv']:
-                    insert_code = f"\n<div align=\"center\">\n  <video src=\"{url}\" controls style=\"max-width:100%;\">您的浏览器不支持播放该视频</video>\n</div>\n"
-                
-                # 音频类：
-                elif ext in ['mp3', 'wma', 'ogg', 'oga']:
-                    insert_code = f"\n<div align=\"center\">\n  <audio src=\"{url}\" controls>您的浏览器不支持音频播放</audio>\n</div>\n"
-                
-                # 档案类：普通下载链接
-                else:
-                    insert_code = f"\n> 📁 [下载附件：{file_name}]({url})\n"
-                
-                self.edit_body.insertPlainText(insert_code)
-                self.write_log(f"✅ 上传成功并已插入代码", "green")
-                
-            except Exception as e: 
-                self.write_log(f"❌ 上传失败: {e}", "red")
-                self.write_log("提示：请确保 Typecho 后台已允许该后缀文件上传。", "gray")
-
-    def preview_markdown(self):
-        html = markdown.markdown(self.edit_body.toPlainText()); temp = os.path.join(self.base_dir, "preview_temp.html")
-        with open(temp, "w", encoding="utf-8") as f: f.write(html)
-        webbrowser.open(os.path.abspath(temp))
+        if files:
+            self.write_log(f"点击：尝试上传 {len(files)} 个文件 (并发 {self.spin_upload_workers.value()})", "blue")
+            # 2. 后台队列：先按哈希查缓存，未命中的文件并发流式上传
+            queue = self.core.upload_queue(files, self.spin_upload_workers.value(), self.image_options())
+            self.upload_sizes = [os.path.getsize(f) if os.path.isfile(f) else 0 for f in files]
+            self.upload_sent = [0] * len(files); self.upload_done = 0
+            self.upload_thread = MediaQueueWorker(queue)
+            self.upload_thread.progress.connect(self.on_upload_progress)
+            self.upload_thread.item_done.connect(self.on_upload_item_done)
+            self.upload_thread.finished.connect(self.on_upload_finished)
+            self.btn_upload.setText("上传中 0% (点击取消)")
+            self.upload_thread.start()
+
+    def image_options(self):
+        if not self.chk_img_opt.isChecked(): return None
+        if not pillow_available():
+            self.write_log("未安装 Pillow (pip install Pillow)，本次跳过图片优化", "orange")
+            return None
+        width = self.spin_img_width.value()
+        return {'max_width': width, 'quality': self.spin_img_quality.value(), 'to_webp': self.chk_img_webp.isChecked(),
+                'srcset_widths': [w for w in (480, 960) if w < width] if self.chk_img_srcset.isChecked() else []}
+
+    def on_upload_progress(self, index, sent, total):
+        self.upload_sent[index] = min(sent, self.upload_sizes[index]) # 压缩后的文件比原图小，按原图大小估算总进度
+        pct = sum(self.upload_sent) * 100 // max(sum(self.upload_sizes), 1)
+        self.btn_upload.setText(f"上传中 {self.upload_done}/{len(self.upload_sizes)} 个文件 {pct}% 点击取消")
+
+    def on_upload_item_done(self, index, status, result):
+        path = self.upload_thread.queue.paths[index]; file_name = os.path.basename(path)
+        self.upload_sent[index] = self.upload_sizes[index]; self.upload_done += 1
+        if status in ("uploaded", "cached"):
+            # 3. 插入对应的 Markdown/HTML 代码
+            ext = os.path.splitext(file_name)[1].lower().replace('.', '')
+            self.edit_body.insertPlainText(media_snippet(ext, result['url'], file_name, result.get('srcset')))
+            self.write_log(f"✅ {file_name} " + ("上传成功并已插入代码" if status == "uploaded" else "已上传过，复用原链接并插入代码"), "green")
+            if result.get('size', self.upload_sizes[index]) < self.upload_sizes[index]:
+                self.write_log(f"🖼 {file_name} 已优化为 {result['name']}：{self.upload_sizes[index] / 1024:.0f} KB → {result['size'] / 1024:.0f} KB", "gray", level="INFO")
+        elif status == "error":
+            self.write_log(f"❌ {file_name} 上传失败: {result}", "red")
+
+    def on_upload_finished(self, status, stats):
+        self.btn_upload.setText("上传图片附件")
+        if status != "success":
+            self.write_log(f"❌ 上传失败: {stats}", "red"); return
+        self.write_log(f"上传队列结束：新上传 {stats['uploaded']}，复用 {stats['cached']}，失败 {stats['error']}，取消 {stats['cancelled']}",
+                       "red" if stats['error'] else "green")
+        if stats['error']: self.write_log("提示：请确保 Typecho 后台已允许该后缀文件上传。", "gray", level="INFO")
+
+    def toggle_preview(self, on):
+        self.preview_view.setVisible(on)
+        if on: self.update_preview()
+
+    def update_preview(self):
+        """与发布使用同一组扩展渲染；只有变化的块会重新渲染"""
+        try: self.preview_view.set_markdown(self.edit_body.toPlainText())
+        except Exception as e: self.write_log(f"预览渲染失败: {e}", "red")
 
     def load_configuration(self):
-        if os.path.exists(self.config_path):
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                d = yaml.safe_load(f)
-                if d: 
-                    self.in_host.setText(d.get('host', '')); self.in_user.setText(d.get('user', ''))
-                    self.in_pass.setText(d.get('pass', '')); self.in_ai_key.setText(d.get('ai_key', ''))
+        d = self.core.config # 已合并默认值
+        self.in_host.setText(d['host']); self.in_user.setText(d['user'])
+        self.in_pass.setText(d['pass']); self.in_ai_key.setText(d['ai_key'])
+        self.spin_backup_workers.setValue(int(d['backup_workers']))
+        self.chk_incremental.setChecked(bool(d['backup_incremental'])); self.chk_archive.setChecked(bool(d['backup_archive']))
+        self.spin_upload_workers.setValue(int(d['upload_workers']))
+        self.chk_img_opt.setChecked(bool(d['image_optimize'])); self.spin_img_width.setValue(int(d['image_max_width']))
+        self.spin_img_quality.setValue(int(d['image_quality'])); self.chk_img_webp.setChecked(bool(d['image_webp']))
+        self.chk_img_srcset.setChecked(bool(d['image_srcset']))
+        self.ai_api_url = d['ai_api_url']
+        self.chk_ai_chunked.setChecked(bool(d['ai_chunked'])); self.ai_chunk_chars = int(d['ai_chunk_chars'])
+        self.spin_batch_size.setValue(int(d['rpc_batch_size'])); self.chk_gzip.setChecked(bool(d['rpc_gzip']))
+        self.chk_metrics.setChecked(bool(d['metrics_enabled']))
 
     def setup_about_tab(self):
         layout = QVBoxLayout(self.tab_about)
@@ -623,10 +1694,10 @@ class TypechoContentStudio(QWidget):
         layout.addLayout(btn_layout)
         layout.addStretch()
 
-def html_unescape(s): return s.replace("&quot;", '"').replace("&amp;", "&").replace("&lt;", "<").replace("&gt;", ">").replace("&nbsp;", " ")
 
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support() # 打包为 EXE 后进程池子进程需要
     app = QApplication(sys.argv); app.setStyle("Fusion")
     win = TypechoContentStudio(); win.show(); sys.exit(app.exec())
\ No newline at end of file